@@ -0,0 +1,18 @@
+#!/bin/bash
+# Hot standby streaming from the `postgres` service (compose profile "replica").
+# The first start clones the primary with pg_basebackup; later starts resume streaming.
+set -e
+PGDATA=/var/lib/postgresql/data
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    until PGPASSWORD="$POSTGRES_PASSWORD" pg_basebackup -h postgres -U "$POSTGRES_USER" \
+            -D "$PGDATA" -R -X stream -c fast; do
+        echo "Waiting for the primary..."
+        rm -rf "${PGDATA:?}"/*
+        sleep 2
+    done
+    chown -R postgres:postgres "$PGDATA"
+    chmod 700 "$PGDATA"
+fi
+
+exec gosu postgres postgres -c config_file=/etc/postgresql/postgresql.conf
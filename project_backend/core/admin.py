@@ -1,7 +1,94 @@
+import json
+from datetime import date, timedelta
+
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Max, Min, QuerySet
+from django.utils.functional import cached_property
+from django.utils.html import format_html
 from . import models
+from . import profiling
+from . import snapshots
 from django.contrib.auth import get_user_model
 
+EXACT_COUNT_LIMIT = getattr(settings, 'ADMIN_EXACT_COUNT_LIMIT', 10000)
+
+
+"""
+Paginator that avoids COUNT(*) on large tables
+"""
+
+
+class EstimatedCountPaginator(Paginator):
+    """Use PostgreSQL's row estimate when it is above EXACT_COUNT_LIMIT.
+
+    Unfiltered change lists read `pg_class.reltuples`, filtered ones the
+    planner's row estimate; small results are still counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = self._estimate()
+        if estimate is None or estimate < EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
+
+    def _estimate(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):
+            return None
+        if not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            # -1 (or 0) until the table has been analyzed
+            return row[0] if row and row[0] > 0 else None
+        plan = json.loads(queryset.explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+"""
+QuerySet for date_hierarchy without DISTINCT date_trunc() over the whole table
+"""
+
+
+class DateHierarchyQuerySet(QuerySet):
+    """`dates()` probing each candidate period with an indexed EXISTS.
+
+    The admin date drill-down asks for the distinct years/months/days of
+    the change list, which PostgreSQL answers by reading every row. Between
+    the (index-only) MIN and MAX of the field there are only a few years,
+    twelve months or 31 days to check, each a range probe on the date index.
+    """
+
+    def dates(self, field_name, kind, order='ASC'):
+        bounds = self.aggregate(first=Min(field_name), last=Max(field_name))
+        if bounds['first'] is None:
+            return []
+        found = [
+            start for start, end in _periods(bounds['first'], bounds['last'], kind)
+            if self.filter(**{f'{field_name}__gte': start,
+                              f'{field_name}__lt': end}).exists()
+        ]
+        return found if order == 'ASC' else found[::-1]
+
+
+def _periods(first, last, kind):
+    """(start, end) of every year, month or day from `first` to `last`."""
+    if kind == 'year':
+        return [(date(year, 1, 1), date(year + 1, 1, 1))
+                for year in range(first.year, last.year + 1)]
+    if kind == 'month':
+        months = range(first.year * 12 + first.month - 1, last.year * 12 + last.month)
+        return [(date(m // 12, m % 12 + 1, 1), date((m + 1) // 12, (m + 1) % 12 + 1, 1))
+                for m in months]
+    return [(first + timedelta(days=n), first + timedelta(days=n + 1))
+            for n in range((last - first).days + 1)]
+
 
 """
 Base admin class for models with a `user` field
@@ -15,8 +102,42 @@ class BaseModelAdmin(admin.ModelAdmin):
             obj.user = request.user  # Always update the user to the current admin
         super().save_model(request, obj, form, change)
 
-    list_filter = ('status', 'user', 'created_at', 'updated_at')  # Filter options
-    search_fields = ('user__email',)  # Allow searching by user email
+    list_filter = ('status', 'created_at', 'updated_at')  # Filter options
+    # Allow searching by user email (prefix match, uses the index)
+    search_fields = ('user__email__startswith',)
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # No second COUNT(*) over the unfiltered table
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if self.date_hierarchy:
+            queryset = DateHierarchyQuerySet(model=queryset.model, query=queryset.query,
+                                             using=queryset.db)
+        return queryset
+
+
+"""
+Base admin class for the rows of closed months (see core/snapshots.py)
+"""
+
+
+class ClosedMonthModelAdmin(BaseModelAdmin):
+    """Saving or deleting a row of a closed month reopens that month."""
+
+    def save_model(self, request, obj, form, change):
+        before = change and type(obj)._default_manager.filter(pk=obj.pk).first()
+        super().save_model(request, obj, form, change)
+        snapshots.reopen_changed([obj, before] if before else [obj])
+
+    def delete_model(self, request, obj):
+        snapshots.reopen_changed([obj])
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        snapshots.reopen_changed(queryset.select_related(*self.list_select_related))
+        super().delete_queryset(request, queryset)
 
 
 """
@@ -25,7 +146,10 @@ Admin view for Power Plant Details
 @admin.register(models.PowerPlantDetail)
 class PowerPlantDetailAdmin(BaseModelAdmin):
     list_display = ('system_name', 'system_id', 'group', 'country_name', 'latitude', 'longitude', 'azimuth', 'tilt', 'capacity_dc', 'status', 'created_at', 'updated_at', 'user')
-    search_fields = ('system_name', 'system_id', 'country_name')
+    search_fields = ('system_name__startswith', 'system_id__startswith',
+                     'country_name__startswith')
+    list_select_related = ('group', 'user')
+    autocomplete_fields = ('group', 'user')
 
 
 """
@@ -34,7 +158,28 @@ Admin view for GIS Weather Data
 @admin.register(models.GisWeather)
 class GisWeatherAdmin(BaseModelAdmin):  # Fixed duplicate class name
     list_display = ('power_plant', 'date', 'ghi', 'gti', 'pvout', 'status', 'created_at', 'updated_at', 'user')
-    search_fields = ('power_plant__logger_name', 'date')
+    search_fields = ('power_plant__system_id__startswith',)
+    list_select_related = ('power_plant__group', 'user')
+    autocomplete_fields = ('power_plant', 'user')
+    date_hierarchy = 'date'
+    ordering = ('-date',)
+
+
+"""
+Admin view for Performance Ratios
+"""
+
+
+@admin.register(models.PerformanceRatio)
+class PerformanceRatioAdmin(BaseModelAdmin):
+    list_display = ('power_plant', 'date', 'reference_kwh', 'expected_kwh',
+                    'actual_kwh', 'pr', 'performance_index', 'source', 'weather',
+                    'updated_at')
+    search_fields = ('power_plant__system_id__startswith',)
+    list_select_related = ('power_plant__group',)
+    autocomplete_fields = ('power_plant', 'user')
+    date_hierarchy = 'date'
+    ordering = ('-date',)
 
 
 """
@@ -43,7 +188,7 @@ Admin view for Logger Plant Groups
 @admin.register(models.LoggerPlantGroup)
 class LoggerPlantGroupAdmin(BaseModelAdmin):
     list_display = ('group_name', 'status', 'created_at', 'updated_at', 'user')
-    search_fields = ('group_name',)
+    search_fields = ('group_name__startswith',)
 
 
 """
@@ -52,16 +197,54 @@ Admin view for Logger Categories
 @admin.register(models.LoggerCategory)
 class LoggerCategoryAdmin(BaseModelAdmin):
     list_display = ('logger_name', 'group', 'alter_plant_id', 'status', 'created_at', 'updated_at', 'user')
-    search_fields = ('logger_name', 'alter_plant_id')
+    search_fields = ('logger_name__startswith', 'alter_plant_id__startswith')
+    list_select_related = ('group', 'user')
+    autocomplete_fields = ('group', 'user')
 
 
 """
 Admin view for Logger Power Generation
 """
 @admin.register(models.LoggerPowerGen)
-class LoggerPowerGenAdmin(BaseModelAdmin):
+class LoggerPowerGenAdmin(ClosedMonthModelAdmin):
     list_display = ('logger_name', 'power_gen', 'date', 'status', 'created_at', 'updated_at', 'user')
-    search_fields = ('logger_name__logger_name', 'date')
+    search_fields = ('logger_name__logger_name__startswith',)
+    list_select_related = ('logger_name', 'user')
+    autocomplete_fields = ('logger_name', 'user')
+    date_hierarchy = 'date'
+    ordering = ('-date',)
+
+
+"""
+Admin view for Logger Intraday Generation
+"""
+
+
+@admin.register(models.LoggerIntraday)
+class LoggerIntradayAdmin(BaseModelAdmin):
+    list_display = ('logger_name', 'date', 'sample_count', 'status', 'created_at',
+                    'updated_at', 'user')
+    search_fields = ('logger_name__logger_name__startswith',)
+    list_select_related = ('logger_name', 'user')
+    autocomplete_fields = ('logger_name', 'user')
+    exclude = ('samples',)
+    date_hierarchy = 'date'
+    ordering = ('-date',)
+
+
+"""
+Admin view for Generation Anomalies
+"""
+
+
+@admin.register(models.GenerationAnomaly)
+class GenerationAnomalyAdmin(BaseModelAdmin):
+    list_display = ('logger_name', 'group', 'date', 'power_gen', 'baseline', 'score',
+                    'ratio', 'peer_ratio', 'updated_at')
+    search_fields = ('logger_name__logger_name__startswith',)
+    list_select_related = ('logger_name', 'group')
+    autocomplete_fields = ('logger_name', 'group', 'user')
+    date_hierarchy = 'date'
 
 
 """
@@ -70,7 +253,25 @@ Admin view for Curtailment Events
 @admin.register(models.CurtailmentEvent)
 class CurtailmentEventAdmin(BaseModelAdmin):
     list_display = ('plant_id', 'date', 'start_time', 'end_time', 'rd', 'status', 'created_at', 'updated_at', 'user')
-    search_fields = ('plant_id', 'rd')
+    search_fields = ('plant_id__plant_id__startswith', 'rd__exact')
+    list_select_related = ('plant_id', 'user')
+    autocomplete_fields = ('plant_id', 'user')
+    date_hierarchy = 'date'
+
+
+"""
+Admin view for Curtailment Losses
+"""
+
+
+@admin.register(models.CurtailmentLoss)
+class CurtailmentLossAdmin(BaseModelAdmin):
+    list_display = ('plant_id', 'date', 'expected_kwh', 'actual_kwh', 'window_share',
+                    'lost_kwh', 'basis', 'rd', 'updated_at')
+    search_fields = ('plant_id__plant_id__startswith', 'rd__exact')
+    list_select_related = ('plant_id',)
+    autocomplete_fields = ('event', 'plant_id', 'user')
+    date_hierarchy = 'date'
 
 
 """
@@ -79,34 +280,45 @@ Admin view for Utility Plant ID
 @admin.register(models.UtilityPlantId)
 class UtilityPlantIdAdmin(BaseModelAdmin):
     list_display = ('plant_id', 'group', 'status', 'created_at', 'updated_at', 'user')
-    search_fields = ('plant_id',)
+    search_fields = ('plant_id__startswith',)
+    list_select_related = ('group', 'user')
+    autocomplete_fields = ('group', 'user')
 
 
 """
 Admin view for Utility Monthly Revenue
 """
 @admin.register(models.UtilityMonthlyRevenue)
-class UtilityMonthlyRevenueAdmin(BaseModelAdmin):
+class UtilityMonthlyRevenueAdmin(ClosedMonthModelAdmin):
     list_display = ('plant_id', 'contract_id', 'start_date', 'end_date', 'power_capacity_kw', 'sales_days', 'sales_electricity_kwh', 'sales_amount_jpy', 'tax_jpy', 'average_daily_sales_kwh', 'rd', 'status', 'created_at', 'updated_at', 'user')
-    search_fields = ('plant_id', 'contract_id')
+    search_fields = ('plant_id__plant_id__startswith', 'contract_id__startswith',
+                     'rd__exact')
+    list_select_related = ('plant_id', 'user')
+    autocomplete_fields = ('plant_id', 'user')
 
 
 """
 Admin view for Utility Monthly Expense
 """
 @admin.register(models.UtilityMonthlyExpense)
-class UtilityMonthlyExpenseAdmin(BaseModelAdmin):
+class UtilityMonthlyExpenseAdmin(ClosedMonthModelAdmin):
     list_display = ('plant_id', 'used_electricity_kwh', 'used_amount_jpy', 'tax_jpy', 'rd', 'status', 'created_at', 'updated_at', 'user')
-    search_fields = ('plant_id',)
+    search_fields = ('plant_id__plant_id__startswith', 'rd__exact')
+    list_select_related = ('plant_id', 'user')
+    autocomplete_fields = ('plant_id', 'user')
 
 
 """
 Admin view for Utility Daily Production
 """
 @admin.register(models.UtilityDailyProduction)
-class UtilityDailyProductionAdmin(BaseModelAdmin):
+class UtilityDailyProductionAdmin(ClosedMonthModelAdmin):
     list_display = ('plant_id', 'power_production_kwh', 'production_date', 'rd', 'status', 'created_at', 'updated_at', 'user')
-    search_fields = ('plant_id', 'production_date')
+    search_fields = ('plant_id__plant_id__startswith', 'rd__exact')
+    list_select_related = ('plant_id', 'user')
+    autocomplete_fields = ('plant_id', 'user')
+    date_hierarchy = 'production_date'
+    ordering = ('-production_date',)
 
 
 """
@@ -116,4 +328,28 @@ Admin view for Mail Notifications
 class MailNotificationeAdmin(BaseModelAdmin):
     list_display = ('from_field', 'to', 'date', 'mail_date_time', 'subject', 'body', 'impact_category', 'memo', 'status', 'created_at', 'updated_at', 'user')
     search_fields = ('from_field', 'to', 'subject')
+    date_hierarchy = 'date'
+
+
+"""
+Admin view for Request Profiles
+"""
+
+
+@admin.register(models.RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'status_code', 'duration_ms',
+                    'query_count', 'query_ms', 'user')
+    list_filter = ('method', 'status_code')
+    search_fields = ('path',)
+    fields = ('method', 'path', 'status_code', 'duration_ms', 'query_count', 'query_ms',
+              'user', 'created_at', 'report')
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
 
+    @admin.display(description='Report')
+    def report(self, obj):
+        return format_html('<pre style="white-space: pre-wrap">{}</pre>',
+                           profiling.render_report(obj))
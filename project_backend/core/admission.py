@@ -0,0 +1,130 @@
+"""
+Cost-aware admission control for the list endpoints.
+
+Before a list runs, `CostThrottle` estimates how many rows it will read:
+the planner's row estimate of the filtered queryset (EXPLAIN, nothing is
+executed) plus, when the requested date span reaches past the retention
+horizon, the archived rows of that span. The cost is counted in tokens of
+ADMISSION_ROWS_PER_TOKEN rows; requests of up to ADMISSION_FREE_TOKENS
+pass without any accounting.
+
+Dearer requests draw from two token buckets, the user's and the
+endpoint's. ADMISSION_USER_BUDGET and ADMISSION_ENDPOINT_BUDGET are
+(capacity, tokens refilled per second); ADMISSION_ENDPOINT_BUDGETS
+overrides the latter per router basename. A request costing more than a
+bucket holds is charged the whole bucket, so it runs only once the
+buckets are full. A request short of tokens gets 429 right away, with
+Retry-After set to when they are due; workers never sleep on a bucket.
+
+Buckets and estimates live in the default cache, which every worker of a
+host shares, so admission costs no database round trip: estimates are
+kept for ADMISSION_ESTIMATE_TTL seconds per endpoint and query string, so
+a repeated list is not EXPLAINed again. Cache reads and writes are not
+atomic; concurrent requests may both be admitted on the last tokens.
+"""
+import hashlib
+import json
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+ENABLED = getattr(settings, 'ADMISSION_ENABLED', True)
+ROWS_PER_TOKEN = getattr(settings, 'ADMISSION_ROWS_PER_TOKEN', 1000)
+FREE_TOKENS = getattr(settings, 'ADMISSION_FREE_TOKENS', 10)
+USER_BUDGET = getattr(settings, 'ADMISSION_USER_BUDGET', (300, 2.0))
+ENDPOINT_BUDGET = getattr(settings, 'ADMISSION_ENDPOINT_BUDGET', (1500, 10.0))
+ENDPOINT_BUDGETS = getattr(settings, 'ADMISSION_ENDPOINT_BUDGETS', {})
+ESTIMATE_TTL = getattr(settings, 'ADMISSION_ESTIMATE_TTL', 300)
+
+
+def _explain(view):
+    queryset = view.filter_queryset(view.get_queryset())
+    try:
+        queryset.query.get_compiler(queryset.db).as_sql()
+    except EmptyResultSet:
+        # e.g. a filter by names that resolve to no ids; nothing to EXPLAIN
+        return 0
+    plan = json.loads(queryset.explain(format='json'))
+    rows = int(plan[0]['Plan']['Plan Rows'])
+    archived = getattr(view, 'get_archived_row_estimate', None)
+    return rows + (archived() if archived else 0)
+
+
+def estimate(view):
+    """Rows a list request of `view` is expected to read, cached per endpoint/filter."""
+    params = sorted(view.request.query_params.lists())
+    digest = hashlib.sha256(f'{view.basename}?{params}'.encode()).hexdigest()[:32]
+    key = f'admission:estimate:{digest}'
+    rows = cache.get(key)
+    if rows is None:
+        rows = _explain(view)
+        cache.set(key, rows, ESTIMATE_TTL)
+    return rows
+
+
+def budgets(user, basename):
+    """[(bucket key, capacity, refill per second)] a `basename` request draws from."""
+    return [
+        (f'user:{user.pk}', *USER_BUDGET),
+        (f'endpoint:{basename}', *ENDPOINT_BUDGETS.get(basename, ENDPOINT_BUDGET)),
+    ]
+
+
+def take(buckets, cost):
+    """Debit `cost` tokens, at most a bucket's capacity, from all `buckets` or none.
+
+    Returns None when admitted, else the seconds until the shortest bucket
+    has refilled enough.
+    """
+    now = time.time()
+    stored = cache.get_many([f'admission:{key}' for key, _, _ in buckets])
+    debited, wait = {}, 0.0
+    for key, capacity, rate in buckets:
+        # (tokens, time) of a bucket last written; an expired bucket is full
+        tokens, updated = stored.get(f'admission:{key}', (capacity, now))
+        level = min(capacity, tokens + rate * max(0.0, now - updated))
+        charge = min(cost, capacity)
+        if level < charge:
+            wait = max(wait, (charge - level) / rate)
+        debited[key] = (level - charge, capacity, rate)
+    if wait:
+        return wait
+    for key, (tokens, capacity, rate) in debited.items():
+        # Expire once it would have refilled anyway
+        cache.set(f'admission:{key}', (tokens, now),
+                  math.ceil((capacity - tokens) / rate) + 1)
+    return None
+
+
+class CostThrottle(BaseThrottle):
+    """Admits list requests against the user's and the endpoint's token buckets."""
+
+    def allow_request(self, request, view):
+        if (not ENABLED or getattr(view, 'action', None) != 'list'
+                or not request.user.is_authenticated):
+            return True
+        rows = estimate(view)
+        cost = math.ceil(rows / ROWS_PER_TOKEN)
+        if cost <= FREE_TOKENS:
+            return True
+
+        buckets = budgets(request.user, view.basename)
+        wait = take(buckets, cost)
+        if wait is None:
+            return True
+        logger.info('Throttled %s for user %s: about %s rows, %s tokens, %.1fs short',
+                    view.basename, request.user.pk, rows, cost, wait)
+        detail = None
+        if cost > min(capacity for _, capacity, _ in buckets):
+            detail = (f'This request would read about {rows} rows, a whole budget; '
+                      'narrow the date range or filter by group_name to run it '
+                      'sooner.')
+        raise Throttled(wait=wait, detail=detail)
@@ -0,0 +1,221 @@
+"""
+Incremental anomaly detection on daily logger generation.
+
+Every LoggerPowerGen write is scored against the logger's own trailing
+window and against its group peers on the same date, then folded into
+that state, so the cost of an ingest does not depend on the history length:
+
+* LoggerGenStats keeps the last WINDOW_DAYS readings of a logger with
+  their median and MAD;
+* GroupDayGenStats keeps the running count and sum of `power_gen / median`
+  of a group on a date, the peer baseline.
+
+A reading is an anomaly when its robust z-score is below -Z_THRESHOLD and
+its ratio to its own median is below PEER_DROP times the mean ratio of its
+peers. A reading arriving before any peer is flagged on the z-score alone
+and cleared again when later peers show the whole group was down that day.
+Corrections of an already seen date are re-scored and reload the logger's
+window from its latest readings; the peer sums keep their first ratio.
+
+A new reading older than the logger's latest (a backfill) is scored against
+the readings before it, and the WINDOW_DAYS readings after it, whose
+baselines now include it, are re-scored and their peer sums corrected: at
+most 2 x WINDOW_DAYS rows, whatever the history length.
+"""
+import logging
+from statistics import median
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+WINDOW_DAYS = getattr(settings, 'ANOMALY_WINDOW_DAYS', 14)
+MIN_HISTORY = getattr(settings, 'ANOMALY_MIN_HISTORY', 7)
+Z_THRESHOLD = getattr(settings, 'ANOMALY_Z_THRESHOLD', 3.5)
+PEER_DROP = getattr(settings, 'ANOMALY_PEER_DROP', 0.7)
+
+# Scales the MAD to a standard deviation; the floor keeps flat windows usable.
+MAD_SCALE = 1.4826
+MIN_SPREAD = 0.05
+
+
+def window_stats(window):
+    """Return (median, MAD) of a trailing window."""
+    mid = median(window)
+    return mid, median(abs(value - mid) for value in window)
+
+
+def evaluate(window, mid, mad, value):
+    """Return (ratio, score) of `value` against a window, or None if too short."""
+    if len(window) < MIN_HISTORY or not mid or mid <= 0:
+        return None
+    spread = max(MAD_SCALE * mad, MIN_SPREAD * mid)
+    return value / mid, (value - mid) / spread
+
+
+def peer_ratio(ratio, count, ratio_sum):
+    """Ratio of a logger to the mean of the other loggers of its group that day."""
+    if count < 2:
+        return None
+    peer_mean = (ratio_sum - ratio) / (count - 1)
+    return ratio / peer_mean if peer_mean > 0 else None
+
+
+def is_anomaly(score, peers):
+    return score < -Z_THRESHOLD and (peers is None or peers < PEER_DROP)
+
+
+def _bump_group_day(group_id, day, ratio):
+    """Add `ratio` to the running sums of a group-day; return (count, ratio_sum)."""
+    rows = models.GroupDayGenStats.objects.filter(group_id=group_id, date=day)
+    for _ in range(2):
+        if rows.update(count=F('count') + 1, ratio_sum=F('ratio_sum') + ratio,
+                       updated_at=timezone.now()):
+            break
+        try:
+            with transaction.atomic():
+                models.GroupDayGenStats.objects.create(
+                    group_id=group_id, date=day, count=1, ratio_sum=ratio)
+            break
+        except IntegrityError:
+            continue
+    return rows.values_list('count', 'ratio_sum').get()
+
+
+def _recheck_peers(group_id, day, exclude_logger_id, count, ratio_sum):
+    """Clear or refresh the anomalies of a group-day after a new peer arrived."""
+    flagged = models.GenerationAnomaly.objects.filter(group_id=group_id, date=day) \
+        .exclude(logger_name_id=exclude_logger_id)
+    for anomaly in flagged:
+        peers = peer_ratio(anomaly.ratio, count, ratio_sum)
+        if is_anomaly(anomaly.score, peers):
+            models.GenerationAnomaly.objects.filter(pk=anomaly.pk).update(
+                peer_ratio=peers)
+        else:
+            models.GenerationAnomaly.objects.filter(pk=anomaly.pk).delete()
+
+
+def _group_day(group_id, day, ratio, fold, old_ratio):
+    """(count, ratio_sum) of a group-day after applying a logger's `ratio` to it.
+
+    `fold` counts the ratio of a reading seen for the first time, `old_ratio`
+    replaces the one a re-scored reading was counted with; otherwise the
+    sums are only read.
+    """
+    rows = models.GroupDayGenStats.objects.filter(group_id=group_id, date=day)
+    if fold:
+        return _bump_group_day(group_id, day, ratio)
+    if old_ratio is not None:
+        rows.update(ratio_sum=F('ratio_sum') + (ratio - old_ratio),
+                    updated_at=timezone.now())
+    return rows.values_list('count', 'ratio_sum').first() or (0, 0.0)
+
+
+def _score(logger_id, group_id, day, power_gen, window, fold=False, old_ratio=None):
+    """Score a reading against its trailing `window` and flag or clear its anomaly."""
+    existing = models.GenerationAnomaly.objects.filter(logger_name_id=logger_id,
+                                                       date=day)
+    mid, mad = window_stats(window) if window else (None, None)
+    scored = evaluate(window, mid, mad, float(power_gen))
+    if scored is None:
+        existing.delete()
+        return
+
+    ratio, score = scored
+    count, ratio_sum = _group_day(group_id, day, ratio, fold, old_ratio)
+    peers = peer_ratio(ratio, count, ratio_sum)
+    if is_anomaly(score, peers):
+        models.GenerationAnomaly.objects.update_or_create(
+            logger_name_id=logger_id, date=day,
+            defaults=dict(group_id=group_id, power_gen=power_gen, baseline=mid, mad=mad,
+                          score=score, ratio=ratio, peer_ratio=peers),
+        )
+    else:
+        existing.delete()
+
+    if (fold or old_ratio is not None) and count > 1:
+        _recheck_peers(group_id, day, logger_id, count, ratio_sum)
+
+
+def _backfill(row, stats, group_id):
+    """Fold in a new reading older than the logger's latest one."""
+    readings = models.LoggerPowerGen.objects.filter(
+        logger_name_id=row.logger_name_id, power_gen__isnull=False,
+    ).values_list('date', 'power_gen')
+    latest = readings.filter(date__lt=row.date).order_by('-date')[:WINDOW_DAYS]
+    before = [float(value) for _, value in reversed(latest)]
+    after = list(readings.filter(date__gt=row.date).order_by('date')[:WINDOW_DAYS])
+    _score(row.logger_name_id, group_id, row.date, row.power_gen, before, fold=True)
+
+    # Each later reading's window gains this one and loses its oldest value
+    values = before + [float(row.power_gen)] + [float(value) for _, value in after]
+    for offset, (day, power_gen) in enumerate(after):
+        position = len(before) + 1 + offset
+        window = values[max(0, position - WINDOW_DAYS):position]
+        old_window = (values[:len(before)]
+                      + values[len(before) + 1:position])[-WINDOW_DAYS:]
+        old = (evaluate(old_window, *window_stats(old_window), float(power_gen))
+               if old_window else None)
+        _score(row.logger_name_id, group_id, day, power_gen, window,
+               fold=old is None, old_ratio=old[0] if old else None)
+
+    if len(after) < WINDOW_DAYS:
+        # The backfill falls inside the logger's current window
+        window = values[-WINDOW_DAYS:]
+        mid, mad = window_stats(window)
+        models.LoggerGenStats.objects.filter(pk=stats.pk).update(
+            window=window, median=mid, mad=mad, updated_at=timezone.now())
+
+
+def _reload_window(stats):
+    """Recompute a logger's window from its stored readings up to `last_date`."""
+    window = [float(value) for value in reversed(models.LoggerPowerGen.objects.filter(
+        logger_name_id=stats.logger_name_id, date__lte=stats.last_date,
+        power_gen__isnull=False,
+    ).order_by('-date').values_list('power_gen', flat=True)[:WINDOW_DAYS])]
+    if window == stats.window:
+        return
+    mid, mad = window_stats(window) if window else (None, None)
+    models.LoggerGenStats.objects.filter(pk=stats.pk).update(
+        window=window, median=mid, mad=mad, updated_at=timezone.now())
+
+
+def _observe(row, created):
+    stats, _ = models.LoggerGenStats.objects.select_for_update().get_or_create(
+        logger_name_id=row.logger_name_id)
+    group_id = row.logger_name.group_id
+    if created and stats.last_date is not None and row.date < stats.last_date:
+        _backfill(row, stats, group_id)
+        return
+
+    is_new = stats.last_date is None or row.date > stats.last_date
+    _score(row.logger_name_id, group_id, row.date, row.power_gen, stats.window,
+           fold=is_new)
+    if is_new:
+        window = (stats.window + [float(row.power_gen)])[-WINDOW_DAYS:]
+        mid, mad = window_stats(window)
+        models.LoggerGenStats.objects.filter(pk=stats.pk).update(
+            window=window, median=mid, mad=mad, last_date=row.date,
+            updated_at=timezone.now())
+    elif not created:
+        _reload_window(stats)
+
+
+def observe(row, created=True):
+    """Score one saved LoggerPowerGen row and fold it into the rolling statistics.
+
+    `created` is False for an update of an existing row (a correction).
+    """
+    if row.date is None or row.power_gen is None:
+        return
+    try:
+        with transaction.atomic():
+            _observe(row, created)
+    except DatabaseError:
+        # Detection must never make an ingest fail.
+        logger.exception('Anomaly detection failed for LoggerPowerGen %s', row.pk)
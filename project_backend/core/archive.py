@@ -0,0 +1,235 @@
+"""
+Retention policy and cold archive for the large daily tables.
+
+`archive_old_data` moves whole months older than the model's retention
+(DATA_RETENTION_DAYS) out of the hot table into ArchivedChunk rows: one
+per series (logger, plant, utility plant) and month, holding the rows as
+zlib-compressed column-wise JSON. Row ids are kept, so archived rows come
+back with the same `id` they had.
+
+`read` rebuilds model instances for a date range; the list endpoints use
+it when a date filter reaches back past the retention horizon, so clients
+see the same rows, in the same order, whether they are hot or archived.
+Archiving deletes the hot rows without model signals: to the rest of the
+app (closed months, summaries, live events) the rows have not changed.
+"""
+import json
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from . import models
+from .utils import month_bounds
+
+BATCH_SIZE = 5000
+
+
+@dataclass(frozen=True)
+class Policy:
+    entity_field: str
+    date_field: str
+    default_days: int
+
+
+POLICIES = {
+    models.LoggerPowerGen: Policy('logger_name', 'date', 3 * 365),
+    models.GisWeather: Policy('power_plant', 'date', 3 * 365),
+    models.UtilityDailyProduction: Policy('plant_id', 'production_date', 3 * 365),
+    models.MailNotificatione: Policy(None, 'date', 365),
+}
+
+
+def label(model):
+    return model._meta.label_lower
+
+
+def retention_days(model):
+    """Days a model's rows stay hot, from DATA_RETENTION_DAYS = {label: days}."""
+    configured = getattr(settings, 'DATA_RETENTION_DAYS', {})
+    return configured.get(label(model), POLICIES[model].default_days)
+
+
+def horizon(model, today=None):
+    """First day of the oldest month that is still kept hot."""
+    cutoff = (today or date.today()) - timedelta(days=retention_days(model))
+    return cutoff.replace(day=1)
+
+
+def may_be_archived(model, start):
+    """True if a range starting at `start` can reach archived months."""
+    return model in POLICIES and start < horizon(model)
+
+
+def _columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+class _Encoder(DjangoJSONEncoder):
+    """Keeps datetimes at full (microsecond) precision."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _encode(columns, rows):
+    data = {column: [row[i] for row in rows] for i, column in enumerate(columns)}
+    text = json.dumps(data, cls=_Encoder, separators=(',', ':'))
+    return zlib.compress(text.encode(), 6)
+
+
+def _decode(model, blob):
+    data = json.loads(zlib.decompress(blob))
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    columns = [column for column in _columns(model) if column in data]
+    converted = [[fields[column].to_python(value) for value in data[column]]
+                 for column in columns]
+    return columns, list(zip(*converted))
+
+
+def archive_month(model, month):
+    """Move one month of `model` rows into ArchivedChunk; return the row count."""
+    policy = POLICIES[model]
+    start, end = month_bounds(month.strftime('%Y-%m'))
+    entity = (model._meta.get_field(policy.entity_field).attname
+              if policy.entity_field else None)
+    columns = _columns(model)
+    queryset = model.objects.filter(**{f'{policy.date_field}__range': (start, end)})
+
+    with transaction.atomic():
+        rows = list(queryset.order_by(policy.date_field, 'pk').values_list(*columns))
+        if not rows:
+            return 0
+        by_entity = defaultdict(list)
+        position = columns.index(entity) if entity else None
+        for row in rows:
+            by_entity[row[position] if entity else 0].append(row)
+
+        # Late rows for an already archived month are merged into its chunk.
+        existing = models.ArchivedChunk.objects.filter(
+            model_label=label(model), month=start, entity_id__in=list(by_entity))
+        for entity_id, blob in existing.values_list('entity_id', 'data'):
+            old_columns, old_rows = _decode(model, bytes(blob))
+            if old_columns == columns:
+                ids = {row[0] for row in by_entity[entity_id]}
+                kept = [row for row in old_rows if row[0] not in ids]
+                by_entity[entity_id] = kept + by_entity[entity_id]
+
+        now = timezone.now()
+        models.ArchivedChunk.objects.bulk_create([
+            models.ArchivedChunk(model_label=label(model), entity_id=entity_id,
+                                 month=start, row_count=len(chunk),
+                                 data=_encode(columns, chunk), updated_at=now)
+            for entity_id, chunk in by_entity.items()
+        ], update_conflicts=True, unique_fields=['model_label', 'entity_id', 'month'],
+            update_fields=['row_count', 'data', 'updated_at'])
+
+        # Moving rows is not a logical delete: skip the per-row collector and
+        # the post_delete receivers (closed months, live events, summaries,
+        # dashboards). Nothing references these tables, so nothing cascades.
+        ids = [row[0] for row in rows]
+        for first in range(0, len(ids), BATCH_SIZE):
+            batch = model.objects.filter(pk__in=ids[first:first + BATCH_SIZE])
+            batch._raw_delete(batch.db)
+    return len(rows)
+
+
+def archive_model(model, today=None, dry_run=False):
+    """Archive every month of `model` older than its horizon; return {month: rows}."""
+    policy = POLICIES[model]
+    limit = horizon(model, today)
+    old = model.objects.filter(**{f'{policy.date_field}__lt': limit})
+    first = (old.order_by(policy.date_field)
+             .values_list(policy.date_field, flat=True).first())
+    result = {}
+    month = first.replace(day=1) if first else limit
+    while month < limit:
+        bounds = month_bounds(month.strftime('%Y-%m'))
+        count = (old.filter(**{f'{policy.date_field}__range': bounds}).count()
+                 if dry_run else archive_month(model, month))
+        if count:
+            result[month] = count
+        month = (month + timedelta(days=32)).replace(day=1)
+    return result
+
+
+def vacuum(model):
+    """VACUUM ANALYZE a hot table after rows moved out (outside a transaction)."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'VACUUM ANALYZE {model._meta.db_table}')
+
+
+def _chunks(model, start, end, entity_ids=None):
+    chunks = models.ArchivedChunk.objects.filter(
+        model_label=label(model), month__gte=start.replace(day=1), month__lte=end)
+    if entity_ids is not None and POLICIES[model].entity_field:
+        chunks = chunks.filter(entity_id__in=list(entity_ids))
+    return chunks
+
+
+def row_count(model, start, end, entity_ids=None):
+    """Archived rows of the whole months start..end touches, without decompressing."""
+    chunks = _chunks(model, start, end, entity_ids)
+    return chunks.aggregate(rows=Sum('row_count'))['rows'] or 0
+
+
+def read(model, start, end, entity_ids=None):
+    """Return archived instances of `model` dated start..end in id order.
+
+    `entity_ids` restricts the series (None for all). FK targets are loaded
+    in one query per relation and cached on the instances.
+    """
+    policy = POLICIES[model]
+    chunks = _chunks(model, start, end, entity_ids)
+
+    instances = []
+    for blob in chunks.values_list('data', flat=True).iterator():
+        columns, rows = _decode(model, bytes(blob))
+        day = columns.index(policy.date_field)
+        instances += [model.from_db(chunks.db, columns, row)
+                      for row in rows if start <= row[day] <= end]
+
+    for field in model._meta.concrete_fields:
+        if field.is_relation and instances:
+            related = field.related_model._base_manager.in_bulk(
+                {getattr(instance, field.attname) for instance in instances})
+            for instance in instances:
+                field.set_cached_value(
+                    instance, related.get(getattr(instance, field.attname)))
+    instances.sort(key=lambda instance: instance.pk)
+    return instances
+
+
+def _sort_value(instance, path):
+    value = instance
+    for depth, part in enumerate(path, 1):
+        if value is None:
+            break
+        if part == 'pk':
+            value = value.pk
+            continue
+        field = value._meta.get_field(part)
+        last = field.is_relation and depth == len(path)
+        value = getattr(value, field.attname if last else part)
+    return value is None, value
+
+
+def sort(instances, ordering):
+    """Sort instances in place like `ORDER BY` the field names of `ordering`.
+
+    Names may follow relations (`logger_name__logger_name`) and start with
+    `-`; NULLs come last ascending and first descending, as in PostgreSQL.
+    """
+    for name in reversed(ordering):
+        path = name.lstrip('-').split('__')
+        instances.sort(key=lambda instance: _sort_value(instance, path),
+                       reverse=name.startswith('-'))
+    return instances
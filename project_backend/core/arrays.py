@@ -0,0 +1,57 @@
+"""
+NumPy helpers shared by the analytics engines.
+
+Rows fetched with `values_list` are turned into flat arrays and joined on
+integer keys (`entity_id * KEY_STRIDE + epoch_day`) instead of Python dicts.
+"""
+import numpy as np
+
+# Large enough to keep epoch days (< 1e6) apart inside a combined key.
+KEY_STRIDE = 1_000_000
+
+
+def days(dates):
+    """Convert a sequence of dates to int64 days since the epoch."""
+    return np.array(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+def floats(values):
+    """Convert a sequence of Decimal/None to a float array with NaN for None."""
+    return np.array([np.nan if value is None else value for value in values],
+                    dtype=float)
+
+
+def columns(rows, count):
+    """Split `values_list` rows into `count` column tuples (empty when no rows)."""
+    return tuple(zip(*rows)) if rows else ((),) * count
+
+
+def lookup(keys, values, wanted, default=np.nan):
+    """Vectorised `dict.get`: the value of each `wanted` key, else `default`."""
+    result = np.full(len(wanted), default, dtype=float)
+    if len(keys) == 0:
+        return result
+    order = np.argsort(keys, kind='stable')
+    keys, values = keys[order], values[order]
+    idx = np.clip(np.searchsorted(keys, wanted), 0, len(keys) - 1)
+    found = keys[idx] == wanted
+    result[found] = values[idx[found]]
+    return result
+
+
+def group_sum(groups, values):
+    """Return (unique groups, sum of `values` per group)."""
+    unique, inverse = np.unique(groups, return_inverse=True)
+    return unique, np.bincount(inverse.ravel(), weights=values, minlength=len(unique))
+
+
+def grouped_median(groups, values):
+    """Return (unique groups, median of `values` per group)."""
+    if len(groups) == 0:
+        return groups, values
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    unique, start, count = np.unique(groups, return_index=True, return_counts=True)
+    low = values[start + (count - 1) // 2]
+    high = values[start + count // 2]
+    return unique, (low + high) / 2.0
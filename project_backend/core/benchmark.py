@@ -0,0 +1,239 @@
+"""
+In-process benchmark suite for the `/solar-api/core/` endpoints.
+
+`seed` fills the (test) database with groups x loggers x days of data,
+`run` calls every BaseViewSet list, filter and create path through the
+Django test client and records latency percentiles, query counts and peak
+memory, and `compare` flags regressions against the committed baseline.
+Driven by the `benchmark_api` management command.
+"""
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import date, time as dtime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from . import models, names, summaries
+
+API = '/solar-api/core'
+START = date(2024, 1, 1)
+
+LIST_ENDPOINTS = [
+    'loggers-plants-group', 'power-plant-detail', 'gis-weather-data',
+    'loggercategories', 'logger-power-gen', 'curtailment-event', 'utility-plants-list',
+    'utility-monthly-revenue', 'utility-monthly-expense', 'utility-daily-production',
+    'mail-notifications',
+]
+
+
+def _month(day):
+    return day.strftime('%Y-%m')
+
+
+def seed(groups, loggers, days, rng_seed=0):
+    """Create `groups` groups of `loggers` loggers/plants each with `days` of series."""
+    rng = random.Random(rng_seed)
+    user = get_user_model().objects.filter(pk=1).first() or \
+        get_user_model().objects.create_superuser('benchmark@example.com', 'benchmark')
+    token, _ = Token.objects.get_or_create(user=user)
+    dates = [START + timedelta(days=offset) for offset in range(days)]
+
+    for g in range(groups):
+        group = models.LoggerPlantGroup.objects.create(group_name=f'bench-group-{g}',
+                                                       user=user)
+        plants = models.PowerPlantDetail.objects.bulk_create([
+            models.PowerPlantDetail(
+                system_name=f'bench-{g}-{i}', system_id=f'bench-{g}-{i}',
+                customer_name='benchmark', country_name='Japan',
+                latitude=Decimal('35') + Decimal(rng.random()),
+                longitude=Decimal('139') + Decimal(rng.random()),
+                altitude=10, azimuth=180, tilt=20, capacity_dc=100,
+                group=group, user=user)
+            for i in range(loggers)
+        ])
+        categories = models.LoggerCategory.objects.bulk_create([
+            models.LoggerCategory(logger_name=f'bench-{g}-{i}',
+                                  alter_plant_id=f'bench-{g}-{i}',
+                                  group=group, user=user)
+            for i in range(loggers)
+        ])
+        utility_plants = models.UtilityPlantId.objects.bulk_create([
+            models.UtilityPlantId(plant_id=f'bench-{g}-{i}',
+                                  alter_plant_id=f'bench-{g}-{i}',
+                                  group=group, user=user)
+            for i in range(loggers)
+        ])
+
+        for plant, category, utility in zip(plants, categories, utility_plants):
+            models.LoggerPowerGen.objects.bulk_create([
+                models.LoggerPowerGen(logger_name=category, date=day, user=user,
+                                      power_gen=Decimal(f'{rng.uniform(200, 500):.4f}'))
+                for day in dates
+            ])
+            models.GisWeather.objects.bulk_create([
+                models.GisWeather(power_plant=plant, date=day, user=user,
+                                  ghi=Decimal('4.5'), gti=Decimal('5.0'),
+                                  pvout=Decimal(f'{rng.uniform(2, 5):.3f}'))
+                for day in dates
+            ])
+            models.UtilityDailyProduction.objects.bulk_create([
+                models.UtilityDailyProduction(
+                    plant_id=utility, production_date=day, rd=_month(day), user=user,
+                    power_production_kwh=Decimal(f'{rng.uniform(200, 500):.2f}'))
+                for day in dates
+            ])
+            months = sorted({_month(day) for day in dates})
+            models.UtilityMonthlyRevenue.objects.bulk_create([
+                models.UtilityMonthlyRevenue(plant_id=utility, contract_id='C1', rd=rd,
+                                             user=user, sales_days=30,
+                                             sales_electricity_kwh=Decimal('9000'))
+                for rd in months
+            ])
+            models.UtilityMonthlyExpense.objects.bulk_create([
+                models.UtilityMonthlyExpense(plant_id=utility, rd=rd, user=user,
+                                             used_electricity_kwh=Decimal('100'))
+                for rd in months
+            ])
+            models.CurtailmentEvent.objects.bulk_create([
+                models.CurtailmentEvent(plant_id=utility, date=day, rd=_month(day),
+                                        user=user, start_time=dtime(10),
+                                        end_time=dtime(13))
+                for day in dates[::15]
+            ])
+    models.MailNotificatione.objects.bulk_create([
+        models.MailNotificatione(from_field='alerts@example.com', date=day, user=user,
+                                 mail_date_time=f'{day} 09:00', subject='Alert',
+                                 body=f'alert {day}', impact_category='Minor')
+        for day in dates
+    ])
+    summaries.refresh(models.LoggerPowerGen)
+    summaries.refresh(models.UtilityDailyProduction)
+    names.invalidate()
+    return token.key
+
+
+def scenarios(groups, loggers, days):
+    """Return [(name, method, path, payload factory)] covering list/filter/create."""
+    month = _month(START)
+    created = iter(range(10 ** 9))
+
+    def new_day():
+        return (START + timedelta(days=days + next(created))).isoformat()
+
+    def one_reading():
+        return {'logger_name': 'bench-0-0', 'power_gen': '321.0000', 'date': new_day()}
+
+    def one_production():
+        day = new_day()
+        return {'plant_id': 'bench-0-0', 'power_production_kwh': '321.00',
+                'production_date': day, 'rd': day[:7]}
+
+    result = [(f'list {name}', 'get', f'{API}/{name}/', None)
+              for name in LIST_ENDPOINTS]
+    result += [
+        ('filter logger-power-gen', 'get',
+         f'{API}/logger-power-gen/?group_name=bench-group-0&year_month={month}', None),
+        ('filter gis-weather-data', 'get',
+         f'{API}/gis-weather-data/?group_name=bench-group-0&year_month={month}', None),
+        ('filter utility-daily-production', 'get',
+         f'{API}/utility-daily-production/?group_name=bench-group-0&rd={month}', None),
+        ('filter utility-monthly-revenue', 'get',
+         f'{API}/utility-monthly-revenue/?group_name=bench-group-0&rd={month}', None),
+        ('filter curtailment-event', 'get',
+         f'{API}/curtailment-event/?group_name=bench-group-0', None),
+        ('filter loggercategories', 'get',
+         f'{API}/loggercategories/?group_name=bench-group-0', None),
+        ('create logger-power-gen', 'post', f'{API}/logger-power-gen/', one_reading),
+        ('create utility-daily-production', 'post',
+         f'{API}/utility-daily-production/', one_production),
+    ]
+    return result
+
+
+def _percentile(samples, q):
+    if len(samples) < 2:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[q - 1]
+
+
+def measure(client, method, path, payload, repeat):
+    """Call one endpoint `repeat` times (plus a warm-up and a traced call); summarise.
+
+    The untraced warm-up absorbs the one-off allocations of a first call
+    (imports, caches, compiled querysets), so the traced call measures the
+    steady-state peak of a request.
+    """
+    call = getattr(client, method)
+
+    def request():
+        data = payload() if payload else None
+        if data is None:
+            return call(path)
+        return call(path, data=data, content_type='application/json')
+
+    response = request()
+    if response.status_code >= 400:
+        raise RuntimeError(f'{method.upper()} {path} returned {response.status_code}: '
+                           f'{response.content[:200]}')
+
+    reset_queries()
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries:
+        response = request()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        request()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    return {
+        'p50_ms': round(_percentile(samples, 50), 3),
+        'p95_ms': round(_percentile(samples, 95), 3),
+        'p99_ms': round(_percentile(samples, 99), 3),
+        'queries': len(queries),
+        'peak_kb': round(peak / 1024, 1),
+        'bytes': len(response.content),
+    }
+
+
+def run(token, groups, loggers, days, repeat=20):
+    """Run every scenario and return {scenario name: metrics}."""
+    client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+    return {
+        name: measure(client, method, path, payload, repeat)
+        for name, method, path, payload in scenarios(groups, loggers, days)
+    }
+
+
+def compare(results, baseline, latency_tolerance=None, memory_tolerance=0.25):
+    """Return a list of regression messages of `results` against `baseline`.
+
+    Query counts must not grow and peak memory may grow by `memory_tolerance`.
+    Latency depends on the machine and its load, so it is only compared
+    when a `latency_tolerance` is given.
+    """
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if current['queries'] > before['queries']:
+            regressions.append(
+                f"{name}: queries {before['queries']} -> {current['queries']}")
+        for key in ('p50_ms', 'p95_ms') if latency_tolerance is not None else ():
+            if current[key] > before[key] * (1 + latency_tolerance):
+                regressions.append(f'{name}: {key} {before[key]} -> {current[key]}')
+        if current['peak_kb'] > before['peak_kb'] * (1 + memory_tolerance):
+            regressions.append(
+                f"{name}: peak_kb {before['peak_kb']} -> {current['peak_kb']}")
+    return regressions
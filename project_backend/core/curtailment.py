@@ -0,0 +1,181 @@
+"""
+Curtailment energy-loss estimation.
+
+All events passed to `estimate_losses` are priced together: the event
+windows, the daily production and the expected output are loaded with one
+query each and joined as NumPy arrays, so the cost does not grow with a
+query or a Python branch per event.
+
+Expected daily output of a plant comes from, in order of preference:
+
+* `pvout` basis: `GisWeather.pvout` (kWh/kWp) of the linked PowerPlantDetail
+  times its `capacity_dc`;
+* `history` basis: the median production of the plant over the
+  non-curtailed days of the same month.
+
+Only the share of that energy falling inside the curtailment window is
+counted, using a half-sine daylight profile, and the loss is capped by the
+shortfall actually seen in `UtilityDailyProduction` for the day.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db.models.functions import ExtractHour, ExtractMinute
+
+from . import arrays, models
+from .arrays import KEY_STRIDE, columns, grouped_median, lookup
+from .linkage import utility_plant_links
+
+# Used for day length when a utility plant has no linked PowerPlantDetail.
+DEFAULT_LATITUDE = getattr(settings, 'CURTAILMENT_DEFAULT_LATITUDE', 35.0)
+
+
+def _hours(hours, minutes, default):
+    hours, minutes = arrays.floats(hours), arrays.floats(minutes)
+    result = hours + minutes / 60.0
+    return np.where(np.isnan(result), default, result)
+
+
+def window_share(days, latitude, start_hour, end_hour):
+    """Fraction of a day's solar energy produced between start and end hour.
+
+    Daylight is modelled as a half sine between sunrise and sunset, which
+    are symmetric around noon and follow the solar declination of the day.
+    """
+    dates = days.astype('datetime64[D]')
+    day_of_year = (dates - dates.astype('datetime64[Y]')).astype(np.int64) + 1
+    declination = np.radians(23.44) * np.sin(2 * np.pi * (284 + day_of_year) / 365.0)
+    cos_omega = -np.tan(np.radians(latitude)) * np.tan(declination)
+    half_day = 12.0 * np.arccos(np.clip(cos_omega, -1.0, 1.0)) / np.pi
+    sunrise, length = 12.0 - half_day, 2.0 * half_day
+
+    start = np.clip(start_hour, sunrise, sunrise + length)
+    end = np.clip(end_hour, sunrise, sunrise + length)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        share = (np.cos(np.pi * (start - sunrise) / length)
+                 - np.cos(np.pi * (end - sunrise) / length)) / 2.0
+    return np.nan_to_num(np.clip(share, 0.0, 1.0))
+
+
+def estimate_losses(events):
+    """Estimate the energy lost by every CurtailmentEvent in `events`.
+
+    Returns unsaved CurtailmentLoss instances; events whose expected output
+    cannot be derived from either basis are left out.
+    """
+    rows = list(
+        events.filter(date__isnull=False)
+        .annotate(
+            start_h=ExtractHour('start_time'), start_m=ExtractMinute('start_time'),
+            end_h=ExtractHour('end_time'), end_m=ExtractMinute('end_time'),
+        )
+        .values_list('id', 'plant_id', 'date', 'rd',
+                     'start_h', 'start_m', 'end_h', 'end_m')
+    )
+    if not rows:
+        return []
+
+    event_ids, plants, dates, rds, start_h, start_m, end_h, end_m = zip(*rows)
+    plants = np.array(plants, dtype=np.int64)
+    days = arrays.days(dates)
+    keys = plants * KEY_STRIDE + days
+    start_hour = _hours(start_h, start_m, 0.0)
+    end_hour = _hours(end_h, end_m, 24.0)
+
+    first = min(dates).replace(day=1)
+    last = ((max(dates).replace(day=28) + timedelta(days=4)).replace(day=1)
+            - timedelta(days=1))
+    plant_list = np.unique(plants).tolist()
+
+    # Actual production of every plant-day in the months covered by events
+    production = list(
+        models.UtilityDailyProduction.objects.filter(
+            plant_id__in=plant_list,
+            production_date__range=(first, last),
+            power_production_kwh__isnull=False,
+        ).values_list('plant_id', 'production_date', 'power_production_kwh')
+    )
+    prod_plants, prod_dates, prod_kwh = columns(production, 3)
+    prod_plants = np.array(prod_plants, dtype=np.int64)
+    prod_days = arrays.days(prod_dates)
+    prod_kwh = arrays.floats(prod_kwh)
+    prod_keys = prod_plants * KEY_STRIDE + prod_days
+    actual = lookup(prod_keys, prod_kwh, keys)
+
+    # History basis: median of the non-curtailed days of the same month
+    months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    prod_months = (prod_days.astype('datetime64[D]').astype('datetime64[M]')
+                   .astype(np.int64))
+    clean = ~np.isin(prod_keys, keys)
+    month_keys, medians = grouped_median(
+        prod_plants[clean] * KEY_STRIDE + prod_months[clean], prod_kwh[clean])
+    history = lookup(month_keys, medians, plants * KEY_STRIDE + months)
+
+    # pvout basis: linked PowerPlantDetail weather times its DC capacity
+    links = utility_plant_links(models.UtilityPlantId.objects.filter(id__in=plant_list))
+    link_ids = np.array(list(links), dtype=np.int64)
+    link_plants = np.array([link['id'] for link in links.values()], dtype=float)
+    link_lat = np.array([float(link['latitude']) for link in links.values()],
+                        dtype=float)
+    power_plants = lookup(link_ids, link_plants, plants)
+    latitude = lookup(link_ids, link_lat, plants, DEFAULT_LATITUDE)
+
+    weather = list(
+        models.GisWeather.objects.filter(
+            power_plant_id__in=[link['id'] for link in links.values()],
+            date__range=(first, last),
+        ).values_list('power_plant_id', 'date', 'pvout', 'power_plant__capacity_dc')
+    )
+    pvout = np.full(len(keys), np.nan)
+    if weather:
+        w_plants, w_dates, w_pvout, w_capacity = zip(*weather)
+        w_keys = np.array(w_plants, dtype=np.int64) * KEY_STRIDE + arrays.days(w_dates)
+        linked = ~np.isnan(power_plants)
+        pvout[linked] = lookup(
+            w_keys, arrays.floats(w_pvout) * arrays.floats(w_capacity),
+            power_plants[linked].astype(np.int64) * KEY_STRIDE + days[linked])
+
+    use_pvout = ~np.isnan(pvout)
+    expected = np.where(use_pvout, pvout, history)
+    share = window_share(days, latitude, start_hour, end_hour)
+    lost = expected * share
+    shortfall = np.maximum(expected - actual, 0.0)
+    lost = np.where(np.isnan(actual), lost, np.minimum(lost, shortfall))
+
+    losses = []
+    for i in np.flatnonzero(~np.isnan(expected)):
+        losses.append(models.CurtailmentLoss(
+            event_id=event_ids[i],
+            plant_id_id=int(plants[i]),
+            date=dates[i],
+            rd=rds[i] or dates[i].strftime('%Y-%m'),
+            expected_kwh=Decimal(f'{expected[i]:.2f}'),
+            actual_kwh=None if np.isnan(actual[i]) else Decimal(f'{actual[i]:.2f}'),
+            window_share=Decimal(f'{share[i]:.4f}'),
+            lost_kwh=Decimal(f'{lost[i]:.2f}'),
+            basis='pvout' if use_pvout[i] else 'history',
+        ))
+    return losses
+
+
+def store_losses(losses):
+    """Insert or refresh CurtailmentLoss rows in one statement."""
+    return models.CurtailmentLoss.objects.bulk_create(
+        losses,
+        update_conflicts=True,
+        unique_fields=['event'],
+        update_fields=['plant_id', 'date', 'rd', 'expected_kwh', 'actual_kwh',
+                       'window_share', 'lost_kwh', 'basis', 'updated_at'],
+    )
+
+
+def compute_group_losses(group, rd=None):
+    """Estimate and store the losses of every event of `group` (or of one month)."""
+    events = models.CurtailmentEvent.objects.filter(plant_id__group=group)
+    if rd:
+        events = events.filter(rd__startswith=rd)
+    losses = estimate_losses(events)
+    store_losses(losses)
+    return len(losses)
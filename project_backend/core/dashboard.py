@@ -0,0 +1,277 @@
+"""
+One-call group dashboard.
+
+`build(group_id, rd)` assembles everything a group's dashboard shows for a
+month: its power plants, loggers (with their latest/MTD/YTD summary),
+daily generation per logger, weather per plant, utility production,
+revenue and expense, curtailment, generation anomalies and the month's
+mail notifications. Every section is one or two grouped queries, so the
+payload takes the same dozen queries whatever the group's size, and the
+sections run concurrently on DASHBOARD_WORKERS threads (each with its
+own database connection and the request's replica choice).
+
+Payloads are cached in the shared cache for DASHBOARD_CACHE_SECONDS
+under the group's version, which the save/delete signals of the
+underlying models bump once their transaction commits. The month's mail
+notifications are the same for every group and arrive often, so they are
+not part of that version: `mail` caches them per month for
+DASHBOARD_NOTIFICATION_CACHE_SECONDS and `get` adds them to the payload.
+The version and the digest of the mail section make the response's ETag.
+"""
+import contextvars
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Sum
+
+from . import models, names
+from .utils import month_bounds
+
+WORKERS = getattr(settings, 'DASHBOARD_WORKERS', 4)
+CACHE_SECONDS = getattr(settings, 'DASHBOARD_CACHE_SECONDS', 300)
+NOTIFICATION_LIMIT = getattr(settings, 'DASHBOARD_NOTIFICATION_LIMIT', 50)
+NOTIFICATION_CACHE_SECONDS = getattr(settings, 'DASHBOARD_NOTIFICATION_CACHE_SECONDS',
+                                     60)
+
+# Rows reach a group through (names kind, FK attribute); None: a write changes
+# every dashboard.
+GROUP_PATHS = {
+    models.LoggerPowerGen: ('logger', 'logger_name_id'),
+    models.LoggerSummary: ('logger', 'logger_name_id'),
+    models.GenerationAnomaly: ('logger', 'logger_name_id'),
+    models.GisWeather: ('system', 'power_plant_id'),
+    models.UtilityDailyProduction: ('plant', 'plant_id_id'),
+    models.UtilityMonthlyRevenue: ('plant', 'plant_id_id'),
+    models.UtilityMonthlyExpense: ('plant', 'plant_id_id'),
+    models.CurtailmentEvent: ('plant', 'plant_id_id'),
+    models.CurtailmentLoss: ('plant', 'plant_id_id'),
+    # Rare, and may move between groups
+    models.LoggerCategory: None,
+    models.UtilityPlantId: None,
+    models.PowerPlantDetail: None,
+}
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='dashboard')
+_pending = threading.local()
+
+
+def _series(rows):
+    """{name: [[date, value], ...]} of (name, date, value) rows in name, date order."""
+    result = defaultdict(list)
+    for name, day, value in rows:
+        result[name].append([day, value])
+    return result
+
+
+def plants(group_id, start, end, rd):
+    return list(models.PowerPlantDetail.objects.filter(group_id=group_id)
+                .order_by('system_id')
+                .values('id', 'system_id', 'system_name', 'resource', 'capacity_dc',
+                        'capacity_ac', 'latitude', 'longitude'))
+
+
+def loggers(group_id, start, end, rd):
+    return list(models.LoggerCategory.objects.filter(group_id=group_id)
+                .order_by('logger_name')
+                .values('id', 'logger_name', 'alter_plant_id',
+                        last_date=F('summary__last_date'),
+                        last_value=F('summary__last_value'),
+                        **models.LoggerSummary.property_expressions('summary__')))
+
+
+def generation(group_id, start, end, rd):
+    rows = (models.LoggerPowerGen.objects
+            .filter(logger_name__group_id=group_id, date__range=(start, end))
+            .order_by('logger_name__logger_name', 'date')
+            .values_list('logger_name__logger_name', 'date', 'power_gen'))
+    by_logger = _series(rows)
+    daily = defaultdict(Decimal)
+    for series in by_logger.values():
+        for day, value in series:
+            daily[day] += value
+    return {
+        'total_kwh': sum(daily.values(), Decimal(0)),
+        'daily': [[day, daily[day]] for day in sorted(daily)],
+        'loggers': by_logger,
+    }
+
+
+def weather(group_id, start, end, rd):
+    rows = (models.GisWeather.objects
+            .filter(power_plant__group_id=group_id, date__range=(start, end))
+            .order_by('power_plant__system_id', 'date')
+            .values_list('power_plant__system_id', 'date', 'ghi', 'gti', 'pvout'))
+    result = defaultdict(list)
+    for system_id, day, ghi, gti, pvout in rows:
+        result[system_id].append([day, ghi, gti, pvout])
+    return {'columns': ['date', 'ghi', 'gti', 'pvout'], 'plants': result}
+
+
+def utility(group_id, start, end, rd):
+    production = (models.UtilityDailyProduction.objects
+                  .filter(plant_id__group_id=group_id,
+                          production_date__range=(start, end))
+                  .order_by('plant_id__plant_id', 'production_date')
+                  .values_list('plant_id__plant_id', 'production_date',
+                               'power_production_kwh'))
+    revenue = (models.UtilityMonthlyRevenue.objects
+               .filter(plant_id__group_id=group_id, rd=rd)
+               .values(plant=F('plant_id__plant_id'))
+               .annotate(kwh=Sum('sales_electricity_kwh'), jpy=Sum('sales_amount_jpy'))
+               .order_by('plant'))
+    expense = (models.UtilityMonthlyExpense.objects
+               .filter(plant_id__group_id=group_id, rd=rd)
+               .values(plant=F('plant_id__plant_id'))
+               .annotate(kwh=Sum('used_electricity_kwh'), jpy=Sum('used_amount_jpy'))
+               .order_by('plant'))
+    return {
+        'production': _series(production),
+        'revenue': {row.pop('plant'): row for row in revenue},
+        'expense': {row.pop('plant'): row for row in expense},
+    }
+
+
+def curtailment(group_id, start, end, rd):
+    events = list(models.CurtailmentEvent.objects
+                  .filter(plant_id__group_id=group_id, rd=rd)
+                  .order_by('date', 'plant_id__plant_id')
+                  .values('id', 'date', 'start_time', 'end_time',
+                          plant=F('plant_id__plant_id'),
+                          expected_kwh=F('loss__expected_kwh'),
+                          lost_kwh=F('loss__lost_kwh')))
+    return {
+        'events': len(events),
+        'lost_kwh': sum((event['lost_kwh'] for event in events
+                         if event['lost_kwh'] is not None), Decimal(0)),
+        'items': events,
+    }
+
+
+def anomalies(group_id, start, end, rd):
+    return list(models.GenerationAnomaly.objects
+                .filter(group_id=group_id, date__range=(start, end))
+                .order_by('-date', 'score')
+                .values('date', 'power_gen', 'baseline', 'score', 'ratio', 'peer_ratio',
+                        logger=F('logger_name__logger_name')))
+
+
+def notifications(group_id, start, end, rd):
+    month = models.MailNotificatione.objects.filter(date__range=(start, end))
+    counts = dict(month.values_list('impact_category')
+                  .annotate(count=Count('id')).order_by())
+    latest = list(month.order_by('-date', '-id').values(
+        'id', 'date', 'mail_date_time', 'from_field', 'subject',
+        'impact_category')[:NOTIFICATION_LIMIT])
+    return {'total': sum(counts.values()), 'by_impact': counts, 'latest': latest}
+
+
+SECTIONS = {
+    'plants': plants,
+    'loggers': loggers,
+    'generation': generation,
+    'weather': weather,
+    'utility': utility,
+    'curtailment': curtailment,
+    'anomalies': anomalies,
+}
+
+
+def _run(section, *args):
+    """Run a section on a pool thread with a healthy connection, as a request would."""
+    close_old_connections()
+    try:
+        return section(*args)
+    finally:
+        close_old_connections()
+
+
+def build(group_id, rd):
+    """{section: data} of a group's month but its mail, computed concurrently."""
+    start, end = month_bounds(rd)
+    futures = {
+        # Each task gets its own copy of the context: the replica choice of the request.
+        name: _executor.submit(contextvars.copy_context().run, _run, section,
+                               group_id, start, end, rd)
+        for name, section in SECTIONS.items()
+    }
+    sections = {name: future.result() for name, future in futures.items()}
+    summary = {
+        'plants': len(sections['plants']),
+        'loggers': len(sections['loggers']),
+        'generation_kwh': sections['generation']['total_kwh'],
+        'curtailment_events': sections['curtailment']['events'],
+        'curtailment_lost_kwh': sections['curtailment']['lost_kwh'],
+        'anomalies': len(sections['anomalies']),
+    }
+    return {'summary': summary, **sections}
+
+
+def mail(rd):
+    """(digest, notifications section) of a month, shared by every group's dashboard."""
+    key = f'dashboard:notifications:{rd}'
+    cached = cache.get(key)
+    if cached is None:
+        section = notifications(None, *month_bounds(rd), rd)
+        content = json.dumps(section, cls=DjangoJSONEncoder).encode()
+        digest = hashlib.sha256(content).hexdigest()[:16]
+        cached = (digest, section)
+        cache.set(key, cached, NOTIFICATION_CACHE_SECONDS)
+    return cached
+
+
+def _version_key(group_id):
+    return f'dashboard:version:{group_id}'
+
+
+def version(group_id):
+    """Version of a group's dashboards (changes with any write of the group or all)."""
+    keys = [_version_key(group_id), _version_key('all')]
+    versions = cache.get_many(keys)
+    return '-'.join(str(versions.get(key, 0)) for key in keys)
+
+
+def get(group_id, rd, current_version=None, mail_section=None):
+    """Payload of a group's month: cached sections (built on a miss) and the mail."""
+    current_version = current_version or version(group_id)
+    key = f'dashboard:{group_id}:{rd}:{current_version}'
+    payload = cache.get(key)
+    if payload is None:
+        payload = build(group_id, rd)
+        cache.set(key, payload, CACHE_SECONDS)
+    mail_section = mail_section or mail(rd)[1]
+    return {'summary': {**payload['summary'], 'notifications': mail_section['total']},
+            **{name: value for name, value in payload.items() if name != 'summary'},
+            'notifications': mail_section}
+
+
+def invalidate(group_id=None):
+    """Drop the cached dashboards of a group (default: of every group)."""
+    cache.set(_version_key('all' if group_id is None else group_id), time.time_ns(),
+              None)
+
+
+def schedule_invalidate(instance):
+    """`invalidate` the group of a saved or deleted row once the transaction commits."""
+    path = GROUP_PATHS[type(instance)]
+    # None (also for a logger or plant this worker does not know yet): every group
+    group_id = (None if path is None
+                else names.group_of(path[0], getattr(instance, path[1])))
+    if not hasattr(_pending, 'groups'):
+        _pending.groups = set()
+    _pending.groups.add(group_id)
+    transaction.on_commit(_flush)
+
+
+def _flush():
+    groups = getattr(_pending, 'groups', None)
+    while groups:
+        invalidate(groups.pop())
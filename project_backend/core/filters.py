@@ -1,6 +1,7 @@
 import django_filters
 from django_filters import DateFilter, CharFilter
 from . import models
+from . import names
 from django.utils.dateparse import parse_date
 from datetime import timedelta
 
@@ -48,9 +49,32 @@ class LoggerPowerGenFilter(django_filters.FilterSet):
 
     def filter_by_logger_names(self, queryset, name, value):
         """Filter queryset by multiple logger names."""
-        names = value.split(',')
-        categories = models.LoggerCategory.objects.filter(logger_name__in=names)
-        return queryset.filter(logger_name__in=categories)
+        return queryset.filter(logger_name_id__in=names.ids('logger', value.split(',')))
+
+
+class GenerationAnomalyFilter(LoggerPowerGenFilter):
+    group_name = django_filters.CharFilter(method='filter_by_group_name')
+    start_date = DateFilter(field_name='date', lookup_expr='gte')
+    end_date = DateFilter(field_name='date', lookup_expr='lte')
+
+    class Meta:
+        model = models.GenerationAnomaly
+        fields = ['year_month', 'year_month_date', 'logger_name', 'group_name',
+                  'start_date', 'end_date']
+
+    def filter_by_group_name(self, queryset, name, value):
+        """Filter queryset by group name."""
+        return queryset.filter(group_id=names.group_id(value))
+
+
+class LoggerIntradayFilter(LoggerPowerGenFilter):
+    start_date = DateFilter(field_name='date', lookup_expr='gte')
+    end_date = DateFilter(field_name='date', lookup_expr='lte')
+
+    class Meta:
+        model = models.LoggerIntraday
+        fields = ['year_month', 'year_month_date', 'logger_name', 'start_date',
+                  'end_date']
 
 
 class BaseUtilityFilter(django_filters.FilterSet):
@@ -70,11 +94,11 @@ class BaseUtilityFilter(django_filters.FilterSet):
     def filter_by_plant_id(self, queryset, name, value):
         """Filter queryset by plant IDs."""
         plant_ids = [plant_id.strip() for plant_id in value.split(',')]
-        return queryset.filter(plant_id__plant_id__in=plant_ids)
+        return queryset.filter(plant_id_id__in=names.ids('plant', plant_ids))
 
     def filter_by_group_name(self, queryset, name, value):
         """Filter queryset by group name."""
-        return queryset.filter(plant_id__group__group_name=value)
+        return queryset.filter(plant_id_id__in=names.members('plant', value))
 
 
 class UtilityMonthlyRevenueFilter(BaseUtilityFilter):
@@ -97,6 +121,11 @@ class CurtailmentEventFilter(BaseUtilityFilter):
         model = models.CurtailmentEvent
 
 
+class CurtailmentLossFilter(BaseUtilityFilter):
+    class Meta(BaseUtilityFilter.Meta):
+        model = models.CurtailmentLoss
+
+
 class LoggerCategoryFilter(django_filters.FilterSet):
     logger_name = django_filters.CharFilter(method='filter_by_logger_name')
     group_name = django_filters.CharFilter(method='filter_by_group_name')
@@ -112,7 +141,7 @@ class LoggerCategoryFilter(django_filters.FilterSet):
 
     def filter_by_group_name(self, queryset, name, value):
         """Filter LoggerCategory by group name."""
-        return queryset.filter(group__group_name=value)
+        return queryset.filter(group_id=names.group_id(value))
 
 
 class UtilityPlantIdFilter(django_filters.FilterSet):
@@ -130,7 +159,7 @@ class UtilityPlantIdFilter(django_filters.FilterSet):
 
     def filter_by_group_name(self, queryset, name, value):
         """Filter by group name."""
-        return queryset.filter(group__group_name=value)
+        return queryset.filter(group_id=names.group_id(value))
 
 
 class PowerPlantDetailFilter(django_filters.FilterSet):
@@ -173,6 +202,27 @@ class GisWeatherFilter(django_filters.FilterSet):
         except ValueError:
             return queryset.none()
 
+
+class PerformanceRatioFilter(GisWeatherFilter):
+    group_name = django_filters.CharFilter(method='filter_by_group_name')
+    system_id = django_filters.CharFilter(method='filter_by_system_id')
+    start_date = DateFilter(field_name='date', lookup_expr='gte')
+    end_date = DateFilter(field_name='date', lookup_expr='lte')
+
+    class Meta:
+        model = models.PerformanceRatio
+        fields = ['year_month', 'power_plant', 'group_name', 'system_id', 'start_date',
+                  'end_date', 'weather']
+
+    def filter_by_group_name(self, queryset, name, value):
+        """Filter queryset by the group of the power plant."""
+        return queryset.filter(power_plant_id__in=names.members('system', value))
+
+    def filter_by_system_id(self, queryset, name, value):
+        """Filter queryset by the system ID of the power plant."""
+        return queryset.filter(power_plant_id__in=names.ids('system', [value]))
+
+
 """
 Filter for the mail notificatioin by using date(to and From) or impact_category
 """      
@@ -184,3 +234,12 @@ class MailNotificationeFilter(django_filters.FilterSet):
     class Meta:
         model = models.MailNotificatione
         fields = ['start_date', 'end_date', 'impact_category']
+
+
+class ClosedMonthFilter(django_filters.FilterSet):
+    group_name = django_filters.CharFilter(field_name='group__group_name')
+    rd = django_filters.CharFilter(field_name='rd')
+
+    class Meta:
+        model = models.ClosedMonth
+        fields = ['group_name', 'rd']
@@ -0,0 +1,298 @@
+"""
+Deterministic synthetic fleet generator for load and scale testing.
+
+Creates groups, plants (PowerPlantDetail + LoggerCategory + UtilityPlantId
+sharing one system id), then multi-year daily series for generation,
+weather, utility production, revenue, expense, curtailment and mail.
+
+Daily irradiation follows the extraterrestrial irradiation of the plant's
+latitude times an autocorrelated clearness index, so series have realistic
+seasonality and weather spells; loggers, weather feeds and utility meters
+drop out for random runs of days. Entity rows go through `bulk_create`;
+the series are streamed into PostgreSQL with COPY in chunks of plants,
+and the logger/plant summaries are recomputed per group afterwards.
+Everything is drawn from one NumPy generator, so a seed reproduces a fleet.
+"""
+import io
+
+import numpy as np
+from django.db import connection
+from django.utils import timezone
+
+from . import models, names, summaries
+
+SOLAR_CONSTANT = 1.367  # kW/m2
+TARIFF_JPY = 36.0
+TAX_RATE = 0.10
+# Japan-like bounding box for plant coordinates
+LATITUDE_RANGE = (31.0, 43.0)
+LONGITUDE_RANGE = (130.0, 145.0)
+
+
+def extraterrestrial_daily(latitude, day_of_year):
+    """Daily extraterrestrial irradiation on a horizontal plane in kWh/m2."""
+    lat = np.radians(latitude)[:, None]
+    declination = np.radians(23.44) * np.sin(2 * np.pi * (284 + day_of_year) / 365.0)
+    omega = np.arccos(np.clip(-np.tan(lat) * np.tan(declination), -1.0, 1.0))
+    distance = 1 + 0.033 * np.cos(2 * np.pi * day_of_year / 365.0)
+    return (24 / np.pi) * SOLAR_CONSTANT * distance * (
+        omega * np.sin(lat) * np.sin(declination)
+        + np.cos(lat) * np.cos(declination) * np.sin(omega))
+
+
+def clearness(rng, plants, days):
+    """Autocorrelated daily clearness index in [0.1, 0.78] (plants x days)."""
+    noise = rng.normal(0.0, 1.0, (plants, days))
+    spell = np.empty_like(noise)
+    spell[:, 0] = noise[:, 0]
+    for day in range(1, days):
+        spell[:, day] = 0.6 * spell[:, day - 1] + 0.8 * noise[:, day]
+    return np.clip(0.52 + 0.14 * spell, 0.1, 0.78)
+
+
+def outages(rng, plants, days, rate):
+    """Boolean (plants x days) mask, True where a feed has no data.
+
+    About `rate` outage runs per plant and year, each 1 to ~20 days long.
+    """
+    missing = np.zeros((plants, days), dtype=bool)
+    for plant in range(plants):
+        for _ in range(rng.poisson(rate * days / 365.0)):
+            start = rng.integers(0, days)
+            missing[plant, start:start + rng.geometric(0.2)] = True
+    return missing
+
+
+def _fmt(values, spec):
+    return np.char.mod(spec, values)
+
+
+class CopyWriter:
+    """Buffer rows for one table and stream them with COPY ... FROM STDIN (CSV)."""
+
+    def __init__(self, model, columns, user_id):
+        self.table = model._meta.db_table
+        self.columns = list(columns) + ['status', 'created_at', 'updated_at', 'user_id']
+        now = timezone.now().isoformat()
+        self.suffix = f',t,{now},{now},{user_id}\n'
+        self.buffer = io.StringIO()
+        self.rows = 0
+
+    def write(self, *columns):
+        """Buffer equally long string columns as rows."""
+        self.buffer.writelines(','.join(row) + self.suffix for row in zip(*columns))
+        self.rows += len(columns[0])
+
+    def flush(self):
+        if not self.buffer.tell():
+            return
+        self.buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY {self.table} ({", ".join(self.columns)}) '
+                               'FROM STDIN WITH (FORMAT csv)', self.buffer)
+        self.buffer = io.StringIO()
+
+
+class FleetGenerator:
+    def __init__(self, groups, plants_per_group, start, days, seed=0, prefix='fleet',
+                 gap_rate=3.0, chunk_plants=50, user_id=1, log=None):
+        self.groups = groups
+        self.plants_per_group = plants_per_group
+        self.start = start
+        self.days = days
+        self.prefix = prefix
+        self.gap_rate = gap_rate
+        self.chunk_plants = chunk_plants
+        self.user_id = user_id
+        self.log = log or (lambda message: None)
+        self.rng = np.random.default_rng(seed)
+
+        self.dates = np.arange(np.datetime64(start), np.datetime64(start) + days)
+        self.date_str = np.datetime_as_string(self.dates)
+        self.months = self.dates.astype('datetime64[M]')
+        self.rd = np.datetime_as_string(self.months)
+        self.day_of_year = (
+            (self.dates - self.dates.astype('datetime64[Y]')).astype(int) + 1)
+
+        self.writers = {
+            'gen': CopyWriter(models.LoggerPowerGen, [
+                'logger_name_id', 'date', 'power_gen'], user_id),
+            'weather': CopyWriter(models.GisWeather, [
+                'power_plant_id', 'date', 'ghi', 'gti', 'pvout'], user_id),
+            'production': CopyWriter(models.UtilityDailyProduction, [
+                'plant_id_id', 'production_date', 'power_production_kwh', 'rd'],
+                user_id),
+            'revenue': CopyWriter(models.UtilityMonthlyRevenue, [
+                'plant_id_id', 'contract_id', 'start_date', 'end_date',
+                'power_capacity_kw', 'sales_days', 'sales_electricity_kwh',
+                'sales_amount_jpy', 'tax_jpy', 'average_daily_sales_kwh', 'rd'],
+                user_id),
+            'expense': CopyWriter(models.UtilityMonthlyExpense, [
+                'plant_id_id', 'used_electricity_kwh', 'used_amount_jpy', 'tax_jpy',
+                'rd'], user_id),
+            'curtailment': CopyWriter(models.CurtailmentEvent, [
+                'plant_id_id', 'date', 'start_time', 'end_time', 'rd'], user_id),
+            'mail': CopyWriter(models.MailNotificatione, [
+                'from_field', '"to"', 'date', 'mail_date_time', 'subject', 'body',
+                'impact_category', 'memo'], user_id),
+        }
+
+    def run(self):
+        for g in range(self.groups):
+            group = models.LoggerPlantGroup.objects.create(
+                group_name=f'{self.prefix}-group-{g}', user_id=self.user_id)
+            plants, loggers, utility = self.create_entities(group)
+            for first in range(0, len(plants), self.chunk_plants):
+                chunk = slice(first, first + self.chunk_plants)
+                self.write_series(plants[chunk], loggers[chunk], utility[chunk])
+                for writer in self.writers.values():
+                    writer.flush()
+            summaries.refresh(models.LoggerPowerGen, [logger.pk for logger in loggers])
+            summaries.refresh(models.UtilityDailyProduction,
+                              [plant.pk for plant in utility])
+            self.log(f'{group.group_name}: {len(plants)} plants')
+        # Entities were bulk-created without signals.
+        names.invalidate()
+
+        with connection.cursor() as cursor:
+            for writer in self.writers.values():
+                cursor.execute(f'ANALYZE {writer.table}')
+        return {name: writer.rows for name, writer in self.writers.items()}
+
+    def create_entities(self, group):
+        count, rng = self.plants_per_group, self.rng
+        latitude = rng.uniform(*LATITUDE_RANGE, count)
+        longitude = rng.uniform(*LONGITUDE_RANGE, count)
+        capacity = np.round(rng.lognormal(np.log(400), 0.8, count).clip(20, 5000), 2)
+        entity_names = [f'{group.group_name}-{i:05d}' for i in range(count)]
+
+        plants = models.PowerPlantDetail.objects.bulk_create([
+            models.PowerPlantDetail(
+                system_name=name, system_id=name,
+                customer_name=f'{self.prefix} customer {i % 17}',
+                resource='Solar', country_name='Japan',
+                latitude=f'{latitude[i]:.6f}', longitude=f'{longitude[i]:.6f}',
+                altitude=f'{rng.uniform(0, 600):.1f}',
+                azimuth=f'{rng.normal(180, 15):.1f}',
+                tilt=f'{rng.uniform(10, 30):.1f}', capacity_dc=capacity[i],
+                capacity_ac=round(capacity[i] * rng.uniform(0.75, 0.95), 2),
+                location=f'Plant site {i}', group=group, user_id=self.user_id)
+            for i, name in enumerate(entity_names)
+        ], batch_size=1000)
+        loggers = models.LoggerCategory.objects.bulk_create([
+            models.LoggerCategory(logger_name=name, alter_plant_id=name, group=group,
+                                  user_id=self.user_id)
+            for name in entity_names
+        ], batch_size=1000)
+        utility = models.UtilityPlantId.objects.bulk_create([
+            models.UtilityPlantId(plant_id=name, alter_plant_id=name, group=group,
+                                  user_id=self.user_id)
+            for name in entity_names
+        ], batch_size=1000)
+        return plants, loggers, utility
+
+    def write_series(self, plants, loggers, utility):
+        rng, count, days = self.rng, len(plants), self.days
+        latitude = np.array([float(plant.latitude) for plant in plants])
+        tilt = np.radians([float(plant.tilt) for plant in plants])[:, None]
+        capacity = np.array([float(plant.capacity_dc) for plant in plants])[:, None]
+
+        ghi = (extraterrestrial_daily(latitude, self.day_of_year)
+               * clearness(rng, count, days))
+        # Tilted surfaces gain most in winter, when the sun is low
+        season = np.cos(2 * np.pi * (self.day_of_year - 172) / 365.0)
+        gti = ghi * (1 + np.sin(tilt) * (0.15 - 0.25 * season))
+        temperature_loss = 0.04 * (1 - season) / 2 + 0.02
+        pvout = gti * rng.uniform(0.76, 0.86, (count, 1)) * (1 - temperature_loss)
+        degradation = 1 - 0.005 * np.arange(days) / 365.0
+        generation = (pvout * capacity * degradation
+                      * rng.normal(1.0, 0.02, (count, days)))
+        production = generation * rng.normal(0.985, 0.01, (count, days))
+
+        curtailed = rng.random((count, days)) < self._curtailment_probability()
+        production = np.where(
+            curtailed, production * rng.uniform(0.5, 0.9, (count, days)), production)
+
+        logger_missing = outages(rng, count, days, self.gap_rate)
+        weather_missing = outages(rng, count, days, self.gap_rate / 3)
+        meter_missing = outages(rng, count, days, self.gap_rate / 3)
+
+        for i in range(count):
+            self._daily(self.writers['gen'], loggers[i].pk, ~logger_missing[i],
+                        [_fmt(generation[i], '%.4f')])
+            self._daily(self.writers['weather'], plants[i].pk, ~weather_missing[i],
+                        [_fmt(ghi[i], '%.3f'), _fmt(gti[i], '%.3f'),
+                         _fmt(pvout[i], '%.3f')])
+            self._daily(self.writers['production'], utility[i].pk, ~meter_missing[i],
+                        [_fmt(production[i], '%.2f'), self.rd])
+            self._monthly(utility[i], float(capacity[i, 0]), production[i],
+                          ~meter_missing[i])
+            self._curtailment(utility[i].pk, curtailed[i])
+            self._mail(plants[i], logger_missing[i])
+
+    def _curtailment_probability(self):
+        """Curtailment peaks in spring (mild, sunny, low demand)."""
+        spring = np.exp(-((self.day_of_year - 110) / 30.0) ** 2)
+        return 0.005 + 0.08 * spring
+
+    def _daily(self, writer, entity_id, keep, values):
+        writer.write(np.full(keep.sum(), str(entity_id)), self.date_str[keep],
+                     *[column[keep] for column in values])
+
+    def _monthly(self, utility, capacity, production, keep):
+        months, index = np.unique(self.months, return_inverse=True)
+        kwh = np.bincount(index, weights=np.where(keep, production, 0.0),
+                          minlength=len(months))
+        days = np.bincount(index, weights=keep.astype(float),
+                           minlength=len(months)).astype(int)
+        amount = kwh * TARIFF_JPY
+        first = months.astype('datetime64[D]')
+        last = (months + 1).astype('datetime64[D]') - 1
+        has_sales = days > 0
+        pk = np.full(has_sales.sum(), str(utility.pk))
+        rd = np.datetime_as_string(months)
+
+        self.writers['revenue'].write(
+            pk, np.full(len(pk), 'C1'), np.datetime_as_string(first)[has_sales],
+            np.datetime_as_string(last)[has_sales], np.full(len(pk), f'{capacity:.2f}'),
+            days[has_sales].astype(str), _fmt(kwh[has_sales], '%.2f'),
+            _fmt(amount[has_sales], '%.2f'), _fmt(amount[has_sales] * TAX_RATE, '%.2f'),
+            _fmt(kwh[has_sales] / np.maximum(days[has_sales], 1), '%.2f'),
+            rd[has_sales])
+
+        used = capacity * self.rng.uniform(0.02, 0.06, len(months)) * 30
+        self.writers['expense'].write(
+            np.full(len(months), str(utility.pk)), _fmt(used, '%.2f'),
+            _fmt(used * 25, '%.2f'), _fmt(used * 25 * TAX_RATE, '%.2f'), rd)
+
+    def _curtailment(self, plant_pk, curtailed):
+        count = curtailed.sum()
+        if not count:
+            return
+        start = self.rng.integers(9, 13, count)
+        length = self.rng.integers(1, 5, count)
+        self.writers['curtailment'].write(
+            np.full(count, str(plant_pk)), self.date_str[curtailed],
+            np.char.mod('%02d:00:00', start),
+            np.char.mod('%02d:00:00', np.minimum(start + length, 17)),
+            self.rd[curtailed])
+
+    def _mail(self, plant, logger_missing):
+        # One alert mail on the first day of every logger outage
+        starts = logger_missing & ~np.concatenate(([False], logger_missing[:-1]))
+        count = starts.sum()
+        if not count:
+            return
+        dates = self.date_str[starts]
+        minutes = self.rng.integers(0, 24 * 60, count)
+        clock = np.char.add(np.char.mod('%02d:', minutes // 60),
+                            np.char.mod('%02d', minutes % 60))
+        stamps = np.char.add(np.char.add(dates, ' '), clock)
+        impact = np.where(self.rng.random(count) < 0.3, 'Major', 'Minor')
+        body = np.char.add(f'"Logger {plant.system_id} stopped reporting on ',
+                           np.char.add(dates, '."'))
+        self.writers['mail'].write(
+            np.full(count, 'monitoring@example.com'),
+            np.full(count, 'operations@example.com'), dates, stamps,
+            np.full(count, f'"Communication lost: {plant.system_id}"'), body, impact,
+            np.full(count, ''))
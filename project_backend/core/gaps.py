@@ -0,0 +1,55 @@
+"""
+Data-gap detection for daily time series.
+
+`find_gaps` returns the dates missing for each entity (logger, plant) in a
+date range with a single SQL statement: the entities that should report get
+sentinel rows the day before and after the range, and every jump of more
+than one day between consecutive dates (window LAG) is a gap. Leading,
+trailing and entirely missing ranges come out of the same comparison.
+"""
+from django.db import connections
+
+GAPS_SQL = """
+WITH series AS (
+    SELECT entity_id, day FROM ({series}) AS s (entity_id, day)
+), expected AS (
+    SELECT entity_id, name FROM ({entities}) AS e (entity_id, name)
+), points AS (
+    SELECT entity_id, day FROM series
+    UNION ALL SELECT entity_id, %s::date - 1 FROM expected
+    UNION ALL SELECT entity_id, %s::date + 1 FROM expected
+), ordered AS (
+    SELECT entity_id, day,
+           LAG(day) OVER (PARTITION BY entity_id ORDER BY day) AS previous
+    FROM points
+)
+SELECT o.entity_id, e.name, o.previous + 1, o.day - 1, o.day - o.previous - 1
+FROM ordered o LEFT JOIN expected e ON e.entity_id = o.entity_id
+WHERE o.day - o.previous > 1
+ORDER BY e.name, o.entity_id, o.previous
+"""
+
+
+def find_gaps(queryset, entity_field, date_field, entities, name_field, start, end):
+    """Return [{entity_id, name, gaps: [{start, end, days}]}] for entities with gaps.
+
+    `queryset` is the (already filtered) time series, `entities` the
+    queryset of entities expected to report and `name_field` their label.
+    """
+    series = queryset.filter(**{f'{date_field}__range': (start, end)}) \
+        .order_by().values_list(entity_field, date_field)
+    expected = entities.order_by().values_list('id', name_field)
+    series_sql, series_params = series.query.sql_with_params()
+    entities_sql, entities_params = expected.query.sql_with_params()
+
+    sql = GAPS_SQL.format(series=series_sql, entities=entities_sql)
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, (*series_params, *entities_params, start, end))
+        rows = cursor.fetchall()
+
+    results = []
+    for entity_id, name, gap_start, gap_end, days in rows:
+        if not results or results[-1]['entity_id'] != entity_id:
+            results.append({'entity_id': entity_id, 'name': name, 'gaps': []})
+        results[-1]['gaps'].append({'start': gap_start, 'end': gap_end, 'days': days})
+    return results
@@ -0,0 +1,158 @@
+"""
+Intraday (15-minute) generation of the loggers.
+
+A LoggerIntraday row holds one logger's day: its 96 interval values (kWh
+generated in each 15 minutes, NaN where the logger sent nothing) packed
+into one binary column of little-endian float64, instead of 96 rows.
+`store` merges uploaded intervals into the day and derives the day's
+LoggerPowerGen.power_gen as their sum, through the model, so the anomaly,
+summary and closed-month signals see it like any other reading.
+
+`series` reads days back as one (timestamps, values) pair per logger,
+which `lttb` thins to a number of points for charts and `aggregate`
+rolls up into coarser intervals. Timestamps are the plant's local time
+at the start of each interval.
+"""
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+
+from . import models
+
+INTERVAL_MINUTES = 15
+SAMPLES_PER_DAY = 24 * 60 // INTERVAL_MINUTES
+DTYPE = np.dtype('<f8')
+AGGREGATES = ('sum', 'mean', 'max')
+
+_STEP = np.timedelta64(INTERVAL_MINUTES, 'm')
+
+
+def pack(samples):
+    return np.asarray(samples, dtype=DTYPE).tobytes()
+
+
+def unpack(data):
+    """The day's samples of a packed column (bytes or the memoryview from psycopg)."""
+    return np.frombuffer(bytes(data), dtype=DTYPE)
+
+
+def slot(value):
+    """Index of the interval starting at 'HH:MM' (ValueError off a boundary)."""
+    hours, minutes = map(int, value.split(':'))
+    if not (0 <= hours < 24 and 0 <= minutes < 60) or minutes % INTERVAL_MINUTES:
+        raise ValueError(f'Intervals start every {INTERVAL_MINUTES} minutes (HH:MM).')
+    return (hours * 60 + minutes) // INTERVAL_MINUTES
+
+
+def total(samples):
+    """Daily kWh of a day's samples, or None when it has none."""
+    present = samples[~np.isnan(samples)]
+    if not len(present):
+        return None
+    return Decimal(str(float(present.sum()))).quantize(Decimal('0.0001'))
+
+
+def store(logger, day, values, start=0, user=None):
+    """Merge `values` (None keeps the stored value) into the logger's day from `start`.
+
+    Returns the LoggerIntraday row; the day's LoggerPowerGen is set to the
+    sum of its samples.
+    """
+    if start < 0 or start + len(values) > SAMPLES_PER_DAY:
+        raise ValueError(f'A day has {SAMPLES_PER_DAY} intervals; '
+                         f'{len(values)} from slot {start} do not fit.')
+    update = np.array([np.nan if value is None else value for value in values],
+                      dtype=DTYPE)
+    owner = {'user': user} if user is not None else {}
+
+    with transaction.atomic():
+        row, _ = models.LoggerIntraday.objects.get_or_create(
+            logger_name=logger, date=day,
+            defaults={'samples': pack(np.full(SAMPLES_PER_DAY, np.nan)), **owner})
+        row = models.LoggerIntraday.objects.select_for_update().get(pk=row.pk)
+        samples = unpack(row.samples).copy()
+        window = samples[start:start + len(update)]
+        given = ~np.isnan(update)
+        window[given] = update[given]
+
+        row.samples = pack(samples)
+        row.sample_count = int((~np.isnan(samples)).sum())
+        if user is not None:
+            row.user = user
+        row.save()
+
+        daily = total(samples)
+        if daily is not None:
+            models.LoggerPowerGen.objects.update_or_create(
+                logger_name=logger, date=day, defaults={'power_gen': daily, **owner})
+    return row
+
+
+def series(rows):
+    """{logger: (timestamps, values)} of ordered (logger, date, packed samples) rows."""
+    days = {}
+    for logger, day, data in rows:
+        days.setdefault(logger, []).append((day, unpack(data)))
+    result = {}
+    for logger, readings in days.items():
+        offsets = np.arange(SAMPLES_PER_DAY) * _STEP
+        times = np.concatenate([np.datetime64(day, 'm') + offsets
+                                for day, _ in readings])
+        result[logger] = times, np.concatenate([samples for _, samples in readings])
+    return result
+
+
+def lttb(times, values, threshold):
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points keeping the shape.
+
+    NaN values must be dropped beforehand.
+    """
+    count = len(values)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+    x = times.astype(np.int64).astype(float)
+    y = values
+    # Bucket i of the inner points spans edges[i]:edges[i + 1]
+    edges = (np.arange(threshold - 1) * (count - 2) // (threshold - 2)) + 1
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, count - 1
+    selected = 0
+    for bucket in range(threshold - 2):
+        low, high = edges[bucket], edges[bucket + 1]
+        after = (slice(high, edges[bucket + 2]) if bucket + 2 < len(edges)
+                 else slice(count - 1, count))
+        cx, cy = x[after].mean(), y[after].mean()
+        area = np.abs((x[selected] - cx) * (y[low:high] - y[selected])
+                      - (x[selected] - x[low:high]) * (cy - y[selected]))
+        selected = low + int(np.argmax(area))
+        keep[bucket + 1] = selected
+    return keep
+
+
+def aggregate(times, values, minutes, how='sum'):
+    """(timestamps, values) rolled up into `minutes` intervals; NaN where empty."""
+    if minutes % INTERVAL_MINUTES or minutes <= 0:
+        raise ValueError(
+            f'The interval must be a multiple of {INTERVAL_MINUTES} minutes.')
+    if not len(values):
+        return times, values
+    keys = times.astype('datetime64[m]').astype(np.int64) // minutes
+    unique, starts = np.unique(keys, return_index=True)
+    present = ~np.isnan(values)
+    counts = np.add.reduceat(present.astype(int), starts)
+    if how == 'max':
+        result = np.fmax.reduceat(values, starts)
+    else:
+        result = np.add.reduceat(np.where(present, values, 0.0), starts)
+        if how == 'mean':
+            result = result / np.maximum(counts, 1)
+    result[counts == 0] = np.nan
+    return (unique * minutes).astype('datetime64[m]'), result
+
+
+def points(times, values):
+    """[['YYYY-MM-DDTHH:MM', value or None], ...] for the API."""
+    labels = np.datetime_as_string(times, unit='m')
+    return [[label, None if np.isnan(value) else round(float(value), 4)]
+            for label, value in zip(labels, values)]
@@ -0,0 +1,135 @@
+"""
+Clear-sky irradiation of the power plants from their geometry.
+
+`clear_sky` returns the daily clear-sky irradiation on the horizontal
+(GHI) and on the plant's modules (GTI) in kWh/m2 for every plant and day
+at once, as (plants x days) arrays. The day is sampled at STEPS instants
+of solar time and every step is an array operation over
+plants x days x steps, in chunks of days bounded by CHUNK_ELEMENTS.
+
+The model chain:
+
+* solar geometry: declination (Cooper) and the hour angle of each step;
+  integrating over the solar day covers all daylight of the civil day,
+  so longitude and the equation of time drop out of daily totals;
+* clear-sky beam (DNI): Meinel's attenuation of the extraterrestrial
+  normal irradiance over the air mass (Young), with Laue's altitude
+  correction; diffuse (DHI) is 10% of the beam;
+* plane of array: the beam on a surface of the plant's tilt and azimuth
+  (degrees clockwise from north, 180 = facing south) plus isotropic sky
+  diffuse and ground reflection with ALBEDO.
+
+Clear-sky values are an upper bound of a day's irradiation;
+core/performance.py scales them by each plant's observed clearness when
+it fills in days without GisWeather.
+"""
+import numpy as np
+from django.conf import settings
+
+from . import arrays
+
+SOLAR_CONSTANT = 1.367  # kW/m2
+STEPS = getattr(settings, 'IRRADIANCE_STEPS_PER_DAY', 24)
+ALBEDO = getattr(settings, 'IRRADIANCE_ALBEDO', 0.2)
+CHUNK_ELEMENTS = getattr(settings, 'IRRADIANCE_CHUNK_ELEMENTS', 2_000_000)
+# Largest plants x days grid the clear-sky endpoint computes per request
+MAX_PLANT_DAYS = getattr(settings, 'IRRADIANCE_MAX_PLANT_DAYS', 400_000)
+
+
+def _day_terms(days):
+    """(declination in radians, extraterrestrial normal irradiance kW/m2) of `days`."""
+    dates = days.astype('datetime64[D]')
+    day_of_year = (dates - dates.astype('datetime64[Y]')).astype(np.int64) + 1
+    declination = np.radians(23.44) * np.sin(2 * np.pi * (284 + day_of_year) / 365.0)
+    normal = SOLAR_CONSTANT * (1 + 0.033 * np.cos(2 * np.pi * day_of_year / 365.0))
+    return declination, normal
+
+
+def _air_mass(cos_z):
+    """Relative optical air mass at zenith cosine `cos_z` > 0 (Young 1994)."""
+    c = np.float32
+    return ((c(1.002432) * cos_z + c(0.148386)) * cos_z + c(0.0096467)) / (
+        ((cos_z + c(0.149864)) * cos_z + c(0.0102963)) * cos_z + c(0.000303978))
+
+
+def clear_sky(latitude, altitude, tilt, azimuth, days):
+    """Daily clear-sky (GHI, GTI) in kWh/m2, each (plants x days).
+
+    `latitude`, `tilt` and `azimuth` are per-plant degrees, `altitude`
+    per-plant metres and `days` int64 days since the epoch.
+    """
+    # float32 halves the memory traffic of the plants x days x steps arrays;
+    # sums are float64
+    latitude, altitude, tilt, azimuth = (
+        np.asarray(values, dtype=np.float32)[:, None, None]
+        for values in (latitude, altitude, tilt, azimuth))
+    days = np.asarray(days, dtype=np.int64)
+    ghi = np.empty((latitude.shape[0], len(days)))
+    gti = np.empty_like(ghi)
+    if not ghi.size:
+        return ghi, gti
+
+    hour_angle = np.radians(15.0 * ((np.arange(STEPS) + 0.5) * 24.0 / STEPS - 12.0))
+    hour_angle = hour_angle.astype(np.float32)
+    cos_w, sin_w = np.cos(hour_angle), np.sin(hour_angle)
+    phi, beta = np.radians(latitude), np.radians(tilt)
+    # Surface azimuth from south, west positive (Duffie & Beckman)
+    gamma = np.radians(azimuth - 180.0)
+    sin_phi, cos_phi = np.sin(phi), np.cos(phi)
+    sin_beta, cos_beta = np.sin(beta), np.cos(beta)
+    sin_gamma, cos_gamma = np.sin(gamma), np.cos(gamma)
+    attenuation = 1 - 0.14 * np.clip(altitude / 1000.0, 0.0, None)
+    ground = ALBEDO * (1 - cos_beta[:, :, 0]) / 2.0
+    # Diffuse is 10% of the beam, seen by the modules through the sky and the ground
+    diffuse_view = 0.1 * ((1 + cos_beta[:, :, 0]) / 2.0 + ground)
+    hours = 24.0 / STEPS
+
+    plants = latitude.shape[0]
+    chunk = max(1, CHUNK_ELEMENTS // (plants * STEPS))
+    for first in range(0, len(days), chunk):
+        declination, normal = _day_terms(days[first:first + chunk])
+        count = len(declination)
+        sin_d = np.sin(declination).astype(np.float32)[:, None]
+        cos_d = np.cos(declination).astype(np.float32)[:, None]
+        normal = normal.astype(np.float32)
+
+        # cos(zenith) and cos(incidence) are linear in cos/sin of the hour angle
+        cos_zenith = sin_phi * sin_d + (cos_phi * cos_d) * cos_w
+        cos_incidence = (sin_d * (sin_phi * cos_beta - cos_phi * sin_beta * cos_gamma)
+                         + (cos_d * (cos_phi * cos_beta
+                                     + sin_phi * sin_beta * cos_gamma)) * cos_w
+                         + (cos_d * sin_beta * sin_gamma) * sin_w)
+
+        # Only the daylight steps (about half) go on, as flat arrays
+        daylight = np.flatnonzero(cos_zenith > 0)
+        cell = daylight // STEPS
+        cos_z = cos_zenith.ravel()[daylight]
+        cos_i = np.clip(cos_incidence.ravel()[daylight], 0.0, None)
+        plant = cell // count
+        keep = attenuation.ravel()[plant]
+        transmittance = np.exp(np.float32(np.log(0.7))
+                               * _air_mass(cos_z) ** np.float32(0.678))
+        beam = normal[cell % count] * (keep * transmittance + (1 - keep))
+
+        size = plants * count
+        beam_sum = np.bincount(cell, beam, size).reshape(plants, count) * hours
+        beam_horizontal = (np.bincount(cell, beam * cos_z, size)
+                           .reshape(plants, count) * hours)
+        beam_tilted = (np.bincount(cell, beam * cos_i, size)
+                       .reshape(plants, count) * hours)
+
+        span = slice(first, first + count)
+        ghi[:, span] = beam_horizontal + 0.1 * beam_sum
+        gti[:, span] = beam_tilted + ground * beam_horizontal + diffuse_view * beam_sum
+    return ghi, gti
+
+
+def plant_clear_sky(plants, start, end):
+    """(plant ids, epoch days, GHI, GTI) of PowerPlantDetail rows, start to end."""
+    rows = list(plants.order_by('pk').values_list('pk', 'latitude', 'altitude', 'tilt',
+                                                  'azimuth'))
+    ids, latitude, altitude, tilt, azimuth = arrays.columns(rows, 5)
+    days = np.arange(arrays.days([start])[0], arrays.days([end])[0] + 1)
+    ghi, gti = clear_sky(arrays.floats(latitude), arrays.floats(altitude),
+                         arrays.floats(tilt), arrays.floats(azimuth), days)
+    return np.array(ids, dtype=np.int64), days, ghi, gti
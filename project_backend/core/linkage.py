@@ -0,0 +1,42 @@
+"""
+Helpers that link the utility and logger side of a plant to its
+PowerPlantDetail row.
+
+A `UtilityPlantId` or `LoggerCategory` belongs to a PowerPlantDetail of the
+same group when its `alter_plant_id` (or its own name) equals the plant's
+`system_id`.
+"""
+from . import models
+
+
+def _link(entities, name_field):
+    """Return {entity_pk: PowerPlantDetail values dict} for `entities`."""
+    entities = list(
+        entities.values_list('id', name_field, 'alter_plant_id', 'group_id'))
+    if not entities:
+        return {}
+
+    names = ({name for _, name, _, _ in entities}
+             | {alt for _, _, alt, _ in entities if alt})
+    plants = models.PowerPlantDetail.objects.filter(
+        system_id__in=names,
+        group_id__in={group_id for _, _, _, group_id in entities},
+    ).values('id', 'system_id', 'group_id', 'capacity_dc', 'latitude', 'longitude')
+    by_key = {(plant['group_id'], plant['system_id']): plant for plant in plants}
+
+    links = {}
+    for pk, name, alter_plant_id, group_id in entities:
+        plant = by_key.get((group_id, alter_plant_id)) or by_key.get((group_id, name))
+        if plant:
+            links[pk] = plant
+    return links
+
+
+def utility_plant_links(utility_plants):
+    """Map UtilityPlantId pks in the `utility_plants` queryset to their plant."""
+    return _link(utility_plants, 'plant_id')
+
+
+def logger_links(loggers):
+    """Map LoggerCategory pks in the `loggers` queryset to their plant."""
+    return _link(loggers, 'logger_name')
@@ -0,0 +1,260 @@
+"""
+Live push of new and changed readings.
+
+Saves and deletes of the models in STREAMS send a Postgres NOTIFY on
+LIVE_CHANNEL with the stream, the row id and its group. NOTIFY is
+transactional, so it is delivered once the write commits and never for a
+rolled back one.
+
+Each ASGI worker runs one `Hub`: a single connection LISTENing on the
+channel, registered with the event loop, that loads the changed rows
+(serialized as the REST endpoint does) once per batch of notifications
+and hands them to the subscribers whose streams and groups match. The
+subscribers are the open Server-Sent Events responses of `/live/`; a
+client that falls LIVE_QUEUE_SIZE events behind is dropped and
+reconnects. Rows written without signals (bulk_create, COPY) are not
+pushed.
+
+EventSource cannot send the Authorization header, so browsers open the
+stream with a ticket instead of their token: `issue_ticket` signs the
+user id with a timestamp, and the ticket is only accepted for
+LIVE_TICKET_MAX_AGE seconds, keeping the long-lived token out of URLs
+and access logs.
+"""
+import asyncio
+import json
+import logging
+
+import psycopg2
+import psycopg2.extensions
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+
+from . import models, names, serializers
+
+logger = logging.getLogger(__name__)
+
+ENABLED = getattr(settings, 'LIVE_ENABLED', True)
+CHANNEL = getattr(settings, 'LIVE_CHANNEL', 'solar_live')
+HEARTBEAT = getattr(settings, 'LIVE_HEARTBEAT', 15)
+QUEUE_SIZE = getattr(settings, 'LIVE_QUEUE_SIZE', 1000)
+RECONNECT_DELAY = getattr(settings, 'LIVE_RECONNECT_DELAY', 5)
+TICKET_MAX_AGE = getattr(settings, 'LIVE_TICKET_MAX_AGE', 60)
+
+# stream: (model, serializer, (FK, names kind) of the entity whose group the row
+# belongs to; None for ungrouped rows)
+STREAMS = {
+    'logger-power-gen': (models.LoggerPowerGen, serializers.LoggerPowerGenSerializer,
+                         ('logger_name', 'logger')),
+    'mail-notifications': (models.MailNotificatione,
+                           serializers.MailNotificationeSerializer, None),
+}
+MODEL_STREAMS = {model: name for name, (model, _, _) in STREAMS.items()}
+
+_TICKET_SALT = 'core.live.ticket'
+
+
+def issue_ticket(user):
+    """Signed ticket opening a stream as `user`, valid for TICKET_MAX_AGE seconds."""
+    return signing.TimestampSigner(salt=_TICKET_SALT).sign(str(user.pk))
+
+
+def ticket_user_id(ticket):
+    """Id of the user of a valid, unexpired ticket, or None."""
+    try:
+        signer = signing.TimestampSigner(salt=_TICKET_SALT)
+        return int(signer.unsign(ticket, max_age=TICKET_MAX_AGE))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def group_of(instance, grouped_by, using=DEFAULT_DB_ALIAS):
+    """Group id of a row of a grouped stream, from the names cache when it knows it."""
+    field, kind = grouped_by
+    entity_id = getattr(instance, f'{field}_id')
+    group_id = names.group_of(kind, entity_id)
+    if group_id is None:
+        # An entity created in this transaction: the cache reloads after the commit
+        model = names.KINDS[kind][0]
+        group_id = (model.objects.using(using).filter(pk=entity_id)
+                    .values_list('group_id', flat=True).first())
+    return group_id
+
+
+def publish(instance, op, using=DEFAULT_DB_ALIAS):
+    """NOTIFY listeners that `instance` was 'saved' or 'deleted' (sent on commit)."""
+    connection = connections[using]
+    if not ENABLED or connection.vendor != 'postgresql':
+        return
+    stream = MODEL_STREAMS[type(instance)]
+    grouped_by = STREAMS[stream][2]
+    payload = {'stream': stream, 'op': op, 'id': instance.pk,
+               'group': group_of(instance, grouped_by, using) if grouped_by else None}
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, json.dumps(payload)])
+
+
+def load(events):
+    """Serialized rows of the 'saved' events, {(stream, id): row}."""
+    wanted = {}
+    for event in events:
+        if event['op'] == 'saved':
+            wanted.setdefault(event['stream'], set()).add(event['id'])
+    rows = {}
+    close_old_connections()
+    for stream, ids in wanted.items():
+        model, serializer, _ = STREAMS[stream]
+        for row in serializer(model.objects.filter(pk__in=ids), many=True).data:
+            rows[(stream, row['id'])] = row
+    return rows
+
+
+def message(event_id, stream, data):
+    """One Server-Sent Events message."""
+    return f'id: {event_id}\nevent: {stream}\ndata: {json.dumps(data, default=str)}\n\n'
+
+
+class Subscriber:
+    """One open event stream: the streams and groups (None: all) it wants; its queue."""
+
+    def __init__(self, streams, groups):
+        self.streams = streams
+        self.groups = groups
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.dropped = False
+
+    def wants(self, event):
+        return event['stream'] in self.streams and (
+            self.groups is None or event['group'] is None
+            or event['group'] in self.groups)
+
+    def offer(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Too slow: end the response, the client reconnects and refetches.
+            self.dropped = True
+
+    async def events(self, hub):
+        """Response body: retry hint, `ready`, then matching events and keepalives."""
+        try:
+            yield (f'retry: {RECONNECT_DELAY * 1000}\n'
+                   + message(0, 'ready', {'streams': sorted(self.streams)}))
+            while not self.dropped:
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield item
+        finally:
+            hub.unsubscribe(self)
+
+
+class Hub:
+    """The LISTEN connection of this worker and the subscribers it fans out to."""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.loop = None
+        self.connection = None
+        self.pending = []
+        self.sequence = 0
+        self.lock = None
+
+    def subscribe(self, streams, groups=None):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.close()
+            self.loop = loop
+            self.lock = asyncio.Lock()
+            loop.create_task(self.listen())
+        subscriber = Subscriber(streams, groups)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    def close(self):
+        if self.connection is not None:
+            self.loop.remove_reader(self.connection.fileno())
+            self.connection.close()
+            self.connection = None
+
+    async def listen(self, resync=False):
+        """Open the LISTEN connection, retrying until the database answers."""
+        while self.connection is None:
+            try:
+                params = connections[DEFAULT_DB_ALIAS].get_connection_params()
+                connect = sync_to_async(psycopg2.connect, thread_sensitive=False)
+                connection = await connect(**params)
+                connection.set_isolation_level(
+                    psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                connection.cursor().execute(f'LISTEN {CHANNEL}')
+            except psycopg2.Error:
+                logger.exception('Cannot LISTEN on %s; retrying in %ss',
+                                 CHANNEL, RECONNECT_DELAY)
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            self.connection = connection
+            self.loop.add_reader(connection.fileno(), self.readable)
+        if resync:
+            # Events may have been missed while disconnected
+            self.broadcast(None, 'resync', {})
+
+    def readable(self):
+        try:
+            self.connection.poll()
+        except psycopg2.Error:
+            logger.exception('Lost the LISTEN connection on %s', CHANNEL)
+            self.close()
+            self.loop.create_task(self.listen(resync=True))
+            return
+        fresh = not self.pending
+        while self.connection.notifies:
+            try:
+                self.pending.append(json.loads(self.connection.notifies.pop(0).payload))
+            except ValueError:
+                logger.warning('Ignoring a malformed notification on %s', CHANNEL)
+        if fresh and self.pending:
+            self.loop.create_task(self.dispatch())
+
+    async def dispatch(self):
+        """Load and fan out the notifications received so far, one batch at a time."""
+        async with self.lock:
+            events, self.pending = self.pending, []
+            if not any(subscriber.wants(event)
+                       for event in events for subscriber in self.subscribers):
+                return
+            try:
+                rows = await sync_to_async(load)(events)
+            except Exception:
+                logger.exception('Cannot load %s live events', len(events))
+                self.broadcast(None, 'resync', {})
+                return
+            self.fan_out(events, rows)
+
+    def fan_out(self, events, rows):
+        for event in events:
+            if event['op'] == 'saved':
+                row = rows.get((event['stream'], event['id']))
+                if row is None:
+                    # Deleted again before it was loaded
+                    continue
+                data = {'op': 'saved', 'row': row}
+            else:
+                data = {'op': 'deleted', 'id': event['id']}
+            self.broadcast(event, event['stream'], data)
+
+    def broadcast(self, event, stream, data):
+        self.sequence += 1
+        item = message(self.sequence, stream, data)
+        for subscriber in list(self.subscribers):
+            if event is None or subscriber.wants(event):
+                subscriber.offer(item)
+
+
+hub = Hub()
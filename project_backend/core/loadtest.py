@@ -0,0 +1,238 @@
+"""
+End-to-end HTTP load driver for the deployed `/solar-api/core/` stack.
+
+Requests are drawn from a weighted mix and started open-loop at a fixed
+target rate (request i is due at i / rate seconds), so a slow backend shows
+up as growing latency instead of a silently lower request rate. Latency is
+measured from the scheduled start and therefore includes time spent waiting
+for a free connection. Driven by the `loadtest` management command.
+"""
+import asyncio
+import bisect
+import json
+import math
+import random
+import statistics
+import time
+from collections import Counter
+from datetime import date
+
+import httpx
+
+API = '/solar-api/core'
+TOKEN_PATH = '/solar-api/user/token/'
+
+# Upper bounds (ms) of the histogram buckets; the last bucket is open.
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+# Typical dashboard traffic; {group}, {month} and {day} are filled in per run.
+DEFAULT_MIX = [
+    {'name': 'loggercategories', 'weight': 10,
+     'path': API + '/loggercategories/?group_name={group}'},
+    {'name': 'logger-power-gen', 'weight': 25,
+     'path': API + '/logger-power-gen/?group_name={group}&year_month={month}'},
+    {'name': 'gis-weather-data', 'weight': 15,
+     'path': API + '/gis-weather-data/?group_name={group}&year_month={month}'},
+    {'name': 'utility-daily-production', 'weight': 15,
+     'path': API + '/utility-daily-production/?group_name={group}&rd={month}'},
+    {'name': 'utility-monthly-revenue', 'weight': 10,
+     'path': API + '/utility-monthly-revenue/?group_name={group}&rd={month}'},
+    {'name': 'curtailment-event', 'weight': 10,
+     'path': API + '/curtailment-event/?group_name={group}'},
+    {'name': 'utility-plants-list', 'weight': 10,
+     'path': API + '/utility-plants-list/?group_name={group}'},
+    {'name': 'mail-notifications', 'weight': 5,
+     'path': API + '/mail-notifications/?start_date={day}&end_date={day}'},
+]
+
+
+def load_mix(path=None):
+    """Return the request mix of a JSON file shaped like DEFAULT_MIX, or the default."""
+    if not path:
+        return DEFAULT_MIX
+    with open(path) as f:
+        mix = json.load(f)
+    for entry in mix:
+        if not {'name', 'path'} <= entry.keys():
+            raise ValueError(f'Mix entries need "name" and "path": {entry}')
+    return mix
+
+
+def expand(mix, groups, month=None, day=None):
+    """Fill the placeholders of every mix entry.
+
+    Entries with a {group} placeholder give one path per group; the others
+    do not depend on the group and give a single path with their weight.
+    """
+    today = date.today()
+    month = month or today.strftime('%Y-%m')
+    day = day or f'{month}-01'
+    return [
+        (entry['name'], entry['path'].format(group=group, month=month, day=day),
+         entry.get('weight', 1))
+        for entry in mix
+        for group in (groups if '{group}' in entry['path'] else groups[:1])
+    ]
+
+
+class Histogram:
+    """Latency samples of one endpoint."""
+
+    def __init__(self):
+        self.samples = []
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.bytes = 0
+
+    def add(self, latency_ms, status=None, size=0, error=None):
+        self.samples.append(latency_ms)
+        if error:
+            self.errors[error] += 1
+        else:
+            self.statuses[status] += 1
+            self.bytes += size
+
+    def summary(self, elapsed):
+        count = len(self.samples)
+        failed = sum(self.errors.values()) + sum(
+            n for status, n in self.statuses.items() if status >= 400)
+        ordered = sorted(self.samples)
+        buckets = [0] * (len(BUCKETS_MS) + 1)
+        for sample in ordered:
+            buckets[bisect.bisect_left(BUCKETS_MS, sample)] += 1
+
+        def percentile(q):
+            if not count:
+                return None
+            return round(ordered[min(count - 1, math.ceil(q / 100 * count) - 1)], 2)
+
+        return {
+            'requests': count,
+            'errors': failed,
+            'error_rate': round(failed / count, 4) if count else 0,
+            'throughput_rps': round(count / elapsed, 2) if elapsed else 0,
+            'mean_ms': round(statistics.fmean(ordered), 2) if count else None,
+            'p50_ms': percentile(50),
+            'p90_ms': percentile(90),
+            'p95_ms': percentile(95),
+            'p99_ms': percentile(99),
+            'max_ms': round(ordered[-1], 2) if count else None,
+            'bytes': self.bytes,
+            'statuses': {str(status): n for status, n in sorted(self.statuses.items())},
+            'exceptions': dict(self.errors),
+            'histogram_ms': {
+                (f'<={bound}' if i < len(BUCKETS_MS) else f'>{BUCKETS_MS[-1]}'): n
+                for i, (bound, n) in enumerate(zip(BUCKETS_MS + [None], buckets))
+            },
+        }
+
+
+async def obtain_token(client, email, password):
+    response = await client.post(TOKEN_PATH,
+                                 data={'email': email, 'password': password})
+    if response.status_code != 200:
+        raise RuntimeError(
+            f'Login failed ({response.status_code}): {response.text[:200]}')
+    return response.json()['token']
+
+
+async def _run(base_url, requests, rate, duration, concurrency, tokens, timeout, verify,
+               seed, transport):
+    rng = random.Random(seed)
+    names, paths, weights = zip(*requests)
+    results = {name: Histogram() for name in names}
+    limits = httpx.Limits(max_connections=concurrency,
+                          max_keepalive_connections=concurrency)
+    in_flight = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout,
+                                 verify=verify, transport=transport) as client:
+        async def fire(index, due):
+            name, path = names[index], paths[index]
+            headers = {'Authorization': f'Token {tokens[index % len(tokens)]}'}
+            async with in_flight:
+                try:
+                    response = await client.get(path, headers=headers)
+                except httpx.HTTPError as exc:
+                    results[name].add((time.perf_counter() - due) * 1000,
+                                      error=type(exc).__name__)
+                else:
+                    results[name].add((time.perf_counter() - due) * 1000,
+                                      response.status_code, len(response.content))
+
+        started = time.perf_counter()
+        total = int(rate * duration)
+        tasks = []
+        for i in range(total):
+            due = started + i / rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            index = rng.choices(range(len(paths)), weights)[0]
+            tasks.append(asyncio.create_task(fire(index, due)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    return results, elapsed
+
+
+def run(base_url, requests, rate, duration, concurrency=50, token=None, email=None,
+        password=None, timeout=30.0, verify=True, seed=0, transport=None):
+    """Drive the mix against `base_url` and return the JSON-serialisable report.
+
+    `transport` replaces the network (an httpx.AsyncBaseTransport, for tests).
+    """
+
+    async def main():
+        tokens = [token] if token else None
+        if not tokens:
+            async with httpx.AsyncClient(base_url=base_url, timeout=timeout,
+                                         verify=verify, transport=transport) as client:
+                tokens = [await obtain_token(client, email, password)]
+        return await _run(base_url, requests, rate, duration, concurrency, tokens,
+                          timeout, verify, seed, transport)
+
+    results, elapsed = asyncio.run(main())
+    overall = Histogram()
+    for histogram in results.values():
+        overall.samples += histogram.samples
+        overall.statuses.update(histogram.statuses)
+        overall.errors.update(histogram.errors)
+        overall.bytes += histogram.bytes
+    return {
+        'base_url': base_url,
+        'target_rps': rate,
+        'duration_s': round(elapsed, 2),
+        'concurrency': concurrency,
+        'total': overall.summary(elapsed),
+        'endpoints': {name: histogram.summary(elapsed)
+                      for name, histogram in sorted(results.items())},
+    }
+
+
+def text_report(report):
+    """Render a report as a fixed-width table followed by per-endpoint histograms."""
+    lines = [
+        f"{report['base_url']}  target {report['target_rps']} rps  "
+        f"{report['duration_s']} s  concurrency {report['concurrency']}",
+        '',
+        f"{'endpoint':<28}{'reqs':>8}{'rps':>9}{'err%':>8}"
+        f"{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}",
+    ]
+    rows = list(report['endpoints'].items()) + [('TOTAL', report['total'])]
+    for name, s in rows:
+        lines.append(
+            f"{name:<28}{s['requests']:>8}{s['throughput_rps']:>9}"
+            f"{s['error_rate'] * 100:>8.2f}{s['p50_ms'] or 0:>9}{s['p95_ms'] or 0:>9}"
+            f"{s['p99_ms'] or 0:>9}{s['max_ms'] or 0:>9}")
+
+    for name, s in rows:
+        lines += ['', f'{name} latency (ms)']
+        peak = max(s['histogram_ms'].values()) or 1
+        for bucket, n in s['histogram_ms'].items():
+            if n:
+                bar = '#' * max(1, round(40 * n / peak))
+                lines.append(f'  {bucket:>8} {n:>8} {bar}')
+        if s['exceptions'] or any(int(status) >= 400 for status in s['statuses']):
+            lines.append(f"  statuses {s['statuses']} exceptions {s['exceptions']}")
+    return '\n'.join(lines)
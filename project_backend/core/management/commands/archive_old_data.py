@@ -0,0 +1,46 @@
+"""
+Move rows older than the retention policy into the compressed archive.
+
+    python manage.py archive_old_data [--model core.loggerpowergen]
+                                      [--dry-run] [--vacuum]
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import archive
+
+
+class Command(BaseCommand):
+    help = 'Archive whole months older than DATA_RETENTION_DAYS out of the hot tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append',
+                            help='Model label (e.g. core.loggerpowergen); '
+                                 'repeatable. Default: all.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the rows that would move.')
+        parser.add_argument('--vacuum', action='store_true',
+                            help='VACUUM ANALYZE each table afterwards.')
+
+    def handle(self, *args, **options):
+        policies = {archive.label(model): model for model in archive.POLICIES}
+        labels = options['model'] or list(policies)
+        unknown = set(labels) - set(policies)
+        if unknown:
+            raise CommandError(f"Unknown model(s) {', '.join(sorted(unknown))}; "
+                               f"choose from {', '.join(policies)}.")
+
+        for name in labels:
+            model = policies[name]
+            started = time.monotonic()
+            months = archive.archive_model(model, dry_run=options['dry_run'])
+            for month, count in months.items():
+                self.stdout.write(f'{name} {month:%Y-%m}: {count} rows')
+            verb = 'Would archive' if options['dry_run'] else 'Archived'
+            elapsed = time.monotonic() - started
+            self.stdout.write(self.style.SUCCESS(
+                f'{verb} {sum(months.values())} {name} rows older than '
+                f'{archive.horizon(model)} in {elapsed:.1f}s'))
+            if options['vacuum'] and months and not options['dry_run']:
+                archive.vacuum(model)
@@ -0,0 +1,100 @@
+"""
+Benchmark the core API in-process against a throwaway test database.
+
+    python manage.py benchmark_api [--groups 2 --loggers 20 --days 90 --repeat 20]
+        [--baseline benchmarks/baseline.json] [--save-baseline] [--output run.json]
+        [--tolerance 0.25] [--latency-tolerance 0.5]
+
+Exits with an error when a scenario needs more queries or memory than in the
+committed baseline (or more time, with --latency-tolerance).
+"""
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases,
+    teardown_test_environment,
+)
+
+from core import benchmark
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = 'Measure latency, query count and memory of every core endpoint path.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--groups', type=int, default=2)
+        parser.add_argument('--loggers', type=int, default=20,
+                            help='Loggers (and plants) per group.')
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Timed calls per scenario.')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Store this run as the new baseline instead of '
+                                 'comparing.')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Accepted relative peak memory growth (default 0.25).')
+        parser.add_argument('--latency-tolerance', type=float,
+                            help='Also fail on p50/p95 growth beyond this fraction; '
+                                 'only meaningful against a baseline recorded on the '
+                                 'same machine.')
+        parser.add_argument('--output',
+                            help='Also write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            volume = options['groups'], options['loggers'], options['days']
+            token = benchmark.seed(*volume)
+            results = benchmark.run(token, *volume, repeat=options['repeat'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        run = {
+            'volume': {key: options[key]
+                       for key in ('groups', 'loggers', 'days', 'repeat')},
+            'results': results,
+        }
+        self.report(results)
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(run, indent=2))
+
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(run, indent=2))
+            self.stdout.write(self.style.SUCCESS(f'Baseline saved to {baseline_path}'))
+            return
+        if not baseline_path.exists():
+            raise CommandError(
+                f'No baseline at {baseline_path}; run with --save-baseline.')
+
+        baseline = json.loads(baseline_path.read_text())
+        if baseline.get('volume') != run['volume']:
+            self.stdout.write(self.style.WARNING(
+                'Baseline was recorded with other volumes; comparing anyway.'))
+        regressions = benchmark.compare(results, baseline['results'],
+                                        options['latency_tolerance'],
+                                        options['tolerance'])
+        if regressions:
+            raise CommandError(
+                'Performance regressions:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against baseline.'))
+
+    def report(self, results):
+        header = (f"{'scenario':45} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+                  f"{'queries':>8} {'peak KB':>9} {'bytes':>10}")
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:45} {row['p50_ms']:9.2f} {row['p95_ms']:9.2f} "
+                f"{row['p99_ms']:9.2f} {row['queries']:8d} {row['peak_kb']:9.1f} "
+                f"{row['bytes']:10d}")
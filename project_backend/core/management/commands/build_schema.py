@@ -0,0 +1,51 @@
+"""
+Write the OpenAPI schema served at /solar-api/schema/, or check it.
+
+    python manage.py build_schema            # regenerate OPENAPI_SCHEMA_PATH
+    python manage.py build_schema --check    # fail when it differs from the code
+
+Run it after changing views, serializers or filters, and commit the file.
+"""
+import difflib
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import openapi
+
+
+class Command(BaseCommand):
+    help = 'Generate the OpenAPI schema file, or with --check fail when it is stale.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Do not write; exit with an error when the file '
+                                 'differs from the code.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        generated = openapi.generate()
+        current = openapi.read()
+
+        if options['check']:
+            if current is None:
+                raise CommandError(
+                    f'{openapi.SCHEMA_PATH} is missing; run manage.py build_schema.')
+            if current != generated:
+                diff = difflib.unified_diff(
+                    current.decode().splitlines(), generated.decode().splitlines(),
+                    'committed', 'generated', lineterm='', n=1)
+                self.stdout.write('\n'.join(list(diff)[:200]))
+                raise CommandError(f'{openapi.SCHEMA_PATH} is out of date; '
+                                   'run manage.py build_schema.')
+            self.stdout.write(self.style.SUCCESS(
+                f'{openapi.SCHEMA_PATH} is up to date.'))
+            return
+
+        if current == generated:
+            self.stdout.write(self.style.SUCCESS(f'{openapi.SCHEMA_PATH} unchanged.'))
+            return
+        openapi.write(generated)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {openapi.SCHEMA_PATH} ({len(generated)} bytes) in {elapsed:.1f}s'))
@@ -0,0 +1,49 @@
+"""
+Close a group's month and write its snapshots, or reopen it.
+
+    python manage.py close_month --group NAME --month 2024-06 [--reopen]
+"""
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import models, snapshots
+
+
+class Command(BaseCommand):
+    help = ('Freeze a month of a group and serve its standard list responses from '
+            'precompressed snapshots.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', required=True,
+                            help='LoggerPlantGroup (group_name).')
+        parser.add_argument('--month', required=True, help='Month to close (YYYY-MM).')
+        parser.add_argument('--reopen', action='store_true',
+                            help='Reopen the month and delete its snapshots.')
+        parser.add_argument('--user-id', type=int, default=1,
+                            help='User recorded as closing the month.')
+
+    def handle(self, *args, **options):
+        if not re.fullmatch(r'\d{4}-(0[1-9]|1[0-2])', options['month']):
+            raise CommandError('--month must be YYYY-MM.')
+        group = models.LoggerPlantGroup.objects.filter(
+            group_name=options['group']).first()
+        if group is None:
+            raise CommandError(f"Group '{options['group']}' does not exist.")
+
+        if options['reopen']:
+            reopened = snapshots.reopen(group.pk, options['month'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Reopened {group.group_name} {options['month']}" if reopened else
+                f"{group.group_name} {options['month']} was not closed"))
+            return
+
+        user = get_user_model().objects.filter(pk=options['user_id']).first()
+        if user is None:
+            raise CommandError(f"User {options['user_id']} does not exist.")
+        closed = snapshots.close(group, options['month'], user)
+        for name, info in closed.files.items():
+            self.stdout.write(f"{name}: {info['bytes']} bytes")
+        self.stdout.write(self.style.SUCCESS(
+            f"Closed {group.group_name} {options['month']}"))
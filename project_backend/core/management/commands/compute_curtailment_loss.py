@@ -0,0 +1,36 @@
+"""
+Batch job estimating the energy lost to curtailment events.
+
+    python manage.py compute_curtailment_loss [--group NAME] [--rd YYYY-MM]
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import models
+from core.curtailment import compute_group_losses
+
+
+class Command(BaseCommand):
+    help = 'Estimate lost kWh for curtailment events, one vectorised pass per group.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', help='Only this LoggerPlantGroup (group_name).')
+        parser.add_argument('--rd', help='Only events of this month (YYYY-MM).')
+
+    def handle(self, *args, **options):
+        groups = models.LoggerPlantGroup.objects.all()
+        if options['group']:
+            groups = groups.filter(group_name=options['group'])
+            if not groups.exists():
+                raise CommandError(f"Group '{options['group']}' does not exist.")
+
+        total, started = 0, time.monotonic()
+        for group in groups:
+            count = compute_group_losses(group, rd=options['rd'])
+            total += count
+            self.stdout.write(f'{group.group_name}: {count} events')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {total} curtailment loss estimates in {elapsed:.1f}s'))
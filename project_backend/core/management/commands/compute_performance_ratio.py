@@ -0,0 +1,46 @@
+"""
+Batch job computing expected yield and performance ratio per plant-day.
+
+    python manage.py compute_performance_ratio [--group NAME]
+                                               [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+"""
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import models
+from core.performance import compute_group_ratios
+
+
+class Command(BaseCommand):
+    help = 'Compute and store performance ratios for each group over a date range.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', help='Only this LoggerPlantGroup (group_name).')
+        parser.add_argument('--start', type=date.fromisoformat,
+                            help='First day (default: 30 days before --end).')
+        parser.add_argument('--end', type=date.fromisoformat,
+                            help='Last day (default: yesterday).')
+
+    def handle(self, *args, **options):
+        end = options['end'] or date.today() - timedelta(days=1)
+        start = options['start'] or end - timedelta(days=30)
+        if start > end:
+            raise CommandError('--start must not be after --end.')
+
+        groups = models.LoggerPlantGroup.objects.all()
+        if options['group']:
+            groups = groups.filter(group_name=options['group'])
+            if not groups.exists():
+                raise CommandError(f"Group '{options['group']}' does not exist.")
+
+        total, started = 0, time.monotonic()
+        for group in groups:
+            count = compute_group_ratios(group, start, end)
+            total += count
+            self.stdout.write(f'{group.group_name}: {count} plant-days')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {total} performance ratios for {start}..{end} in {elapsed:.1f}s'))
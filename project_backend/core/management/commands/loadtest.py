@@ -0,0 +1,79 @@
+"""
+Replay a weighted mix of authenticated dashboard requests at a target rate.
+
+    python manage.py loadtest --url https://example.com:8443 \
+        --email me@example.com --password ... --rate 50 --duration 120 \
+        --groups G1,G2 --month 2024-06 --output report.json
+"""
+import json
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+
+from core import loadtest, models
+
+
+class Command(BaseCommand):
+    help = ('Drive the deployed API with concurrent requests and report latency, '
+            'errors and throughput.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000',
+                            help='Base URL of nginx or gunicorn.')
+        parser.add_argument('--rate', type=float, default=20,
+                            help='Target requests per second.')
+        parser.add_argument('--duration', type=float, default=60,
+                            help='Seconds to send requests for.')
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help='Maximum requests in flight.')
+        parser.add_argument('--token',
+                            help='API token (else log in with --email/--password).')
+        parser.add_argument('--email')
+        parser.add_argument('--password')
+        parser.add_argument('--groups', help='Comma separated group names '
+                                             '(default: groups in this database).')
+        parser.add_argument('--month',
+                            help='YYYY-MM used by the mix (default: current month).')
+        parser.add_argument('--mix',
+                            help='JSON file with [{"name", "path", "weight"}] entries.')
+        parser.add_argument('--timeout', type=float, default=30.0,
+                            help='Per request timeout in seconds.')
+        parser.add_argument('--insecure', action='store_true',
+                            help='Do not verify TLS certificates.')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed of the request sequence.')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        if not options['token'] and not (options['email'] and options['password']):
+            raise CommandError('Pass --token or --email and --password.')
+        if (options['rate'] <= 0 or options['duration'] <= 0
+                or options['concurrency'] < 1):
+            raise CommandError('--rate, --duration and --concurrency must be positive.')
+
+        if options['groups']:
+            groups = [name.strip() for name in options['groups'].split(',')
+                      if name.strip()]
+        else:
+            groups = list(models.LoggerPlantGroup.objects.order_by('group_name')
+                          .values_list('group_name', flat=True)[:20])
+        if not groups:
+            raise CommandError('No groups found; pass --groups.')
+
+        try:
+            mix = loadtest.load_mix(options['mix'])
+            requests = loadtest.expand(mix, groups, month=options['month'])
+            report = loadtest.run(
+                options['url'].rstrip('/'), requests, options['rate'],
+                options['duration'], concurrency=options['concurrency'],
+                token=options['token'], email=options['email'],
+                password=options['password'], timeout=options['timeout'],
+                verify=not options['insecure'], seed=options['seed'],
+            )
+        except (OSError, ValueError, KeyError, RuntimeError, httpx.HTTPError) as exc:
+            raise CommandError(str(exc))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+        self.stdout.write(loadtest.text_report(report))
@@ -0,0 +1,59 @@
+"""
+Build the monthly portfolio reports of every group in parallel.
+
+    python manage.py portfolio_report --month YYYY-MM [--group NAME ...]
+        [--workers N] [--format csv,html,xlsx]
+"""
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import models, reports
+
+
+class Command(BaseCommand):
+    help = ('Write per-group monthly reports (CSV/HTML/XLSX) under REPORT_ROOT '
+            'using a process pool.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', required=True, help='Report month (YYYY-MM).')
+        parser.add_argument('--group', action='append',
+                            help='Only this group (group_name); repeatable.')
+        parser.add_argument('--workers', type=int,
+                            help='Worker processes (default: CPU count).')
+        parser.add_argument('--format', default=','.join(reports.FORMATS),
+                            help='Comma separated subset of '
+                                 f"{', '.join(reports.FORMATS)}.")
+
+    def handle(self, *args, **options):
+        rd = options['month']
+        if not re.fullmatch(r'\d{4}-(0[1-9]|1[0-2])', rd):
+            raise CommandError('--month must be YYYY-MM.')
+        formats = [name.strip() for name in options['format'].split(',')
+                   if name.strip()]
+        unknown = set(formats) - set(reports.FORMATS)
+        if unknown:
+            raise CommandError(f"Unknown format(s) {', '.join(sorted(unknown))}.")
+
+        groups = models.LoggerPlantGroup.objects.order_by('group_name')
+        if options['group']:
+            groups = groups.filter(group_name__in=options['group'])
+            found = groups.values_list('group_name', flat=True)
+            missing = set(options['group']) - set(found)
+            if missing:
+                raise CommandError(f"Unknown group(s) {', '.join(sorted(missing))}.")
+        groups = list(groups.values_list('id', 'group_name'))
+
+        started = time.monotonic()
+        results = []
+        for result in reports.generate_all(groups, rd, formats, options['workers']):
+            group_name, _, paths, seconds = result
+            self.stdout.write(f'{group_name}: {len(paths)} files in {seconds:.1f}s')
+            results.append(result)
+        index = reports.write_index(rd, results, formats)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {len(results)} group reports for {rd} to '
+            f'{reports.REPORT_ROOT / rd} ({", ".join(path.name for path in index)}) '
+            f'in {elapsed:.1f}s'))
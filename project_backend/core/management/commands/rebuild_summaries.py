@@ -0,0 +1,26 @@
+"""
+Recompute the per-logger and per-plant summaries from the readings.
+
+Writes keep them current; this is for the initial backfill or after
+loads that bypass model signals.
+
+    python manage.py rebuild_summaries
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import summaries
+
+
+class Command(BaseCommand):
+    help = ('Recompute LoggerSummary and UtilityPlantSummary from LoggerPowerGen and '
+            'UtilityDailyProduction.')
+
+    def handle(self, *args, **options):
+        for series, spec in summaries.SPECS.items():
+            started = time.monotonic()
+            count = summaries.refresh(series)
+            elapsed = time.monotonic() - started
+            self.stdout.write(self.style.SUCCESS(
+                f'{spec.summary.__name__}: {count} rows in {elapsed:.1f}s'))
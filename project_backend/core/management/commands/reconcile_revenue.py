@@ -0,0 +1,66 @@
+"""
+Reconcile UtilityMonthlyRevenue against UtilityDailyProduction.
+
+    python manage.py reconcile_revenue (--rd YYYY-MM | --year YYYY) [--group NAME]
+        [--tolerance 0.01] [--days-tolerance 0] [--output report.csv]
+"""
+import csv
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import models, reconciliation
+
+
+class Command(BaseCommand):
+    help = 'Report plant-months whose revenue and production disagree or are missing.'
+
+    def add_arguments(self, parser):
+        period = parser.add_mutually_exclusive_group(required=True)
+        period.add_argument('--rd', type=reconciliation.check_month,
+                            help='Month to reconcile (YYYY-MM).')
+        period.add_argument('--year', type=int,
+                            help='Reconcile every month of this year.')
+        parser.add_argument('--group', help='Only this LoggerPlantGroup (group_name).')
+        parser.add_argument('--tolerance', type=Decimal, default=Decimal('0.01'),
+                            help='Accepted relative kWh difference (default 0.01).')
+        parser.add_argument('--days-tolerance', type=int, default=0,
+                            help='Accepted difference in days (default 0).')
+        parser.add_argument('--output', help='Write every row to this CSV file.')
+
+    def handle(self, *args, **options):
+        months = ([options['rd']] if options['rd']
+                  else reconciliation.year_months(options['year']))
+        plants = models.UtilityPlantId.objects.all()
+        if options['group']:
+            plants = plants.filter(group__group_name=options['group'])
+            if not plants.exists():
+                raise CommandError(f"Group '{options['group']}' has no utility plants.")
+
+        started = time.monotonic()
+        report = reconciliation.reconcile(
+            plants, months, options['tolerance'], options['days_tolerance'])
+
+        if options['output']:
+            with open(options['output'], 'w', newline='') as handle:
+                fieldnames = list(report[0]) if report else ['plant_id']
+                writer = csv.DictWriter(handle, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(report)
+
+        for row in report:
+            if row['status'] != reconciliation.OK:
+                self.stdout.write(
+                    f"{row['plant_id']} {row['rd']}: {row['status']} "
+                    f"(sold {row['sales_electricity_kwh']} kWh"
+                    f" / {row['sales_days']} d, "
+                    f"produced {row['production_kwh']} kWh"
+                    f" / {row['production_days']} d)")
+
+        summary = ', '.join(f'{status}={count}' for status, count in
+                            sorted(Counter(row['status'] for row in report).items()))
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciled {len(report)} plant-months in {elapsed:.1f}s: {summary}'))
@@ -0,0 +1,138 @@
+"""
+Per-route request metrics shared across gunicorn workers.
+
+Each worker aggregates counters in process memory (a dict update per
+request) and at most every FLUSH_INTERVAL seconds writes them to its own
+file `METRICS_DIR/worker-<pid>.json` (write to a temp file, then rename).
+The metrics endpoint sums all worker files, so counters of workers that
+have exited keep counting, and renders them in the Prometheus text format.
+An idle worker's last unflushed requests show up with its next request or
+when it exits.
+"""
+import atexit
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+METRICS_DIR = getattr(settings, 'METRICS_DIR',
+                      os.path.join(tempfile.gettempdir(), 'solar-metrics'))
+FLUSH_INTERVAL = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+# Latency histogram upper bounds in seconds (Prometheus `le` labels)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Position of each counter in a series; histogram buckets follow.
+COUNT, SECONDS, QUERIES, QUERY_SECONDS, ROWS, BYTES = range(6)
+FIELDS = 6
+
+_series = {}
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def record(method, route, status, seconds, queries, query_seconds, rows, size):
+    """Add one request to this worker's counters (flushing to disk if due)."""
+    global _last_flush
+    key = f'{method} {route} {status}'
+    bucket = FIELDS
+    for bound in BUCKETS:
+        if seconds <= bound:
+            break
+        bucket += 1
+    with _lock:
+        series = _series.get(key)
+        if series is None:
+            series = _series[key] = [0] * (FIELDS + len(BUCKETS) + 1)
+        series[COUNT] += 1
+        series[SECONDS] += seconds
+        series[QUERIES] += queries
+        series[QUERY_SECONDS] += query_seconds
+        series[ROWS] += rows
+        series[BYTES] += size
+        series[bucket] += 1
+        due = time.monotonic() - _last_flush >= FLUSH_INTERVAL
+        if due:
+            _last_flush = time.monotonic()
+            snapshot = {key: list(values) for key, values in _series.items()}
+    if due:
+        _write(snapshot)
+
+
+def _write(snapshot):
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=METRICS_DIR, prefix='.tmp-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(path, os.path.join(METRICS_DIR, f'worker-{os.getpid()}.json'))
+    except OSError:
+        pass  # Metrics must never break a request.
+
+
+def flush():
+    with _lock:
+        snapshot = {key: list(values) for key, values in _series.items()}
+    if snapshot:
+        _write(snapshot)
+
+
+atexit.register(flush)
+
+
+def collect():
+    """Sum the counters of every worker file."""
+    flush()
+    total = {}
+    for path in glob.glob(os.path.join(METRICS_DIR, 'worker-*.json')):
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for key, values in snapshot.items():
+            current = total.get(key)
+            total[key] = (values if current is None
+                          else [a + b for a, b in zip(current, values)])
+    return total
+
+
+def _labels(key):
+    method, route, status = key.split(' ', 2)
+    route = route.replace('\\', '\\\\').replace('"', '\\"')
+    return f'method="{method}",route="{route}",status="{status}"'
+
+
+def _number(value):
+    return str(value) if isinstance(value, int) else f'{value:.6f}'
+
+
+def render(total):
+    """Render summed counters in the Prometheus text exposition format."""
+    counters = [
+        ('solar_request_sql_queries_total', 'SQL queries executed', QUERIES),
+        ('solar_request_sql_seconds_total', 'Time spent in SQL queries', QUERY_SECONDS),
+        ('solar_request_rows_total', 'Rows serialized in responses', ROWS),
+        ('solar_response_bytes_total', 'Response body bytes', BYTES),
+    ]
+    lines = [
+        '# HELP solar_request_duration_seconds Request latency',
+        '# TYPE solar_request_duration_seconds histogram',
+    ]
+    histogram = 'solar_request_duration_seconds'
+    for key in sorted(total):
+        values, labels = total[key], _labels(key)
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), values[FIELDS:]):
+            cumulative += count
+            lines.append(f'{histogram}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{histogram}_sum{{{labels}}} {values[SECONDS]:.6f}')
+        lines.append(f'{histogram}_count{{{labels}}} {values[COUNT]}')
+    for name, description, index in counters:
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+        lines += [f'{name}{{{_labels(key)}}} {_number(total[key][index])}'
+                  for key in sorted(total)]
+    return '\n'.join(lines) + '\n'
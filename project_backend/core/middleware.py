@@ -0,0 +1,90 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics, profiling, replicas
+
+METERED_PREFIXES = ('/solar-api/core/', '/solar-api/user/')
+
+
+class QueryTimer:
+    """`connection.execute_wrapper` counting SQL statements and their time."""
+
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def _row_count(response):
+    data = getattr(response, 'data', None)
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        data = data['results']
+    if isinstance(data, list):
+        return len(data)
+    return 1 if data else 0
+
+
+class RequestMetricsMiddleware:
+    """Record latency, SQL count/time, rows and bytes of core and user API requests."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith(METERED_PREFIXES):
+            return self.get_response(request)
+
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        metrics.record(
+            request.method, match.view_name if match else 'unresolved',
+            response.status_code, elapsed, timer.count, timer.seconds,
+            _row_count(response), 0 if response.streaming else len(response.content),
+        )
+        return response
+
+
+class ProfilingMiddleware:
+    """Profile requests flagged with `X-Profile` / `?_profile=` (staff only)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = profiling.requested(request)
+        if mode is None:
+            return self.get_response(request)
+        return profiling.profile(request, self.get_response, mode)
+
+
+class ReadYourWritesMiddleware:
+    """Pin users to up-to-date databases after their successful write requests."""
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in self.SAFE_METHODS and response.status_code < 400:
+            replicas.pin(getattr(request, 'user', None))
+        return response
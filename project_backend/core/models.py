@@ -3,6 +3,7 @@ Creating the model to store the solar data.
 """
 from django.db import models
 from datetime import date
+from decimal import Decimal
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
@@ -88,6 +89,8 @@ class GisWeather(BaseModel):
 
     class Meta:
         unique_together = [('power_plant', 'date')]
+        # Date-only scans (admin date drill-down, fleet-wide ranges)
+        indexes = [models.Index(fields=['date'])]
 
     def __str__(self):
         return f'GIS data for {self.power_plant.system_id} on {self.date}'
@@ -114,6 +117,28 @@ class LoggerPowerGen(BaseModel):
 
     class Meta:
         unique_together = [('logger_name', 'date')]
+        indexes = [models.Index(fields=['date'])]
+
+
+"""
+15-minute generation of a logger's day, packed into one row
+(see core/intraday.py). The day's total is derived into LoggerPowerGen.
+"""
+
+
+class LoggerIntraday(BaseModel):
+    logger_name = models.ForeignKey(LoggerCategory, on_delete=models.CASCADE)
+    date = models.DateField()
+    # 96 little-endian float64 kWh per 15 minutes from 00:00, NaN where missing
+    samples = models.BinaryField()
+    sample_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = [('logger_name', 'date')]
+        indexes = [models.Index(fields=['date'])]
+
+    def __str__(self):
+        return f'Intraday generation of {self.logger_name} on {self.date}'
 
 
 """
@@ -181,6 +206,9 @@ class UtilityDailyProduction(BaseModel):
     class Meta:
         # Define unique constraint based on plant_id, period_year, and period_month
         unique_together = [('plant_id', 'production_date')]
+        # Monthly aggregates (reconciliation) group by plant and rd
+        indexes = [models.Index(fields=['plant_id', 'rd']),
+                   models.Index(fields=['production_date'])]
 
 
 # Curtailment model
@@ -236,4 +264,261 @@ class MailNotificatione(BaseModel):
 
     def __str__(self):
         return f"{self.subject} ({self.date})"
-    
\ No newline at end of file
+
+
+"""
+Estimated energy lost to curtailment, one row per CurtailmentEvent.
+Rows are produced by the `compute_curtailment_loss` batch job.
+"""
+
+
+class CurtailmentLoss(BaseModel):
+    BASIS_CHOICES = [
+        ('pvout', 'pvout'),
+        ('history', 'history'),
+    ]
+
+    event = models.OneToOneField(CurtailmentEvent, on_delete=models.CASCADE,
+                                 related_name='loss')
+    plant_id = models.ForeignKey(UtilityPlantId, on_delete=models.CASCADE)
+    date = models.DateField(null=True, blank=True)
+    expected_kwh = models.DecimalField(max_digits=12, decimal_places=2)
+    actual_kwh = models.DecimalField(max_digits=12, decimal_places=2,
+                                     blank=True, null=True)
+    window_share = models.DecimalField(max_digits=5, decimal_places=4)
+    lost_kwh = models.DecimalField(max_digits=12, decimal_places=2)
+    basis = models.CharField(max_length=10, choices=BASIS_CHOICES, default='history')
+    # Store year and month as a string in 'YYYY-MM' format
+    rd = models.CharField(max_length=7, blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['plant_id', 'rd'])]
+
+    def __str__(self):
+        return f"Curtailment loss for {self.plant_id.plant_id} on {self.date}"
+
+
+"""
+Expected versus actual yield per plant and day.
+Rows are produced by the `compute_performance_ratio` batch job.
+"""
+
+
+class PerformanceRatio(BaseModel):
+    SOURCE_CHOICES = [
+        ('logger', 'logger'),
+        ('utility', 'utility'),
+    ]
+    WEATHER_CHOICES = [
+        ('gis', 'gis'),
+        ('clear_sky', 'clear_sky'),
+    ]
+
+    power_plant = models.ForeignKey(PowerPlantDetail, on_delete=models.CASCADE)
+    date = models.DateField()
+    gti = models.DecimalField(max_digits=8, decimal_places=3)
+    pvout = models.DecimalField(max_digits=8, decimal_places=3)
+    # gti x capacity_dc, the energy at 100% performance ratio
+    reference_kwh = models.DecimalField(max_digits=12, decimal_places=2)
+    # pvout x capacity_dc, the modelled yield of the plant
+    expected_kwh = models.DecimalField(max_digits=12, decimal_places=2)
+    actual_kwh = models.DecimalField(max_digits=12, decimal_places=2,
+                                     blank=True, null=True)
+    pr = models.DecimalField(max_digits=7, decimal_places=4, blank=True, null=True)
+    # actual_kwh / expected_kwh
+    performance_index = models.DecimalField(max_digits=7, decimal_places=4,
+                                            blank=True, null=True)
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES,
+                              blank=True, null=True)
+    # Where gti/pvout came from: GisWeather, or the clear-sky engine for days without it
+    weather = models.CharField(max_length=10, choices=WEATHER_CHOICES, default='gis')
+
+    class Meta:
+        unique_together = [('power_plant', 'date')]
+        indexes = [models.Index(fields=['date'])]
+
+    def __str__(self):
+        return f'PR of {self.power_plant.system_id} on {self.date}'
+
+
+"""
+Incremental anomaly detection on LoggerPowerGen.
+The rolling statistics are updated as each row is written (see core/anomalies.py).
+"""
+
+
+class LoggerGenStats(BaseModel):
+    logger_name = models.OneToOneField(LoggerCategory, on_delete=models.CASCADE,
+                                       related_name='gen_stats')
+    last_date = models.DateField(null=True, blank=True)
+    # Trailing power_gen values, oldest first
+    window = models.JSONField(default=list)
+    median = models.FloatField(null=True, blank=True)
+    mad = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return f'Generation stats of {self.logger_name}'
+
+
+class GroupDayGenStats(BaseModel):
+    # Running sums of power_gen / trailing median over the loggers of a group on a date
+    group = models.ForeignKey(LoggerPlantGroup, on_delete=models.CASCADE)
+    date = models.DateField()
+    count = models.IntegerField(default=0)
+    ratio_sum = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = [('group', 'date')]
+
+
+class GenerationAnomaly(BaseModel):
+    logger_name = models.ForeignKey(LoggerCategory, on_delete=models.CASCADE)
+    group = models.ForeignKey(LoggerPlantGroup, on_delete=models.CASCADE)
+    date = models.DateField()
+    power_gen = models.DecimalField(max_digits=10, decimal_places=4)
+    # Trailing median and MAD of the logger before this reading
+    baseline = models.FloatField()
+    mad = models.FloatField()
+    score = models.FloatField()
+    ratio = models.FloatField()
+    peer_ratio = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        unique_together = [('logger_name', 'date')]
+        indexes = [models.Index(fields=['group', 'date'])]
+
+    def __str__(self):
+        return f'Generation anomaly of {self.logger_name} on {self.date}'
+
+
+"""
+On-demand profile of one API request (see core/profiling.py).
+"""
+
+
+class RequestProfile(BaseModel):
+    method = models.CharField(max_length=10)
+    path = models.TextField()
+    status_code = models.IntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.IntegerField()
+    query_ms = models.FloatField()
+    # pstats listing sorted by cumulative time
+    profile = models.TextField(blank=True)
+    # [{sql, params, ms, many}] in execution order
+    queries = models.JSONField(default=list)
+    # [{sql, ms, plan}] for the slowest SELECT statements
+    explains = models.JSONField(default=list)
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms:.0f} ms)'
+
+
+"""
+Cold archive: the rows of one series (entity) and month, zlib-compressed
+column-wise JSON. Written by `archive_old_data`, read by core/archive.py.
+"""
+
+
+class ArchivedChunk(BaseModel):
+    model_label = models.CharField(max_length=100)
+    # FK id of the series (logger, plant, utility plant); 0 for models without one
+    entity_id = models.BigIntegerField(default=0)
+    month = models.DateField()
+    row_count = models.IntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        unique_together = [('model_label', 'entity_id', 'month')]
+        indexes = [models.Index(fields=['model_label', 'month'])]
+
+    def __str__(self):
+        return (f'{self.model_label} #{self.entity_id} {self.month:%Y-%m} '
+                f'({self.row_count} rows)')
+
+
+"""
+Latest reading per logger and utility plant with the totals of its month
+and year, maintained on every save and delete of the readings (see
+core/summaries.py).
+"""
+
+
+class SummaryTotals:
+    """Month- and year-to-date as of today, from the totals up to `last_date`.
+
+    There is no reading after `last_date`, so a month or year that began
+    since then has nothing to date.
+    """
+
+    @property
+    def month_to_date(self):
+        return self.month_total if self.last_date >= date.today().replace(day=1) else 0
+
+    @property
+    def year_to_date(self):
+        new_year = date.today().replace(month=1, day=1)
+        return self.year_total if self.last_date >= new_year else 0
+
+    @staticmethod
+    def property_expressions(prefix=''):
+        """The properties above as expressions of the summary at `prefix`."""
+        today = date.today()
+
+        def to_date(total, since):
+            stale = models.When(**{f'{prefix}last_date__lt': since,
+                                   'then': models.Value(Decimal(0))})
+            return models.Case(stale, default=models.F(f'{prefix}{total}'),
+                               output_field=models.DecimalField())
+
+        return {
+            'month_to_date': to_date('month_total', today.replace(day=1)),
+            'year_to_date': to_date('year_total', today.replace(month=1, day=1)),
+        }
+
+
+class LoggerSummary(SummaryTotals, BaseModel):
+    logger_name = models.OneToOneField(LoggerCategory, on_delete=models.CASCADE,
+                                       related_name='summary')
+    last_date = models.DateField()
+    last_value = models.DecimalField(max_digits=10, decimal_places=4)
+    # Totals of last_date's month and year, up to last_date
+    month_total = models.DecimalField(max_digits=14, decimal_places=4)
+    year_total = models.DecimalField(max_digits=16, decimal_places=4)
+
+    def __str__(self):
+        return f'Summary of {self.logger_name}'
+
+
+class UtilityPlantSummary(SummaryTotals, BaseModel):
+    plant_id = models.OneToOneField(UtilityPlantId, on_delete=models.CASCADE,
+                                    related_name='summary')
+    last_date = models.DateField()
+    last_value = models.DecimalField(max_digits=10, decimal_places=2,
+                                     null=True, blank=True)
+    # Totals of last_date's month and year, up to last_date
+    month_total = models.DecimalField(max_digits=14, decimal_places=2)
+    year_total = models.DecimalField(max_digits=16, decimal_places=2)
+
+    def __str__(self):
+        return f'Summary of {self.plant_id}'
+
+
+"""
+A group's month closed for changes; its standard list responses are
+served from precompressed snapshot files (see core/snapshots.py).
+"""
+
+
+class ClosedMonth(BaseModel):
+    group = models.ForeignKey(LoggerPlantGroup, on_delete=models.CASCADE)
+    # Store year and month as a string in 'YYYY-MM' format
+    rd = models.CharField(max_length=7)
+    # {snapshot name: {bytes, sha256}}
+    files = models.JSONField(default=dict)
+
+    class Meta:
+        unique_together = [('group', 'rd')]
+
+    def __str__(self):
+        return f'{self.group} {self.rd} (closed)'
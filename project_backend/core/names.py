@@ -0,0 +1,163 @@
+"""
+Process-wide name -> id resolution for loggers, plants and groups.
+
+The API filters and serializers address series by name: `logger_name`,
+utility `plant_id`, `group_name` and the PowerPlantDetail `system_id`.
+Each worker keeps, per kind, the (id, name, group id) of every row in
+memory, loaded with one query from the primary on first use, so turning
+names into ids or a group into its members costs no query.
+
+Writes bump the kind's version in the shared cache once they commit (the
+save/delete signals, `get_or_create` and `invalidate` for bulk loads);
+every worker compares that version on each lookup and reloads when it
+changed. A name missing from the table is looked up in the database
+before it counts as unknown.
+
+`get_or_create` inserts with ON CONFLICT, so concurrent requests creating
+the same logger or plant both get the one row.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from . import models
+
+# kind -> (model, name field); every kind but `group` belongs to a group.
+KINDS = {
+    'logger': (models.LoggerCategory, 'logger_name'),
+    'plant': (models.UtilityPlantId, 'plant_id'),
+    'system': (models.PowerPlantDetail, 'system_id'),
+    'group': (models.LoggerPlantGroup, 'group_name'),
+}
+
+_tables = {}
+_lock = threading.Lock()
+_pending = threading.local()
+
+
+class _Table:
+    """Rows of one kind, by name and by group."""
+
+    def __init__(self, kind, version, rows):
+        self.kind = kind
+        self.version = version
+        self.by_name = defaultdict(list)
+        self.by_group = defaultdict(list)
+        self.by_id = {}
+        for row in rows:
+            self.add(row)
+
+    def add(self, row):
+        pk, name, group_id = row
+        if row not in self.by_name[name]:
+            self.by_name[name].append(row)
+            self.by_group[group_id].append(pk)
+            self.by_id[pk] = group_id
+
+
+def _columns(kind):
+    model, field = KINDS[kind]
+    return ['id', field] + (['group_id'] if kind != 'group' else [])
+
+
+def _query(kind, names=None):
+    model, field = KINDS[kind]
+    queryset = model.objects.using(DEFAULT_DB_ALIAS)
+    if names is not None:
+        queryset = queryset.filter(**{f'{field}__in': names})
+    rows = queryset.values_list(*_columns(kind))
+    return rows if kind != 'group' else [(pk, name, None) for pk, name in rows]
+
+
+def _version_key(kind):
+    return f'names:{kind}'
+
+
+def _table(kind):
+    version = cache.get(_version_key(kind))
+    if version is None:
+        cache.add(_version_key(kind), time.time_ns(), None)
+        version = cache.get(_version_key(kind))
+    with _lock:
+        table = _tables.get(kind)
+        if table is None or table.version != version:
+            table = _tables[kind] = _Table(kind, version, _query(kind))
+        return table
+
+
+def invalidate(kind=None):
+    """Make every worker reload `kind` (default: all kinds) on its next lookup."""
+    for name in [kind] if kind else KINDS:
+        cache.set(_version_key(name), time.time_ns(), None)
+
+
+def schedule_invalidate(kind):
+    """`invalidate(kind)` once the current transaction commits (once per kind)."""
+    if not hasattr(_pending, 'kinds'):
+        _pending.kinds = set()
+    _pending.kinds.add(kind)
+    transaction.on_commit(_flush)
+
+
+def _flush():
+    kinds = getattr(_pending, 'kinds', None)
+    while kinds:
+        invalidate(kinds.pop())
+
+
+def rows(kind, names):
+    """(id, name, group id) of the rows called `names`."""
+    table = _table(kind)
+    missing = [name for name in names if name not in table.by_name]
+    if missing:
+        found = _query(kind, missing)
+        if found:
+            # Written without signals (bulk load): this worker adds them,
+            # the others reload.
+            with _lock:
+                for row in found:
+                    table.add(row)
+            schedule_invalidate(kind)
+    return [row for name in names for row in table.by_name.get(name, ())]
+
+
+def ids(kind, names):
+    """Ids of the rows called `names` (unknown names are skipped)."""
+    return [row[0] for row in rows(kind, names)]
+
+
+def group_id(group_name):
+    """Id of the LoggerPlantGroup `group_name`, or None."""
+    found = ids('group', [group_name])
+    return found[0] if found else None
+
+
+def group_of(kind, pk):
+    """Group id of the logger, plant or system `pk`, or None if this worker lacks it."""
+    return _table(kind).by_id.get(pk)
+
+
+def members(kind, group_name):
+    """Ids of the loggers, plants or systems of the group `group_name`."""
+    pk = group_id(group_name)
+    return [] if pk is None else list(_table(kind).by_group.get(pk, ()))
+
+
+def get_or_create(kind, name):
+    """The logger or plant called `name`, created with the model defaults if new.
+
+    Known names return an instance holding only id, name and group (other
+    fields load on access) without a query.
+    """
+    model, field = KINDS[kind]
+    found = rows(kind, [name])
+    if found:
+        return model.from_db(DEFAULT_DB_ALIAS, _columns(kind), found[0])
+    instance, = model.objects.bulk_create([model(**{field: name})],
+                                          update_conflicts=True,
+                                          unique_fields=[field], update_fields=[field])
+    schedule_invalidate(kind)
+    return instance
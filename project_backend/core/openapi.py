@@ -0,0 +1,103 @@
+"""
+Pre-generated OpenAPI schema.
+
+Generating the schema introspects every view, serializer and filterset,
+which takes seconds of CPU. Instead `manage.py build_schema` writes it
+once to OPENAPI_SCHEMA_PATH (committed next to the code; `--check` fails
+when it no longer matches), and the schema endpoint serves that file:
+loaded once per process, rendered as YAML and JSON, each kept in memory
+plain and gzipped with an ETag derived from its content.
+
+Without the file (a fresh checkout) the schema is generated on the first
+request of each process instead.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import yaml
+from django.conf import settings
+from drf_spectacular.renderers import OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = getattr(settings, 'OPENAPI_SCHEMA_PATH',
+                      os.path.join(settings.BASE_DIR, 'openapi', 'schema.yml'))
+
+# format: (media type, file suffix)
+FORMATS = {
+    'yaml': ('application/vnd.oai.openapi; charset=utf-8', 'yaml'),
+    'json': ('application/vnd.oai.openapi+json; charset=utf-8', 'json'),
+}
+
+_documents = None
+_lock = threading.Lock()
+
+
+class Document:
+    """One rendering of the schema: its bytes, their gzip and ETag."""
+
+    def __init__(self, fmt, body):
+        self.media_type, suffix = FORMATS[fmt]
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:20]}-{fmt}"'
+        self.filename = f'{spectacular_settings.TITLE or "schema"}.{suffix}'
+
+
+def generate():
+    """The schema of the current code as YAML, as `manage.py spectacular` writes it."""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    return OpenApiYamlRenderer().render(generator.get_schema(request=None, public=True),
+                                        renderer_context={})
+
+
+def read():
+    """The YAML bytes of the schema file, or None without one."""
+    try:
+        with open(SCHEMA_PATH, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def write(content):
+    os.makedirs(os.path.dirname(SCHEMA_PATH), exist_ok=True)
+    with open(SCHEMA_PATH, 'wb') as f:
+        f.write(content)
+
+
+def documents():
+    """{format: Document} of the schema, loaded on first use."""
+    global _documents
+    if _documents is None:
+        with _lock:
+            if _documents is None:
+                content = read()
+                if content is None:
+                    logger.warning('No OpenAPI schema at %s; generating it '
+                                   '(run manage.py build_schema)', SCHEMA_PATH)
+                    content = generate()
+                loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+                schema = yaml.load(content, Loader=loader)
+                as_json = json.dumps(schema, indent=4, ensure_ascii=False)
+                _documents = {
+                    'yaml': Document('yaml', content),
+                    'json': Document('json', as_json.encode('utf-8')),
+                }
+    return _documents
+
+
+def requested_format(request):
+    """'json' when asked for by ?format= or the Accept header, else 'yaml'."""
+    fmt = request.GET.get('format', '')
+    if fmt in ('json', 'openapi-json'):
+        return 'json'
+    if fmt in ('yaml', 'openapi'):
+        return 'yaml'
+    accept = request.headers.get('Accept', '')
+    return 'json' if 'json' in accept and 'yaml' not in accept else 'yaml'
@@ -0,0 +1,194 @@
+"""
+Expected-versus-actual performance ratio engine.
+
+For every GisWeather plant-day of a group and date range:
+
+* reference_kwh = gti x capacity_dc    (energy at a performance ratio of 1)
+* expected_kwh  = pvout x capacity_dc  (modelled yield of the plant)
+* actual_kwh    = LoggerPowerGen summed over the plant's loggers, falling
+  back to UtilityDailyProduction of its utility plant
+* pr = actual / reference, performance_index = actual / expected
+
+Plant-days without GisWeather but with an actual yield are filled in from
+the clear-sky engine (core/irradiance.py) when PERFORMANCE_CLEAR_SKY_FALLBACK
+is on: the clear-sky GTI scaled by the plant's clearness over its days with
+weather in the range (gti / clear-sky gti, default DEFAULT_CLEARNESS), and
+pvout as that GTI times the plant's pvout / gti (default DEFAULT_YIELD).
+Such rows have `weather` = 'clear_sky'.
+
+Each source is read with a single query for the whole group and the ratios
+are computed as array operations, then upserted in batches.
+"""
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+
+from . import arrays, irradiance, models
+from .arrays import KEY_STRIDE, columns, group_sum, lookup
+from .linkage import logger_links, utility_plant_links
+
+# Ratios are stored with 7 digits; anything above this is a data error.
+MAX_RATIO = 999.0
+
+CLEAR_SKY_FALLBACK = getattr(settings, 'PERFORMANCE_CLEAR_SKY_FALLBACK', True)
+# Share of the clear-sky GTI reaching a plant with no weather in the range
+DEFAULT_CLEARNESS = getattr(settings, 'PERFORMANCE_DEFAULT_CLEARNESS', 0.6)
+# pvout (kWh/kWp) per kWh/m2 of GTI of a plant with no weather in the range
+DEFAULT_YIELD = getattr(settings, 'PERFORMANCE_DEFAULT_YIELD', 0.8)
+
+
+def _linked_actual(links, model, entity_field, date_field, value_field,
+                   start, end, keys):
+    """Sum `value_field` of the entities in `links` per linked plant-day `keys`."""
+    if not links:
+        return np.full(len(keys), np.nan)
+
+    rows = model.objects.filter(**{
+        f'{entity_field}__in': list(links),
+        f'{date_field}__range': (start, end),
+        f'{value_field}__isnull': False,
+    }).values_list(entity_field, date_field, value_field)
+    entities, dates, values = columns(list(rows), 3)
+
+    plant_of = lookup(
+        np.array(list(links), dtype=np.int64),
+        np.array([link['id'] for link in links.values()], dtype=float),
+        np.array(entities, dtype=np.int64),
+    ).astype(np.int64)
+    sum_keys, sums = group_sum(plant_of * KEY_STRIDE + arrays.days(dates),
+                               arrays.floats(values))
+    return lookup(sum_keys, sums, keys)
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = numerator / denominator
+    ratio[~(denominator > 0)] = np.nan
+    return np.clip(ratio, 0.0, MAX_RATIO)
+
+
+def _decimal(value, places):
+    return None if np.isnan(value) else Decimal(f'{value:.{places}f}')
+
+
+def _plant_ratio(plant_of, numerator, denominator, plants, default):
+    """Per plant sum(numerator) / sum(denominator) of its rows, else `default`."""
+    present = ~(np.isnan(numerator) | np.isnan(denominator))
+    unique, top = group_sum(plant_of[present], numerator[present])
+    _, bottom = group_sum(plant_of[present], denominator[present])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = top / bottom
+    ratio = lookup(unique[bottom > 0], ratio[bottom > 0], plants, default)
+    return np.where(np.isnan(ratio), default, ratio)
+
+
+def clear_sky_weather(group, start, end, measured_keys, measured_gti, measured_pvout):
+    """(keys, gti, pvout, capacity) modelled for `group` plant-days not measured."""
+    plants = models.PowerPlantDetail.objects.filter(group=group)
+    ids, days, _, clear_gti = irradiance.plant_clear_sky(plants, start, end)
+    if not len(ids):
+        return np.array([], dtype=np.int64), np.array([]), np.array([]), np.array([])
+    capacities = dict(plants.values_list('pk', 'capacity_dc'))
+    capacity = arrays.floats(capacities[pk] for pk in ids.tolist())
+
+    grid = (ids[:, None] * KEY_STRIDE + days[None, :]).ravel()
+    clear = clear_gti.ravel()
+    measured_plants = measured_keys // KEY_STRIDE
+    clear_measured = lookup(grid, clear, measured_keys)
+    clearness = _plant_ratio(measured_plants, measured_gti, clear_measured, ids,
+                             DEFAULT_CLEARNESS)
+    specific_yield = _plant_ratio(measured_plants, measured_pvout, measured_gti, ids,
+                                  DEFAULT_YIELD)
+
+    missing = ~np.isin(grid, measured_keys)
+    gti = (clear_gti * clearness[:, None]).ravel()
+    pvout = gti * np.repeat(specific_yield, len(days))
+    capacity = np.repeat(capacity, len(days))
+    return grid[missing], gti[missing], pvout[missing], capacity[missing]
+
+
+def compute_ratios(group, start, end):
+    """Return unsaved PerformanceRatio rows for `group` between start and end."""
+    weather = list(
+        models.GisWeather.objects
+        .filter(power_plant__group=group, date__range=(start, end))
+        .values_list('power_plant_id', 'date', 'gti', 'pvout',
+                     'power_plant__capacity_dc')
+    )
+    if not weather and not CLEAR_SKY_FALLBACK:
+        return []
+
+    plant_ids, dates, gti, pvout, capacity = columns(weather, 5)
+    keys = np.array(plant_ids, dtype=np.int64) * KEY_STRIDE + arrays.days(dates)
+    gti, pvout, capacity = (arrays.floats(gti), arrays.floats(pvout),
+                            arrays.floats(capacity))
+    modelled = np.zeros(len(keys), dtype=bool)
+    if CLEAR_SKY_FALLBACK:
+        extra = clear_sky_weather(group, start, end, keys, gti, pvout)
+        keys, gti, pvout, capacity = (
+            np.concatenate([measured, filled])
+            for measured, filled in zip((keys, gti, pvout, capacity), extra))
+        modelled = np.concatenate([modelled, np.ones(len(extra[0]), dtype=bool)])
+    if not len(keys):
+        return []
+
+    from_loggers = _linked_actual(
+        logger_links(models.LoggerCategory.objects.filter(group=group)),
+        models.LoggerPowerGen, 'logger_name', 'date', 'power_gen', start, end, keys)
+    from_utility = _linked_actual(
+        utility_plant_links(models.UtilityPlantId.objects.filter(group=group)),
+        models.UtilityDailyProduction, 'plant_id', 'production_date',
+        'power_production_kwh', start, end, keys)
+
+    use_loggers = ~np.isnan(from_loggers)
+    actual = np.where(use_loggers, from_loggers, from_utility)
+    # Modelled weather only matters where there is a yield to compare
+    keep = ~modelled | ~np.isnan(actual)
+    keys, gti, pvout, capacity, modelled, use_loggers, actual = (
+        values[keep]
+        for values in (keys, gti, pvout, capacity, modelled, use_loggers, actual))
+    reference = gti * capacity
+    expected = pvout * capacity
+    pr = _ratio(actual, reference)
+    performance_index = _ratio(actual, expected)
+
+    plant_ids = keys // KEY_STRIDE
+    dates = (keys % KEY_STRIDE).astype('datetime64[D]').tolist()
+    ratios = []
+    for i in range(len(keys)):
+        source = ('logger' if use_loggers[i]
+                  else 'utility' if not np.isnan(actual[i]) else None)
+        ratios.append(models.PerformanceRatio(
+            power_plant_id=int(plant_ids[i]),
+            date=dates[i],
+            gti=_decimal(gti[i], 3),
+            pvout=_decimal(pvout[i], 3),
+            reference_kwh=_decimal(reference[i], 2),
+            expected_kwh=_decimal(expected[i], 2),
+            actual_kwh=_decimal(actual[i], 2),
+            pr=_decimal(pr[i], 4),
+            performance_index=_decimal(performance_index[i], 4),
+            source=source,
+            weather='clear_sky' if modelled[i] else 'gis',
+        ))
+    return ratios
+
+
+def store_ratios(ratios):
+    """Insert or refresh PerformanceRatio rows in batched upserts."""
+    return models.PerformanceRatio.objects.bulk_create(
+        ratios,
+        batch_size=5000,
+        update_conflicts=True,
+        unique_fields=['power_plant', 'date'],
+        update_fields=['gti', 'pvout', 'reference_kwh', 'expected_kwh', 'actual_kwh',
+                       'pr', 'performance_index', 'source', 'weather', 'updated_at'],
+    )
+
+
+def compute_group_ratios(group, start, end):
+    """Compute and store the performance ratios of `group`; return the row count."""
+    ratios = compute_ratios(group, start, end)
+    store_ratios(ratios)
+    return len(ratios)
@@ -0,0 +1,164 @@
+"""
+On-demand profiling of single API requests for staff users.
+
+A request is profiled when it carries `X-Profile: 1` or `?_profile=1`
+and is made by a staff user (session or API token). The view runs under
+cProfile while every SQL statement is recorded with its timing; afterwards
+the slowest SELECT statements are re-run with `EXPLAIN (ANALYZE, BUFFERS)`
+inside a rolled back transaction. The result is stored as a RequestProfile
+(browsable in the admin) and its id returned in the `X-Profile-Id` header;
+with `download` instead of `1` the text report replaces the response.
+"""
+import cProfile
+import io
+import json
+import pstats
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.http import HttpResponse
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from . import models
+
+EXPLAIN_TOP = getattr(settings, 'PROFILE_EXPLAIN_TOP', 5)
+MAX_QUERIES = getattr(settings, 'PROFILE_MAX_QUERIES', 1000)
+STATS_LIMIT = getattr(settings, 'PROFILE_STATS_LIMIT', 60)
+
+STORE, DOWNLOAD = 'store', 'download'
+
+
+def requested(request):
+    """STORE, DOWNLOAD or None from the `X-Profile` header or `_profile` parameter."""
+    flag = request.META.get('HTTP_X_PROFILE') or request.GET.get('_profile')
+    if not flag:
+        return None
+    flag = flag.lower()
+    if flag == DOWNLOAD:
+        return DOWNLOAD
+    return STORE if flag in ('1', 'true', STORE) else None
+
+
+def _staff_user(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user if user.is_staff else None
+    try:
+        authenticated = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return authenticated[0] if authenticated and authenticated[0].is_staff else None
+
+
+def _jsonable(params):
+    return json.loads(json.dumps(params, default=str)) if params is not None else None
+
+
+class SqlRecorder:
+    """`connection.execute_wrapper` keeping every statement with its timing."""
+
+    def __init__(self):
+        self.queries = []
+
+    def wrapper(self, alias):
+        def record(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                self.queries.append({
+                    'alias': alias, 'sql': sql, 'params': params, 'many': many,
+                    'ms': (time.perf_counter() - started) * 1000,
+                })
+        return record
+
+
+def explain(query):
+    """Return the EXPLAIN (ANALYZE, BUFFERS) plan of a recorded SELECT."""
+    connection = connections[query['alias']]
+    try:
+        with transaction.atomic(using=query['alias']):
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {query['sql']}",
+                               query['params'])
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+            transaction.set_rollback(True, using=query['alias'])
+    except DatabaseError as exc:
+        plan = f'EXPLAIN failed: {exc}'
+    return plan
+
+
+def _is_select(sql):
+    return sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+
+
+def profile(request, get_response, mode):
+    """Run the rest of the middleware chain under the profiler."""
+    user = _staff_user(request)
+    if user is None:
+        return get_response(request)
+
+    recorder = SqlRecorder()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(
+                connection.execute_wrapper(recorder.wrapper(connection.alias)))
+        profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+    duration = (time.perf_counter() - started) * 1000
+
+    stats = io.StringIO()
+    pstats.Stats(profiler, stream=stats).sort_stats('cumulative').print_stats(
+        STATS_LIMIT)
+
+    queries = recorder.queries
+    slowest = sorted((q for q in queries if not q['many'] and _is_select(q['sql'])),
+                     key=lambda q: q['ms'], reverse=True)[:EXPLAIN_TOP]
+    explains = [{'sql': q['sql'], 'ms': round(q['ms'], 3), 'plan': explain(q)}
+                for q in slowest]
+
+    record = models.RequestProfile.objects.create(
+        user=user, method=request.method, path=request.get_full_path(),
+        status_code=response.status_code, duration_ms=duration,
+        query_count=len(queries), query_ms=sum(q['ms'] for q in queries),
+        profile=stats.getvalue(),
+        queries=[{'sql': q['sql'], 'params': _jsonable(q['params']),
+                  'ms': round(q['ms'], 3), 'many': q['many']}
+                 for q in queries[:MAX_QUERIES]],
+        explains=explains,
+    )
+
+    if mode == DOWNLOAD:
+        response = HttpResponse(render_report(record),
+                                content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = (
+            f'attachment; filename="profile-{record.pk}.txt"')
+    response['X-Profile-Id'] = str(record.pk)
+    return response
+
+
+def render_report(record):
+    """Plain text report of a RequestProfile."""
+    lines = [
+        f'{record.method} {record.path}',
+        f'status {record.status_code}  {record.duration_ms:.1f} ms  '
+        f'{record.query_count} queries in {record.query_ms:.1f} ms',
+        '',
+        '== Slowest SELECT statements (EXPLAIN ANALYZE, BUFFERS) ==',
+    ]
+    for item in record.explains:
+        lines += ['', f"-- {item['ms']} ms", item['sql'], '', item['plan']]
+    lines += ['', '== SQL statements ==']
+    for number, query in enumerate(record.queries, 1):
+        lines.append(f"{number:>4}. {query['ms']:>9.3f} ms  "
+                     f"{query['sql']}  {query['params']}")
+    lines += ['', '== Python profile ==', record.profile]
+    return '\n'.join(lines)
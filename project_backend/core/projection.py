@@ -0,0 +1,182 @@
+"""
+values() fast path for list serialization.
+
+Serializing a queryset with DRF builds a model instance per row, looks up
+every field through it and, for related fields such as `user` or
+`logger_name.logger_name`, loads the related row one query at a time.
+Most serializers in core/serializers.py only map fields to columns, so
+`for_serializer` turns such a serializer into one `values_list()`
+projection with the related names joined in (`user__email`,
+`logger_name__logger_name`, `plant_id__plant_id`). Each value still goes
+through the DRF field's `to_representation`, so the output is identical,
+without the instances.
+
+Nested serializers of one-to-one relations (the `summary` of loggers and
+plants) are joined in the same way, model properties through the query
+expressions the model gives for them (`property_expressions`), and the
+constant `extra_representation` of a serializer is added to every row.
+Serializers with any other custom `to_representation`, method fields,
+nullable relations, file fields or related models missing from
+STR_SOURCES are not compiled and serialize the usual way.
+"""
+from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import FileField, QuerySet
+from rest_framework import relations, serializers
+
+from . import models
+
+# Columns and formatter reproducing the __str__ of models shown through
+# StringRelatedField; None means the single column is the string.
+STR_SOURCES = {
+    get_user_model(): (['email'], None),
+    models.LoggerPlantGroup: (['group_name'], None),
+    models.LoggerCategory: (['logger_name'], None),
+    models.UtilityPlantId: (['plant_id'], None),
+    models.PowerPlantDetail: (['system_id', 'group__group_name'], '{} of {}'.format),
+}
+
+
+class Projection:
+    """The lookups of a values_list() and how each output field is built from them."""
+
+    def __init__(self, extra=None):
+        self.lookups = []
+        # alias -> expression of the lookups that are not columns
+        self.annotations = {}
+        # (output name, first column, column count, converter or None)
+        self.columns = []
+        self.extra = extra or {}
+
+    def add(self, name, lookups, convert):
+        self.columns.append((name, len(self.lookups), len(lookups), convert))
+        self.lookups += lookups
+
+    def item(self, row):
+        item = {}
+        for name, index, width, convert in self.columns:
+            value = row[index] if width == 1 else row[index:index + width]
+            if (value if width == 1 else value[0]) is None:
+                item[name] = None
+            else:
+                item[name] = convert(value) if convert else value
+        item.update(self.extra)
+        return item
+
+    def rows(self, queryset):
+        queryset = queryset.prefetch_related(None).annotate(**self.annotations)
+        return [self.item(row) for row in queryset.values_list(*self.lookups)]
+
+
+def _path(model, source_attrs):
+    """Model field at the end of `source_attrs`, or None if values() can't follow it."""
+    field = None
+    for position, attr in enumerate(source_attrs):
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if field.is_relation:
+            if not field.concrete or field.many_to_many or field.null:
+                return None
+            if position < len(source_attrs) - 1:
+                model = field.related_model
+        elif position < len(source_attrs) - 1:
+            return None
+    return field
+
+
+def _related(field, lookup, model_field):
+    """(lookups, converter) of a related DRF field, or None."""
+    if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+        return [lookup], None
+    if isinstance(field, relations.SlugRelatedField):
+        return [f'{lookup}__{field.slug_field}'], None
+    if (isinstance(field, relations.StringRelatedField)
+            and model_field.related_model in STR_SOURCES):
+        columns, formatter = STR_SOURCES[model_field.related_model]
+        convert = (lambda values: formatter(*values)) if formatter else None
+        return [f'{lookup}__{column}' for column in columns], convert
+    return None
+
+
+def _nested(field, model, prefix):
+    """(lookups, converter, annotations) of a one-to-one serializer, or None."""
+    if isinstance(field, serializers.ListSerializer) or len(field.source_attrs) != 1:
+        return None
+    try:
+        relation = model._meta.get_field(field.source)
+    except FieldDoesNotExist:
+        return None
+    if not relation.one_to_one or relation.related_model is not field.Meta.model:
+        return None
+    nested = for_serializer(field, f'{prefix}{field.source}__')
+    if nested is None or nested.extra:
+        return None
+    # The related pk first: NULL when there is no related row
+    lookups = [f'{prefix}{field.source}__pk'] + nested.lookups
+    return lookups, lambda values: nested.item(values[1:]), nested.annotations
+
+
+def for_serializer(serializer, prefix=''):
+    """Projection reproducing `serializer.to_representation` for its rows, or None.
+
+    `prefix` is the lookup path of a nested serializer's model from the
+    queryset's.
+    """
+    extra = getattr(serializer, 'extra_representation', None)
+    overridden = (type(serializer).to_representation
+                  is not serializers.Serializer.to_representation)
+    if overridden and extra is None:
+        return None
+    model = serializer.Meta.model
+    properties = getattr(model, 'property_expressions', None)
+    properties = properties(prefix) if properties else {}
+    projection = Projection(extra)
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.BaseSerializer):
+            nested = _nested(field, model, prefix)
+            if nested is None:
+                return None
+            lookups, convert, annotations = nested
+            projection.annotations.update(annotations)
+            projection.add(name, lookups, convert)
+            continue
+        if (isinstance(field, (serializers.SerializerMethodField,
+                               relations.ManyRelatedField))
+                or field.source == '*'):
+            return None
+        if field.source in properties and not isinstance(field, relations.RelatedField):
+            alias = f'_{prefix}{field.source}'.replace('__', '_')
+            projection.annotations[alias] = properties[field.source]
+            projection.add(name, [alias], field.to_representation)
+            continue
+        model_field = _path(model, field.source_attrs)
+        if model_field is None:
+            return None
+        lookup = prefix + '__'.join(field.source_attrs)
+        if isinstance(field, relations.RelatedField):
+            if not model_field.is_relation:
+                return None
+            compiled = _related(field, lookup, model_field)
+            if compiled is None:
+                return None
+            projection.add(name, *compiled)
+        elif model_field.is_relation or isinstance(model_field, FileField):
+            return None
+        else:
+            projection.add(name, [lookup], field.to_representation)
+    return projection
+
+
+class ProjectedListSerializer(serializers.ListSerializer):
+    """ListSerializer serializing querysets through `for_serializer` where it can."""
+
+    def to_representation(self, data):
+        if isinstance(data, QuerySet):
+            projection = for_serializer(self.child)
+            if projection is not None:
+                return projection.rows(data)
+        return super().to_representation(data)
@@ -0,0 +1,106 @@
+"""
+Revenue versus production reconciliation.
+
+For every utility plant and month, `UtilityMonthlyRevenue` (kWh summed
+over contracts; `sales_days` of the longest one, as every contract covers
+the same days) is compared with the `UtilityDailyProduction` rows of the
+same `plant_id`/`rd`. Each side is aggregated in the database with one grouped
+query for the whole set of plants and months; only the per plant-month
+totals are compared in Python.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Max, Sum
+
+from . import models
+from .utils import month_bounds
+
+OK = 'ok'
+MISMATCH = 'mismatch'
+MISSING_REVENUE = 'missing_revenue'
+MISSING_PRODUCTION = 'missing_production'
+MISSING_BOTH = 'missing_both'
+
+
+def check_month(rd):
+    """Return `rd` when it is a `YYYY-MM` month, else raise ValueError."""
+    if len(rd) != 7 or rd[4] != '-':
+        raise ValueError(f'{rd!r} is not a YYYY-MM month.')
+    month_bounds(rd)
+    return rd
+
+
+def year_months(year):
+    """Return the twelve `YYYY-MM` strings of a year."""
+    return [f'{year}-{month:02d}' for month in range(1, 13)]
+
+
+def _totals(queryset, months, **aggregates):
+    rows = (queryset.filter(rd__in=months).values('plant_id', 'rd')
+            .annotate(**aggregates))
+    return {(row['plant_id'], row['rd']): row for row in rows}
+
+
+def reconcile(plants, months, tolerance=Decimal('0.01'), days_tolerance=0):
+    """Compare revenue and production of `plants` (UtilityPlantIds) for `months`.
+
+    `tolerance` is the accepted relative kWh difference, `days_tolerance`
+    the accepted difference between `sales_days` and production days.
+    Returns one dict per plant and month.
+    """
+    plants = list(plants.order_by('plant_id').values_list('id', 'plant_id'))
+    plant_ids = [pk for pk, _ in plants]
+
+    revenue = _totals(
+        models.UtilityMonthlyRevenue.objects.filter(plant_id__in=plant_ids), months,
+        kwh=Sum('sales_electricity_kwh'), days=Max('sales_days'), contracts=Count('id'),
+    )
+    production = _totals(
+        models.UtilityDailyProduction.objects.filter(plant_id__in=plant_ids), months,
+        kwh=Sum('power_production_kwh'), days=Count('production_date', distinct=True),
+    )
+
+    report = []
+    for pk, plant_id in plants:
+        for rd in months:
+            sales = revenue.get((pk, rd))
+            produced = production.get((pk, rd))
+            row = {
+                'plant_id': plant_id,
+                'rd': rd,
+                'sales_electricity_kwh': sales and sales['kwh'],
+                'sales_days': sales and sales['days'],
+                'production_kwh': produced and produced['kwh'],
+                'production_days': produced and produced['days'],
+                'kwh_difference': None,
+                'kwh_difference_ratio': None,
+                'days_difference': None,
+            }
+            if not sales and not produced:
+                row['status'] = MISSING_BOTH
+            elif not sales:
+                row['status'] = MISSING_REVENUE
+            elif not produced:
+                row['status'] = MISSING_PRODUCTION
+            else:
+                row['status'] = _compare(row, tolerance, days_tolerance)
+            report.append(row)
+    return report
+
+
+def _compare(row, tolerance, days_tolerance):
+    sold = row['sales_electricity_kwh'] or Decimal(0)
+    produced = row['production_kwh'] or Decimal(0)
+    difference = sold - produced
+    row['kwh_difference'] = difference
+    if produced:
+        row['kwh_difference_ratio'] = round(difference / produced, 4)
+
+    status = OK
+    if abs(difference) > abs(produced) * Decimal(tolerance):
+        status = MISMATCH
+    if row['sales_days'] is not None:
+        row['days_difference'] = row['sales_days'] - row['production_days']
+        if abs(row['days_difference']) > days_tolerance:
+            status = MISMATCH
+    return status
@@ -0,0 +1,158 @@
+"""
+Read-replica routing.
+
+`settings.DATABASE_REPLICAS` names the aliases of streaming replicas of
+`default` (built from POSTGRES_REPLICA_HOSTS). Reads use the primary
+unless they run between `start_reading` and `stop_reading`, which the API
+does for list/retrieve and the read-only actions of its views. There
+ReplicaRouter picks, once per request, a replica that answers, is at most
+REPLICA_MAX_LAG seconds behind and has replayed the requesting user's
+last write; when none qualifies the request reads from the primary.
+Writes, migrations and reads inside a primary transaction use `default`.
+
+Read-your-writes: after a successful write request the primary's WAL
+position is kept in the cache for the user for REPLICA_PIN_SECONDS, and
+replicas that have not replayed up to it are skipped for that user.
+"""
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+MAX_LAG = getattr(settings, 'REPLICA_MAX_LAG', 5.0)
+CHECK_INTERVAL = getattr(settings, 'REPLICA_CHECK_INTERVAL', 2.0)
+RETRY_INTERVAL = getattr(settings, 'REPLICA_RETRY_INTERVAL', 30.0)
+PIN_SECONDS = getattr(settings, 'REPLICA_PIN_SECONDS', 60)
+
+STATUS_SQL = """
+    SELECT CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn()
+                ELSE pg_current_wal_lsn() END,
+           CASE WHEN NOT pg_is_in_recovery()
+                     OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM
+                                      now() - pg_last_xact_replay_timestamp()), 0) END
+"""
+
+_reading = ContextVar('replica_reading', default=None)
+_status = {}
+_status_lock = threading.Lock()
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+def parse_lsn(value):
+    """'16/B374D848' -> integer WAL position."""
+    high, low = value.split('/')
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+def _pin_key(user):
+    return f'replica-pin:{user.pk}'
+
+
+def pin(user):
+    """Keep `user` off replicas that have not replayed the primary's current WAL."""
+    if not replica_aliases() or not getattr(user, 'is_authenticated', False):
+        return
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute('SELECT pg_current_wal_lsn()')
+        lsn = parse_lsn(cursor.fetchone()[0])
+    cache.set(_pin_key(user), lsn, PIN_SECONDS)
+
+
+def status(alias):
+    """(replayed WAL position, lag seconds) of a replica, or None if unreachable.
+
+    Checked at most every REPLICA_CHECK_INTERVAL seconds per process, and
+    every REPLICA_RETRY_INTERVAL seconds while it is down.
+    """
+    now = time.monotonic()
+    with _status_lock:
+        cached = _status.get(alias)
+        interval = CHECK_INTERVAL if cached and cached[1] else RETRY_INTERVAL
+        if cached and now - cached[0] < interval:
+            return cached[1]
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(STATUS_SQL)
+            lsn, lag = cursor.fetchone()
+        result = (parse_lsn(lsn), float(lag)) if lsn else None
+    except DatabaseError as exc:
+        logger.warning('Replica %s unavailable: %s', alias, exc)
+        connections[alias].close()
+        result = None
+    with _status_lock:
+        _status[alias] = (now, result)
+    return result
+
+
+def choose(min_lsn=None):
+    """Alias of a usable replica (in random order), or `default`."""
+    aliases = list(replica_aliases())
+    random.shuffle(aliases)
+    for alias in aliases:
+        current = status(alias)
+        if current is None:
+            continue
+        lsn, lag = current
+        if lag <= MAX_LAG and (min_lsn is None or lsn >= min_lsn):
+            return alias
+    return DEFAULT_DB_ALIAS
+
+
+class _Reading:
+    __slots__ = ('min_lsn', 'alias')
+
+    def __init__(self, min_lsn):
+        self.min_lsn = min_lsn
+        self.alias = None
+
+
+def start_reading(user=None):
+    """Let the following reads use a replica; returns the token for `stop_reading`."""
+    if not replica_aliases():
+        return None
+    authenticated = getattr(user, 'is_authenticated', False)
+    min_lsn = cache.get(_pin_key(user)) if authenticated else None
+    return _reading.set(_Reading(min_lsn))
+
+
+def stop_reading(token):
+    if token is not None:
+        _reading.reset(token)
+
+
+def current_alias():
+    """Database the current reads go to."""
+    reading = _reading.get()
+    if reading is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    if reading.alias is None:
+        reading.alias = choose(reading.min_lsn)
+    return reading.alias
+
+
+class ReplicaRouter:
+    """Database router sending reads inside `start_reading` to a replica."""
+
+    def db_for_read(self, model, **hints):
+        return current_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are physical copies of the primary.
+        return db == DEFAULT_DB_ALIAS
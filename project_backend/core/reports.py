@@ -0,0 +1,307 @@
+"""
+Monthly portfolio reports.
+
+`build(group_id, rd)` collects one group's month in a handful of grouped
+queries: generation per logger, weather and performance ratio per power
+plant, curtailment and revenue against expense per utility plant, and the
+generation anomalies (alerts), plus a summary of the month. `write`
+stores it under REPORT_ROOT/<rd>/<group id>-<group slug>/ as one CSV per
+section, `report.html` and `report.xlsx` (one sheet per section).
+
+`generate_all` runs the groups in a process pool; each worker opens its
+own database connection and reads from a replica when one is configured.
+"""
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal
+from pathlib import Path
+
+import django
+import xlsxwriter
+from django.conf import settings
+from django.db import connections
+from django.db.models import Avg, Count, F, Max, Sum
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import models, reconciliation, replicas
+from .utils import month_bounds
+
+REPORT_ROOT = Path(getattr(settings, 'REPORT_ROOT',
+                           Path(settings.MEDIA_ROOT) / 'reports'))
+FORMATS = ('csv', 'html', 'xlsx')
+
+
+@dataclass
+class Section:
+    name: str
+    title: str
+    columns: list
+    rows: list = field(default_factory=list)
+
+
+def _rows(queryset, columns):
+    return [[row[column] for column in columns] for row in queryset]
+
+
+def _ratio(numerator, denominator):
+    if numerator is None or not denominator:
+        return None
+    return round(numerator / denominator, 4)
+
+
+def generation(group_id, start, end):
+    columns = ['logger_name', 'days', 'total_kwh', 'average_kwh', 'max_kwh',
+               'last_date']
+    rows = (models.LoggerPowerGen.objects
+            .filter(logger_name__group_id=group_id, date__range=(start, end))
+            .values(logger=F('logger_name__logger_name'))
+            .annotate(days=Count('id'), total_kwh=Sum('power_gen'),
+                      average_kwh=Avg('power_gen'), max_kwh=Max('power_gen'),
+                      last_date=Max('date'))
+            .order_by('logger'))
+    return Section('generation', 'Generation', columns,
+                   [[row['logger'], row['days'], row['total_kwh'],
+                     round(row['average_kwh'], 4), row['max_kwh'], row['last_date']]
+                    for row in rows])
+
+
+def weather(group_id, start, end):
+    columns = ['system_id', 'days', 'ghi', 'gti', 'pvout']
+    rows = (models.GisWeather.objects
+            .filter(power_plant__group_id=group_id, date__range=(start, end))
+            .values(system_id=F('power_plant__system_id'))
+            .annotate(days=Count('id'), ghi=Sum('ghi'), gti=Sum('gti'),
+                      pvout=Sum('pvout'))
+            .order_by('system_id'))
+    return Section('weather', 'Weather (monthly sums)', columns, _rows(rows, columns))
+
+
+def performance(group_id, start, end):
+    columns = ['system_id', 'days', 'reference_kwh', 'expected_kwh', 'actual_kwh', 'pr',
+               'performance_index']
+    rows = (models.PerformanceRatio.objects
+            .filter(power_plant__group_id=group_id, date__range=(start, end))
+            .values(system_id=F('power_plant__system_id'))
+            .annotate(days=Count('id'), reference_kwh=Sum('reference_kwh'),
+                      expected_kwh=Sum('expected_kwh'), actual_kwh=Sum('actual_kwh'))
+            .order_by('system_id'))
+    return Section('performance', 'Performance ratio', columns, [
+        [row['system_id'], row['days'], row['reference_kwh'], row['expected_kwh'],
+         row['actual_kwh'], _ratio(row['actual_kwh'], row['reference_kwh']),
+         _ratio(row['actual_kwh'], row['expected_kwh'])]
+        for row in rows
+    ])
+
+
+def curtailment(group_id, rd):
+    columns = ['plant_id', 'events', 'estimated_events', 'expected_kwh', 'lost_kwh']
+    rows = (models.CurtailmentEvent.objects.filter(plant_id__group_id=group_id, rd=rd)
+            .values(plant=F('plant_id__plant_id'))
+            .annotate(events=Count('id'), estimated_events=Count('loss'),
+                      expected_kwh=Sum('loss__expected_kwh'),
+                      lost_kwh=Sum('loss__lost_kwh'))
+            .order_by('plant'))
+    return Section('curtailment', 'Curtailment', columns,
+                   [[row['plant']] + [row[column] for column in columns[1:]]
+                    for row in rows])
+
+
+def revenue(group_id, rd):
+    """Revenue against expense per utility plant, with the reconciliation status."""
+    columns = ['plant_id', 'sales_kwh', 'sales_jpy', 'sales_tax_jpy', 'used_kwh',
+               'used_jpy', 'used_tax_jpy', 'net_jpy', 'reconciliation']
+    plants = models.UtilityPlantId.objects.filter(group_id=group_id)
+    sales = {row['plant']: row for row in (
+        models.UtilityMonthlyRevenue.objects.filter(plant_id__in=plants, rd=rd)
+        .values(plant=F('plant_id__plant_id'))
+        .annotate(kwh=Sum('sales_electricity_kwh'), jpy=Sum('sales_amount_jpy'),
+                  tax=Sum('tax_jpy')))}
+    used = {row['plant']: row for row in (
+        models.UtilityMonthlyExpense.objects.filter(plant_id__in=plants, rd=rd)
+        .values(plant=F('plant_id__plant_id'))
+        .annotate(kwh=Sum('used_electricity_kwh'), jpy=Sum('used_amount_jpy'),
+                  tax=Sum('tax_jpy')))}
+
+    rows = []
+    for check in reconciliation.reconcile(plants, [rd]):
+        sold, spent = sales.get(check['plant_id'], {}), used.get(check['plant_id'], {})
+        if check['status'] == reconciliation.MISSING_BOTH and not spent:
+            continue
+        net = (sold.get('jpy') or Decimal(0)) - (spent.get('jpy') or Decimal(0))
+        rows.append([check['plant_id'],
+                     sold.get('kwh'), sold.get('jpy'), sold.get('tax'),
+                     spent.get('kwh'), spent.get('jpy'), spent.get('tax'),
+                     net, check['status']])
+    return Section('revenue', 'Revenue and expense', columns, rows)
+
+
+def alerts(group_id, start, end):
+    columns = ['date', 'logger_name', 'power_gen', 'baseline', 'score', 'ratio',
+               'peer_ratio']
+    rows = (models.GenerationAnomaly.objects
+            .filter(group_id=group_id, date__range=(start, end))
+            .values('date', 'power_gen', 'baseline', 'score', 'ratio', 'peer_ratio',
+                    logger=F('logger_name__logger_name'))
+            .order_by('date', 'logger'))
+    return Section('alerts', 'Generation anomalies', columns, [
+        [row['date'], row['logger'], row['power_gen']] +
+        [None if row[column] is None else round(row[column], 4)
+         for column in columns[3:]]
+        for row in rows
+    ])
+
+
+def summary(sections):
+    """Portfolio figures of a group's month, from its sections."""
+    def total(section, column):
+        index = sections[section].columns.index(column)
+        return sum((row[index] for row in sections[section].rows
+                    if row[index] is not None), Decimal(0))
+
+    reference = total('performance', 'reference_kwh')
+    actual = total('performance', 'actual_kwh')
+    figures = {
+        'loggers': len(sections['generation'].rows),
+        'generation_kwh': total('generation', 'total_kwh'),
+        'plants': len(sections['performance'].rows),
+        'pr': _ratio(actual, reference),
+        'curtailment_events': int(total('curtailment', 'events')),
+        'curtailment_lost_kwh': total('curtailment', 'lost_kwh'),
+        'sales_jpy': total('revenue', 'sales_jpy'),
+        'used_jpy': total('revenue', 'used_jpy'),
+        'net_jpy': total('revenue', 'net_jpy'),
+        'reconciliation_issues': sum(row[-1] != reconciliation.OK
+                                     for row in sections['revenue'].rows),
+        'alerts': len(sections['alerts'].rows),
+    }
+    return Section('summary', 'Summary', ['figure', 'value'],
+                   [[key, value] for key, value in figures.items()])
+
+
+def build(group_id, rd):
+    """{section name: Section} of one group's month, summary first."""
+    start, end = month_bounds(rd)
+    sections = [generation(group_id, start, end), weather(group_id, start, end),
+                performance(group_id, start, end), curtailment(group_id, rd),
+                revenue(group_id, rd), alerts(group_id, start, end)]
+    sections = {section.name: section for section in sections}
+    return {'summary': summary(sections), **sections}
+
+
+def directory(group_id, group_name, rd):
+    """Directory of a group's report; the id separates names that slugify alike."""
+    slug = slugify(group_name)
+    return REPORT_ROOT / rd / (f'{group_id}-{slug}' if slug else str(group_id))
+
+
+def _write_csv(path, section):
+    with open(path, 'w', newline='') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(section.columns)
+        writer.writerows(section.rows)
+
+
+def _write_xlsx(path, sections):
+    with xlsxwriter.Workbook(path, {'default_date_format': 'yyyy-mm-dd'}) as workbook:
+        bold = workbook.add_format({'bold': True})
+        for section in sections.values():
+            sheet = workbook.add_worksheet(section.title[:31])
+            sheet.write_row(0, 0, section.columns, bold)
+            for number, row in enumerate(section.rows, start=1):
+                sheet.write_row(number, 0, [
+                    float(value) if isinstance(value, Decimal) else value
+                    for value in row])
+            sheet.freeze_panes(1, 0)
+            sheet.set_column(0, len(section.columns) - 1, 14)
+
+
+def write(group_id, group_name, rd, sections, formats=FORMATS):
+    """Write a built report; return the paths written."""
+    target = directory(group_id, group_name, rd)
+    target.mkdir(parents=True, exist_ok=True)
+    paths = []
+    if 'csv' in formats:
+        for section in sections.values():
+            paths.append(target / f'{section.name}.csv')
+            _write_csv(paths[-1], section)
+    if 'html' in formats:
+        paths.append(target / 'report.html')
+        paths[-1].write_text(render_to_string('core/portfolio_report.html', {
+            'group_name': group_name, 'rd': rd, 'sections': sections.values(),
+            'generated_at': timezone.now(),
+        }))
+    if 'xlsx' in formats:
+        paths.append(target / 'report.xlsx')
+        _write_xlsx(paths[-1], sections)
+    return paths
+
+
+def generate(group_id, group_name, rd, formats=FORMATS):
+    """Build and write a group's report; return (name, summary rows, paths, seconds)."""
+    started = time.monotonic()
+    token = replicas.start_reading()
+    try:
+        sections = build(group_id, rd)
+    finally:
+        replicas.stop_reading(token)
+    paths = write(group_id, group_name, rd, sections, formats)
+    elapsed = time.monotonic() - started
+    return group_name, sections['summary'].rows, [str(path) for path in paths], elapsed
+
+
+def _init_worker():
+    django.setup()
+
+
+def generate_all(groups, rd, formats=FORMATS, workers=None):
+    """Generate the reports of `groups` [(id, name)] in parallel, yielding each result.
+
+    With one worker the reports are built in this process.
+    """
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        for group_id, group_name in groups:
+            yield generate(group_id, group_name, rd, formats)
+        return
+    # Forked workers must not share the parent's connections.
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(generate, group_id, group_name, rd, formats)
+                   for group_id, group_name in groups]
+        for future in futures:
+            yield future.result()
+
+
+def write_index(rd, results, formats=FORMATS):
+    """Portfolio overview (a summary row per group) beside the reports; its paths."""
+    target = REPORT_ROOT / rd
+    target.mkdir(parents=True, exist_ok=True)
+    results = sorted(results, key=lambda result: result[0])
+    columns = ['group_name']
+    if results:
+        columns += [figure for figure, _ in results[0][1]]
+    overview = Section('portfolio', 'Portfolio', columns,
+                       [[group_name] + [value for _, value in rows]
+                        for group_name, rows, _, _ in results])
+    paths = []
+    if 'csv' in formats:
+        paths.append(target / 'portfolio.csv')
+        _write_csv(paths[-1], overview)
+    if 'html' in formats:
+        paths.append(target / 'index.html')
+        paths[-1].write_text(render_to_string('core/portfolio_report.html', {
+            'group_name': 'All groups', 'rd': rd, 'sections': [overview],
+            'generated_at': timezone.now(),
+            # Every path of a group's report is in its directory
+            'links': [(group_name, f'{Path(paths[0]).parent.name}/report.html')
+                      for group_name, _, paths, _ in results if paths],
+        }))
+    if 'xlsx' in formats:
+        paths.append(target / 'portfolio.xlsx')
+        _write_xlsx(paths[-1], {'portfolio': overview})
+    return paths
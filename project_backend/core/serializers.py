@@ -1,10 +1,24 @@
+import math
 from rest_framework import serializers
+from . import intraday
 from . import models
+from . import names
+from . import projection
 from django.contrib.auth import get_user_model
 
 
 class BaseModelSerializer(serializers.ModelSerializer):
-    """Base serializer that handles automatic user assignment."""
+    """Base serializer that handles automatic user assignment.
+
+    Lists of querysets are serialized through a values() projection where
+    the serializer allows it (see core/projection.py).
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = cls.__dict__.get('Meta')
+        if meta is not None and not hasattr(meta, 'list_serializer_class'):
+            meta.list_serializer_class = projection.ProjectedListSerializer
 
     def save(self, **kwargs):
         request = self.context.get('request')
@@ -28,10 +42,12 @@ class PowerPlantDetailSerializer(BaseModelSerializer):
         fields = '__all__'
         read_only_fields = ['user', 'group_name']
 
-    # Add a custom field to expose the choices
+    # Add a custom field to expose the choices (kept by the list projection)
+    extra_representation = {'resource_choices': dict(RESOURCE_CHOICES)}
+
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        representation['resource_choices'] = dict(self.RESOURCE_CHOICES)
+        representation.update(self.extra_representation)
         return representation
 
 
@@ -71,6 +87,35 @@ class LoggerPlantGroupSerializer(BaseModelSerializer):
         read_only_fields = ['id']
 
 
+"""
+Latest reading and month/year-to-date totals as of today (read only, nested)
+"""
+
+
+class LoggerSummarySerializer(serializers.ModelSerializer):
+    month_to_date = serializers.DecimalField(max_digits=14, decimal_places=4,
+                                             read_only=True)
+    year_to_date = serializers.DecimalField(max_digits=16, decimal_places=4,
+                                            read_only=True)
+
+    class Meta:
+        model = models.LoggerSummary
+        fields = ['last_date', 'last_value', 'month_to_date', 'year_to_date']
+        read_only_fields = fields
+
+
+class UtilityPlantSummarySerializer(serializers.ModelSerializer):
+    month_to_date = serializers.DecimalField(max_digits=14, decimal_places=2,
+                                             read_only=True)
+    year_to_date = serializers.DecimalField(max_digits=16, decimal_places=2,
+                                            read_only=True)
+
+    class Meta:
+        model = models.UtilityPlantSummary
+        fields = ['last_date', 'last_value', 'month_to_date', 'year_to_date']
+        read_only_fields = fields
+
+
 """
 serializers for solar power plan
 """
@@ -79,6 +124,7 @@ class LoggerCategorySerializer(BaseModelSerializer):
     group = serializers.PrimaryKeyRelatedField(queryset=models.LoggerPlantGroup.objects.all())
     status = serializers.BooleanField()
     user = serializers.StringRelatedField()
+    summary = LoggerSummarySerializer(read_only=True)
 
     class Meta:
         model = models.LoggerCategory
@@ -113,11 +159,60 @@ class LoggerPowerGenSerializer(BaseModelSerializer):
 
     def create(self, validated_data):
         logger_name_data = validated_data.pop('logger_name')
-        logger_name, created = models.LoggerCategory.objects.get_or_create(logger_name=logger_name_data['logger_name'])
-        validated_data['logger_name'] = logger_name
+        validated_data['logger_name'] = names.get_or_create(
+            'logger', logger_name_data['logger_name'])
         return models.LoggerPowerGen.objects.create(**validated_data)
 
 
+class IntradaySamplesField(serializers.Field):
+    """The packed samples of a day as a list of numbers, null where missing."""
+
+    def to_representation(self, value):
+        return [None if math.isnan(sample) else sample
+                for sample in intraday.unpack(value).tolist()]
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list) or not data:
+            raise serializers.ValidationError(
+                'Expected a non-empty list of numbers or nulls.')
+        try:
+            return [None if value is None else float(value) for value in data]
+        except (TypeError, ValueError):
+            raise serializers.ValidationError(
+                'Expected a non-empty list of numbers or nulls.')
+
+
+class LoggerIntradaySerializer(BaseModelSerializer):
+    """Serializer for LoggerIntraday; a create merges `samples` from `start` (HH:MM)."""
+    logger_name = serializers.CharField(source='logger_name.logger_name')
+    start = serializers.CharField(write_only=True, required=False, default='00:00')
+    samples = IntradaySamplesField()
+    user = serializers.StringRelatedField()
+
+    class Meta:
+        model = models.LoggerIntraday
+        fields = ['id', 'logger_name', 'date', 'start', 'samples', 'sample_count',
+                  'status', 'created_at', 'updated_at', 'user']
+        read_only_fields = ['id', 'sample_count']
+
+    def validate(self, attrs):
+        try:
+            attrs['start'] = intraday.slot(attrs['start'])
+        except ValueError as exc:
+            raise serializers.ValidationError({'start': str(exc)})
+        if attrs['start'] + len(attrs['samples']) > intraday.SAMPLES_PER_DAY:
+            raise serializers.ValidationError(
+                {'samples': f'A day has {intraday.SAMPLES_PER_DAY} intervals of '
+                            f'{intraday.INTERVAL_MINUTES} minutes.'})
+        return attrs
+
+    def create(self, validated_data):
+        logger = names.get_or_create('logger',
+                                     validated_data['logger_name']['logger_name'])
+        return intraday.store(logger, validated_data['date'], validated_data['samples'],
+                              validated_data['start'], validated_data.get('user'))
+
+
 class CurtailmentEventSerializer(BaseModelSerializer):
     """Serializer for CurtailmentEvent."""
     plant_id = serializers.CharField(source='plant_id.plant_id')
@@ -134,8 +229,8 @@ class CurtailmentEventSerializer(BaseModelSerializer):
     def create(self, validated_data):
         # Extract plant_id data and get or create the corresponding UtilityPlantId instance
         plant_id_data = validated_data.pop('plant_id')
-        plant_id, created = models.UtilityPlantId.objects.get_or_create(plant_id=plant_id_data['plant_id'])
-        validated_data['plant_id'] = plant_id
+        validated_data['plant_id'] = names.get_or_create('plant',
+                                                         plant_id_data['plant_id'])
         
         # Create and return a CurtailmentEvent instance instead of UtilityMonthlyRevenue
         return models.CurtailmentEvent.objects.create(**validated_data)
@@ -147,6 +242,7 @@ serializers for Utilitie
 class UtilityPlantIdSerializer(BaseModelSerializer):
     group = serializers.PrimaryKeyRelatedField(queryset=models.LoggerPlantGroup.objects.all())  # Display group name
     user = serializers.StringRelatedField()
+    summary = UtilityPlantSummarySerializer(read_only=True)
 
     class Meta:
         model = models.UtilityPlantId
@@ -185,8 +281,8 @@ class UtilityMonthlyRevenueSerializer(BaseModelSerializer):
 
     def create(self, validated_data):
         plant_id_data = validated_data.pop('plant_id')
-        plant_id, created = models.UtilityPlantId.objects.get_or_create(plant_id=plant_id_data['plant_id'])
-        validated_data['plant_id'] = plant_id
+        validated_data['plant_id'] = names.get_or_create('plant',
+                                                         plant_id_data['plant_id'])
         return models.UtilityMonthlyRevenue.objects.create(**validated_data)
 
 
@@ -205,8 +301,8 @@ class UtilityMonthlyExpenseSerializer(BaseModelSerializer):
 
     def create(self, validated_data):
         plant_id_data = validated_data.pop('plant_id')
-        plant_id, created = models.UtilityPlantId.objects.get_or_create(plant_id=plant_id_data['plant_id'])
-        validated_data['plant_id'] = plant_id
+        validated_data['plant_id'] = names.get_or_create('plant',
+                                                         plant_id_data['plant_id'])
         return models.UtilityMonthlyExpense.objects.create(**validated_data)
 
 
@@ -225,8 +321,8 @@ class UtilityDailyProductionSerializer(BaseModelSerializer):
 
     def create(self, validated_data):
         plant_id_data = validated_data.pop('plant_id')
-        plant_id, created = models.UtilityPlantId.objects.get_or_create(plant_id=plant_id_data['plant_id'])
-        validated_data['plant_id'] = plant_id
+        validated_data['plant_id'] = names.get_or_create('plant',
+                                                         plant_id_data['plant_id'])
         return models.UtilityDailyProduction.objects.create(**validated_data)
 
 
@@ -237,3 +333,83 @@ class MailNotificationeSerializer(BaseModelSerializer):
     class Meta:
         model = models.MailNotificatione
         fields = '__all__'
+
+
+"""
+Serializer for curtailment loss estimates (read only).
+"""
+
+
+class CurtailmentLossSerializer(BaseModelSerializer):
+    """Serializer for CurtailmentLoss."""
+    plant_id = serializers.CharField(source='plant_id.plant_id', read_only=True)
+    user = serializers.StringRelatedField()
+
+    class Meta:
+        model = models.CurtailmentLoss
+        fields = [
+            'id', 'event', 'plant_id', 'date', 'rd', 'expected_kwh', 'actual_kwh',
+            'window_share', 'lost_kwh', 'basis', 'user', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+"""
+Serializer for performance ratios (read only).
+"""
+
+
+class PerformanceRatioSerializer(BaseModelSerializer):
+    """Serializer for PerformanceRatio."""
+    power_plant_name = serializers.StringRelatedField(source='power_plant',
+                                                      read_only=True)
+    user = serializers.StringRelatedField()
+
+    class Meta:
+        model = models.PerformanceRatio
+        fields = [
+            'id', 'power_plant', 'power_plant_name', 'date', 'gti', 'pvout',
+            'reference_kwh', 'expected_kwh', 'actual_kwh', 'pr', 'performance_index',
+            'source', 'weather', 'user', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+"""
+Serializer for generation anomalies (read only).
+"""
+
+
+class GenerationAnomalySerializer(BaseModelSerializer):
+    """Serializer for GenerationAnomaly."""
+    logger_name = serializers.CharField(source='logger_name.logger_name',
+                                        read_only=True)
+    group_name = serializers.CharField(source='group.group_name', read_only=True)
+
+    class Meta:
+        model = models.GenerationAnomaly
+        fields = [
+            'id', 'logger_name', 'group_name', 'date', 'power_gen', 'baseline', 'mad',
+            'score', 'ratio', 'peer_ratio', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+"""
+Serializer for closed months (see core/snapshots.py).
+"""
+
+
+class ClosedMonthSerializer(serializers.ModelSerializer):
+    """Serializer for ClosedMonth; `files` lists the snapshot sizes and hashes."""
+    group_name = serializers.SlugRelatedField(
+        source='group', slug_field='group_name',
+        queryset=models.LoggerPlantGroup.objects.all())
+    rd = serializers.RegexField(r'^\d{4}-(0[1-9]|1[0-2])$')
+    user = serializers.StringRelatedField()
+
+    class Meta:
+        model = models.ClosedMonth
+        fields = ['id', 'group_name', 'rd', 'files', 'user', 'created_at']
+        read_only_fields = ['id', 'files', 'user', 'created_at']
+        validators = []
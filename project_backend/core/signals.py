@@ -0,0 +1,102 @@
+"""
+Signal receivers keeping derived data in step with writes.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import anomalies, dashboard, live, models, names, snapshots, spatial, summaries
+
+
+@receiver(post_save, sender=models.LoggerPowerGen)
+def logger_power_gen_saved(sender, instance, created=False, raw=False, **kwargs):
+    """Feed every new or changed reading to the anomaly detector."""
+    if raw:
+        return
+    transaction.on_commit(lambda: anomalies.observe(instance, created))
+
+
+@receiver(post_save, sender=models.PowerPlantDetail)
+@receiver(post_delete, sender=models.PowerPlantDetail)
+def power_plant_changed(sender, **kwargs):
+    """Coordinates may have changed: rebuild the spatial index on next use."""
+    spatial.invalidate()
+
+
+@receiver(pre_save, sender=models.LoggerPowerGen)
+@receiver(pre_save, sender=models.UtilityDailyProduction)
+def reading_saving(sender, instance, raw=False, **kwargs):
+    """Remember the stored logger or plant of a changed reading, it may be moved."""
+    if raw or instance._state.adding:
+        return
+    entity = f'{summaries.SPECS[sender].entity_field}_id'
+    instance._stored_entity_id = (sender._base_manager.filter(pk=instance.pk)
+                                  .values_list(entity, flat=True).first())
+
+
+@receiver(post_save, sender=models.LoggerPowerGen)
+@receiver(post_delete, sender=models.LoggerPowerGen)
+@receiver(post_save, sender=models.UtilityDailyProduction)
+@receiver(post_delete, sender=models.UtilityDailyProduction)
+def reading_changed(sender, instance, raw=False, **kwargs):
+    """Recompute the latest/MTD/YTD summary of the reading's logger or plant.
+
+    A reading moved to another logger or plant refreshes the old one too.
+    """
+    if raw:
+        return
+    entity = f'{summaries.SPECS[sender].entity_field}_id'
+    summaries.schedule(sender, getattr(instance, entity))
+    stored = instance.__dict__.pop('_stored_entity_id', None)
+    if stored is not None and stored != getattr(instance, entity):
+        summaries.schedule(sender, stored)
+
+
+@receiver(post_save, sender=models.LoggerPlantGroup)
+@receiver(post_delete, sender=models.ClosedMonth)
+def closed_months_changed(sender, **kwargs):
+    """Group names and closed months are cached together."""
+    snapshots.invalidate()
+
+
+@receiver(post_save, sender=models.LoggerCategory)
+@receiver(post_delete, sender=models.LoggerCategory)
+@receiver(post_save, sender=models.UtilityPlantId)
+@receiver(post_delete, sender=models.UtilityPlantId)
+@receiver(post_save, sender=models.PowerPlantDetail)
+@receiver(post_delete, sender=models.PowerPlantDetail)
+@receiver(post_save, sender=models.LoggerPlantGroup)
+@receiver(post_delete, sender=models.LoggerPlantGroup)
+def name_changed(sender, **kwargs):
+    """Names, ids or groups changed: every worker reloads that kind after the commit."""
+    names.schedule_invalidate(next(kind for kind, (model, _) in names.KINDS.items()
+                                   if model is sender))
+
+
+@receiver(post_save, sender=models.LoggerPowerGen)
+@receiver(post_save, sender=models.MailNotificatione)
+def live_row_saved(sender, instance, raw=False, using=None, **kwargs):
+    """Push new and changed rows to the live subscribers once committed."""
+    if raw:
+        return
+    live.publish(instance, 'saved', using)
+
+
+@receiver(post_delete, sender=models.LoggerPowerGen)
+@receiver(post_delete, sender=models.MailNotificatione)
+def live_row_deleted(sender, instance, using=None, **kwargs):
+    live.publish(instance, 'deleted', using)
+
+
+def dashboard_changed(sender, instance, raw=False, **kwargs):
+    """Rows shown on group dashboards changed: drop their caches after the commit."""
+    if raw:
+        return
+    dashboard.schedule_invalidate(instance)
+
+
+for _model in dashboard.GROUP_PATHS:
+    post_save.connect(dashboard_changed, sender=_model,
+                      dispatch_uid=f'dashboard-save-{_model.__name__}')
+    post_delete.connect(dashboard_changed, sender=_model,
+                        dispatch_uid=f'dashboard-delete-{_model.__name__}')
@@ -0,0 +1,196 @@
+"""
+Month close: frozen group-months served from precompressed snapshots.
+
+`close(group, rd, user)` renders the standard list responses of a
+group's month (SNAPSHOT_VIEWS) once through the API views and writes each
+as `<name>.json` with `.json.gz` next to it under
+SNAPSHOT_ROOT/<group id>/<rd>/<version>/, then records a ClosedMonth.
+
+GET requests of exactly `group_name` plus the month parameter are answered
+from those files: through nginx (X-Accel-Redirect to SNAPSHOT_ACCEL_PREFIX)
+when SNAPSHOT_ACCEL_REDIRECT is set, otherwise by Django sending the
+precompressed body. Responses carry an ETag and a long `Cache-Control`.
+
+API writes into a closed month are rejected, and admin edits reopen it
+(`reopen_changed`). Other writes (shell, scripts, archiving) leave it
+closed; `reopen` (or `close_month --reopen`) deletes the record and its
+files.
+"""
+import gzip
+import hashlib
+import logging
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import quote_etag
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(getattr(settings, 'SNAPSHOT_ROOT', Path(settings.BASE_DIR) / 'snapshots'))
+ACCEL_REDIRECT = getattr(settings, 'SNAPSHOT_ACCEL_REDIRECT', False)
+ACCEL_PREFIX = getattr(settings, 'SNAPSHOT_ACCEL_PREFIX', '/internal-snapshots/')
+MAX_AGE = getattr(settings, 'SNAPSHOT_MAX_AGE', 24 * 3600)
+
+CACHE_KEY = 'closed-months'
+
+# Snapshot name (the router basename) -> month query parameter of that list.
+SNAPSHOT_VIEWS = {
+    'utility-monthly-revenue': 'rd',
+    'utility-monthly-expense': 'rd',
+    'utility-daily-production': 'rd',
+    'logger-power-gen': 'year_month',
+}
+
+
+def closed_months():
+    """{(group_name, rd): (group_id, version)} of every closed month, cached."""
+    closed = cache.get(CACHE_KEY)
+    if closed is None:
+        closed = {
+            (group_name, rd): (group_id, pk)
+            for pk, group_id, group_name, rd in models.ClosedMonth.objects.values_list(
+                'pk', 'group_id', 'group__group_name', 'rd')
+        }
+        cache.set(CACHE_KEY, closed, None)
+    return closed
+
+
+def invalidate():
+    cache.delete(CACHE_KEY)
+
+
+def directory(group_id, rd, version):
+    return ROOT / str(group_id) / rd / str(version)
+
+
+def _views():
+    from . import views
+    return {
+        'utility-monthly-revenue': views.UtilityMonthlyRevenueViewSet,
+        'utility-monthly-expense': views.UtilityMonthlyExpenseViewSet,
+        'utility-daily-production': views.UtilityDailyProductionViewSet,
+        'logger-power-gen': views.LoggerPowerGenViewSet,
+    }
+
+
+def render(name, group, rd, user):
+    """Body of the JSON list response `name` for a group and month, as served."""
+    viewset = _views()[name]
+    request = APIRequestFactory().get(
+        '/', {'group_name': group.group_name, SNAPSHOT_VIEWS[name]: rd},
+        HTTP_ACCEPT='application/json')
+    force_authenticate(request, user=user)
+    response = viewset.as_view({'get': 'list'}, basename=name)(request)
+    if response.status_code != 200:
+        raise ValueError(
+            f'{name} returned {response.status_code} for {group.group_name} {rd}')
+    return response.render().content
+
+
+def _write(path, content):
+    path.write_bytes(content)
+    path.with_name(path.name + '.gz').write_bytes(gzip.compress(content, 9, mtime=0))
+
+
+def close(group, rd, user):
+    """Freeze month `rd` (YYYY-MM) of `group` and write its snapshots; return it."""
+    with transaction.atomic():
+        closed = (models.ClosedMonth.objects.select_for_update()
+                  .filter(group=group, rd=rd).first())
+        if closed is not None:
+            return closed
+        # Rendered before the month counts as closed, so the live views answer.
+        contents = {name: render(name, group, rd, user) for name in SNAPSHOT_VIEWS}
+        files = {
+            name: {'bytes': len(content), 'sha256': hashlib.sha256(content).hexdigest()}
+            for name, content in contents.items()
+        }
+        closed = models.ClosedMonth.objects.create(group=group, rd=rd, user=user,
+                                                   files=files)
+        target = directory(group.pk, rd, closed.pk)
+        target.mkdir(parents=True, exist_ok=True)
+        try:
+            for name, content in contents.items():
+                _write(target / f'{name}.json', content)
+        except OSError:
+            shutil.rmtree(target, ignore_errors=True)
+            raise
+        transaction.on_commit(invalidate)
+    return closed
+
+
+def reopen(group_id, rd):
+    """Unfreeze a month and delete its snapshots; return whether it was closed."""
+    deleted, _ = models.ClosedMonth.objects.filter(group_id=group_id, rd=rd).delete()
+    shutil.rmtree(ROOT / str(group_id) / rd, ignore_errors=True)
+    invalidate()
+    return bool(deleted)
+
+
+def reopen_changed(instances):
+    """Reopen the closed months of changed rows once the transaction commits."""
+    for closed in {period(instance) for instance in instances} - {None}:
+        if is_closed(*closed):
+            transaction.on_commit(lambda closed=closed: reopen(*closed))
+
+
+def period(instance):
+    """(group id, 'YYYY-MM') a row of a snapshotted model belongs to, or None."""
+    if isinstance(instance, models.LoggerPowerGen):
+        rd = instance.date.strftime('%Y-%m') if instance.date else None
+        entity = 'logger_name'
+    else:
+        rd, entity = instance.rd, 'plant_id'
+    if not rd or rd not in {month for _, month in closed_months()}:
+        return None
+    return getattr(instance, entity).group_id, rd
+
+
+def is_closed(group_id, rd):
+    return any(closed_id == group_id and month == rd
+               for (_, month), (closed_id, _) in closed_months().items())
+
+
+def serve(request, name):
+    """Snapshot response for a matching list request, or None to compute it live."""
+    month_param = SNAPSHOT_VIEWS[name]
+    params = request.query_params
+    if (set(params) != {'group_name', month_param}
+            or request.accepted_renderer.format != 'json'):
+        return None
+    closed = closed_months().get((params['group_name'], params[month_param]))
+    if closed is None:
+        return None
+    group_id, version = closed
+    rd = params[month_param]
+    path = directory(group_id, rd, version) / f'{name}.json'
+    if not path.exists():
+        logger.warning('Snapshot %s is missing', path)
+        return None
+
+    etag = quote_etag(f'{version}-{name}')
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    elif ACCEL_REDIRECT:
+        response = HttpResponse(content_type='application/json')
+        response['X-Accel-Redirect'] = (
+            f'{ACCEL_PREFIX}{group_id}/{rd}/{version}/{name}.json')
+    else:
+        gzipped = 'gzip' in request.headers.get('Accept-Encoding', '')
+        suffix = '.gz' if gzipped else ''
+        response = HttpResponse(path.with_name(path.name + suffix).read_bytes(),
+                                content_type='application/json')
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+        response['Vary'] = 'Accept-Encoding'
+    response['ETag'] = etag
+    response['Cache-Control'] = f'private, max-age={MAX_AGE}'
+    response['X-Snapshot'] = f'{params["group_name"]} {rd}'
+    return response
@@ -0,0 +1,164 @@
+"""
+In-process spatial index over PowerPlantDetail coordinates.
+
+Plants are stored in a k-d tree over 3D unit vectors, where the straight
+line (chord) distance grows with the great-circle distance, so nearest
+neighbours and radius searches only visit a few tree nodes instead of
+every plant.
+
+The tree is built lazily on first use and dropped by the PowerPlantDetail
+save/delete signals of this process. Other gunicorn workers notice writes
+when their copy is older than INDEX_TTL seconds and the table's
+(count, max id, max updated_at) stamp has changed.
+"""
+import heapq
+import math
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+
+from . import models
+
+EARTH_RADIUS_KM = 6371.0088
+INDEX_TTL = getattr(settings, 'SPATIAL_INDEX_TTL', 60)
+LEAF_SIZE = 16
+
+
+def _unit_vectors(latitude, longitude):
+    lat, lon = np.radians(latitude), np.radians(longitude)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)],
+                    axis=-1)
+
+
+def chord_to_km(chord):
+    return 2.0 * EARTH_RADIUS_KM * math.asin(min(chord / 2.0, 1.0))
+
+
+def km_to_chord(km):
+    return 2.0 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2.0)
+
+
+class KDTree:
+    """Static k-d tree over 3D points stored as an implicitly balanced array.
+
+    Each subarray [lo, hi) is split at its middle element on axis
+    `depth % 3`; the tree is the order of the points, no node objects.
+    """
+
+    def __init__(self, points, ids, groups):
+        self.size = len(ids)
+        order = np.arange(self.size)
+        self._build(points, order, 0, self.size, 0)
+        points = points[order]
+        self.coords = [points[:, axis].tolist() for axis in range(3)]
+        self.ids = np.asarray(ids)[order].tolist()
+        self.groups = np.asarray(groups)[order].tolist()
+
+    def _build(self, points, order, lo, hi, depth):
+        if hi - lo <= LEAF_SIZE:
+            return
+        mid = (lo + hi) // 2
+        part = order[lo:hi]
+        order[lo:hi] = part[np.argpartition(points[part, depth % 3], mid - lo)]
+        self._build(points, order, lo, mid, depth + 1)
+        self._build(points, order, mid + 1, hi, depth + 1)
+
+    def _distance2(self, i, point):
+        x, y, z = self.coords
+        return (x[i] - point[0]) ** 2 + (y[i] - point[1]) ** 2 + (z[i] - point[2]) ** 2
+
+    def search(self, point, k=None, max_chord=None, group=None, exclude=None):
+        """Return [(chord distance, id)] of the `k` nearest points within max_chord."""
+        if k is not None and k < 1:
+            return []
+        bound = max_chord * max_chord if max_chord is not None else math.inf
+        heap = []  # max-heap on distance: (-distance2, id)
+
+        def consider(i):
+            if ((group is not None and self.groups[i] != group)
+                    or self.ids[i] == exclude):
+                return
+            d2 = self._distance2(i, point)
+            limit = -heap[0][0] if k is not None and len(heap) == k else bound
+            if d2 <= min(limit, bound):
+                if k is not None and len(heap) == k:
+                    heapq.heapreplace(heap, (-d2, self.ids[i]))
+                else:
+                    heapq.heappush(heap, (-d2, self.ids[i]))
+
+        def visit(lo, hi, depth):
+            if hi - lo <= LEAF_SIZE:
+                for i in range(lo, hi):
+                    consider(i)
+                return
+            mid = (lo + hi) // 2
+            axis = depth % 3
+            diff = point[axis] - self.coords[axis][mid]
+            near, far = (((lo, mid), (mid + 1, hi)) if diff <= 0
+                         else ((mid + 1, hi), (lo, mid)))
+            visit(*near, depth + 1)
+            consider(mid)
+            limit = -heap[0][0] if k is not None and len(heap) == k else bound
+            if diff * diff <= limit:
+                visit(*far, depth + 1)
+
+        visit(0, self.size, 0)
+        return sorted((math.sqrt(-d2), pk) for d2, pk in heap)
+
+
+class PlantIndex:
+    """k-d tree of all PowerPlantDetail rows with a staleness stamp."""
+
+    def __init__(self):
+        rows = list(models.PowerPlantDetail.objects.values_list(
+            'id', 'group_id', 'latitude', 'longitude'))
+        ids, groups, latitude, longitude = zip(*rows) if rows else ((), (), (), ())
+        points = _unit_vectors(np.array(latitude, dtype=float),
+                               np.array(longitude, dtype=float))
+        self.tree = KDTree(points.reshape(-1, 3), ids, groups) if rows else None
+        self.stamp = _stamp()
+        self.checked = time.monotonic()
+
+    def nearby(self, latitude, longitude, k=None, radius_km=None, group=None,
+               exclude=None):
+        """Return [(distance km, plant id)] sorted by distance."""
+        if self.tree is None:
+            return []
+        point = _unit_vectors(float(latitude), float(longitude)).tolist()
+        max_chord = km_to_chord(radius_km) if radius_km is not None else None
+        found = self.tree.search(point, k=k, max_chord=max_chord, group=group,
+                                 exclude=exclude)
+        return [(chord_to_km(chord), pk) for chord, pk in found]
+
+
+def _stamp():
+    return tuple(models.PowerPlantDetail.objects.aggregate(
+        count=Count('id'), max_id=Max('id'), updated=Max('updated_at')).values())
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def plant_index():
+    """Return the process-wide PlantIndex, rebuilding it when stale."""
+    global _index
+    with _lock:
+        if _index is not None and time.monotonic() - _index.checked > INDEX_TTL:
+            if _stamp() == _index.stamp:
+                _index.checked = time.monotonic()
+            else:
+                _index = None
+        if _index is None:
+            _index = PlantIndex()
+        return _index
+
+
+def invalidate():
+    """Drop the index; the next query rebuilds it."""
+    global _index
+    with _lock:
+        _index = None
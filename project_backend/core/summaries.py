@@ -0,0 +1,134 @@
+"""
+Denormalized per-logger and per-plant summaries.
+
+LoggerSummary and UtilityPlantSummary hold the latest reading (date and
+value) of a LoggerCategory / UtilityPlantId together with the totals of its
+month and year up to that reading, so the `loggercategories` and
+`utility-plants-list` endpoints serve a fleet overview with one join. The
+month- and year-to-date the API shows are derived from them as of today:
+once a logger stops reporting, its totals drop to zero when the month or
+year turns, and `last_date` shows since when it is silent.
+
+Every save and delete of a reading through the ORM (API, admin,
+QuerySet.delete) schedules its entity; when the transaction commits, the
+scheduled entities are recomputed with one statement that reads the newest
+row and the year's rows through the (entity, date) unique index, and
+upserted. Recomputing instead of applying deltas keeps corrections, date
+changes and deletes exact. `bulk_create`, QuerySet.update() and COPY send
+no signals: loaders call `refresh` themselves (`generate_fleet` does), or
+run `rebuild_summaries` afterwards.
+"""
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import models
+
+
+@dataclass(frozen=True)
+class Spec:
+    summary: type
+    entity_field: str
+    date_field: str
+    value_field: str
+
+
+SPECS = {
+    models.LoggerPowerGen: Spec(models.LoggerSummary, 'logger_name', 'date',
+                                'power_gen'),
+    models.UtilityDailyProduction: Spec(models.UtilityPlantSummary, 'plant_id',
+                                        'production_date', 'power_production_kwh'),
+}
+
+SUMMARY_SQL = """
+SELECT e.id, latest.day, latest.value, totals.month_total, totals.year_total
+FROM {entities}
+CROSS JOIN LATERAL (
+    SELECT {date} AS day, {value} AS value FROM {table}
+    WHERE {entity} = e.id AND {date} IS NOT NULL
+    ORDER BY {date} DESC LIMIT 1
+) AS latest
+CROSS JOIN LATERAL (
+    SELECT COALESCE(SUM({value})
+                    FILTER (WHERE {date} >= date_trunc('month', latest.day)), 0)
+               AS month_total,
+           COALESCE(SUM({value}), 0) AS year_total
+    FROM {table}
+    WHERE {entity} = e.id
+      AND {date} BETWEEN date_trunc('year', latest.day)::date AND latest.day
+) AS totals
+"""
+
+_pending = threading.local()
+
+
+def _columns(series):
+    spec = SPECS[series]
+    meta = series._meta
+    return {
+        'table': meta.db_table,
+        'entity': meta.get_field(spec.entity_field).column,
+        'date': meta.get_field(spec.date_field).column,
+        'value': meta.get_field(spec.value_field).column,
+    }
+
+
+def refresh(series, entity_ids=None):
+    """Recompute the summaries of `entity_ids` (default: all) of a series model.
+
+    Entities without any dated reading lose their summary. Returns the
+    number of summaries written.
+    """
+    spec = SPECS[series]
+    entity_model = series._meta.get_field(spec.entity_field).related_model
+    if entity_ids is None:
+        entities, params = f'{entity_model._meta.db_table} AS e', []
+    else:
+        entity_ids = sorted(set(entity_ids))
+        if not entity_ids:
+            return 0
+        entities, params = 'unnest(%s::bigint[]) AS e (id)', [entity_ids]
+
+    with connection.cursor() as cursor:
+        cursor.execute(SUMMARY_SQL.format(entities=entities, **_columns(series)),
+                       params)
+        rows = cursor.fetchall()
+
+    entity = f'{spec.entity_field}_id'
+    now = timezone.now()
+    with transaction.atomic():
+        stale = spec.summary.objects.exclude(
+            **{f'{entity}__in': [row[0] for row in rows]})
+        if entity_ids is not None:
+            stale = stale.filter(**{f'{entity}__in': entity_ids})
+        stale.delete()
+        spec.summary.objects.bulk_create([
+            spec.summary(**{entity: entity_id}, last_date=day, last_value=value,
+                         month_total=month_total, year_total=year_total, updated_at=now)
+            for entity_id, day, value, month_total, year_total in rows
+        ], batch_size=5000, update_conflicts=True, unique_fields=[spec.entity_field],
+            update_fields=['last_date', 'last_value', 'month_total', 'year_total',
+                           'updated_at'])
+    return len(rows)
+
+
+def schedule(series, entity_id):
+    """Refresh the summary of `entity_id` once the current transaction commits.
+
+    Entities scheduled within one transaction are refreshed together.
+    """
+    if not hasattr(_pending, 'entities'):
+        _pending.entities = defaultdict(set)
+    _pending.entities[series].add(entity_id)
+    transaction.on_commit(flush)
+
+
+def flush():
+    """Refresh every scheduled entity (later callbacks in the transaction find none)."""
+    entities = getattr(_pending, 'entities', None)
+    while entities:
+        series, entity_ids = entities.popitem()
+        refresh(series, entity_ids)
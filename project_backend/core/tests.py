@@ -1,3 +1,1953 @@
-from django.test import TestCase
+import csv
+from datetime import date, time, timedelta
+from decimal import Decimal
+import gzip
+from io import StringIO
+import json
+import math
+from pathlib import Path
+import random
+import tempfile
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+import httpx
+import numpy as np
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.db.models.signals import post_delete
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from drf_spectacular.settings import spectacular_settings
+from rest_framework import serializers as drf_serializers
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import admin as core_admin
+from . import (admission, anomalies, archive, benchmark, curtailment, dashboard, fleet,
+               intraday, irradiance, live, loadtest, metrics, models, names, openapi,
+               performance, profiling, projection, reconciliation, replicas, reports,
+               serializers, snapshots, spatial, summaries, urls, utils, views)
+
+API = '/solar-api/core'
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CoreTestCase(TestCase):
+    """A staff user (pk 1, the models' default user) and an authenticated client.
+
+    In-process caches keyed on row ids (names, spatial index, closed
+    months) are dropped before each test, as the rolled back rows of the
+    previous test may still be in them.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'tester@example.com', 'secret', id=1, name='Tester', is_staff=True)
+        cls.group = models.LoggerPlantGroup.objects.create(group_name='G1')
+
+    def setUp(self):
+        cache.clear()
+        names._tables.clear()
+        spatial.invalidate()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def plant(self, system_id, group=None, **fields):
+        values = {
+            'system_name': system_id, 'customer_name': 'customer',
+            'country_name': 'Japan', 'latitude': 35, 'longitude': 139,
+            'altitude': 10, 'azimuth': 180, 'tilt': 20, 'capacity_dc': 100,
+        }
+        values.update(fields)
+        return models.PowerPlantDetail.objects.create(
+            system_id=system_id, group=group or self.group, **values)
+
+    def logger(self, name, group=None, **fields):
+        return models.LoggerCategory.objects.create(
+            logger_name=name, group=group or self.group, **fields)
+
+    def utility_plant(self, plant_id, group=None, **fields):
+        return models.UtilityPlantId.objects.create(
+            plant_id=plant_id, group=group or self.group, **fields)
+
+
+"""
+Curtailment loss estimation
+"""
+
+
+def epoch_days(*days):
+    return np.array(days, dtype='datetime64[D]').astype(np.int64)
+
+
+class WindowShareTests(TestCase):
+    def share(self, day, start, end):
+        return curtailment.window_share(
+            epoch_days(day), np.array([35.0]), np.array([start]), np.array([end]))[0]
+
+    def test_whole_day_is_all_energy(self):
+        self.assertAlmostEqual(self.share('2025-06-21', 0.0, 24.0), 1.0)
+
+    def test_morning_is_half_of_a_symmetric_day(self):
+        for day in ('2025-03-20', '2025-06-21', '2025-12-21'):
+            self.assertAlmostEqual(self.share(day, 0.0, 12.0), 0.5)
+
+    def test_window_at_night_costs_nothing(self):
+        self.assertEqual(self.share('2025-12-21', 20.0, 23.0), 0.0)
+
+
+class CurtailmentLossTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        # Linked to a PowerPlantDetail with weather: pvout basis
+        plant = self.plant('P1', capacity_dc=100)
+        models.GisWeather.objects.create(power_plant=plant, date=date(2025, 6, 10),
+                                         ghi=5, gti=5, pvout=4)
+        self.linked = self.utility_plant('P1')
+        # Not linked: history basis (median of the month's other days)
+        self.unlinked = self.utility_plant('U2')
+        for day in range(1, 10):
+            models.UtilityDailyProduction.objects.create(
+                plant_id=self.unlinked, production_date=date(2025, 6, day),
+                power_production_kwh=200, rd='2025-06')
+        for utility, kwh in ((self.linked, 300), (self.unlinked, 50)):
+            models.UtilityDailyProduction.objects.create(
+                plant_id=utility, production_date=date(2025, 6, 10),
+                power_production_kwh=kwh, rd='2025-06')
+        self.partial = models.CurtailmentEvent.objects.create(
+            plant_id=self.linked, date=date(2025, 6, 10), rd='2025-06',
+            start_time=time(10), end_time=time(14))
+        self.whole_day = models.CurtailmentEvent.objects.create(
+            plant_id=self.unlinked, date=date(2025, 6, 10), rd='2025-06')
+
+    def test_pvout_basis_is_capped_by_the_shortfall(self):
+        curtailment.compute_group_losses(self.group)
+        loss = models.CurtailmentLoss.objects.get(event=self.partial)
+        self.assertEqual(loss.basis, 'pvout')
+        self.assertEqual(loss.expected_kwh, Decimal('400.00'))
+        self.assertEqual(loss.actual_kwh, Decimal('300.00'))
+        self.assertGreater(loss.window_share, Decimal('0.4'))
+        # 400 x share exceeds the 100 kWh actually missing
+        self.assertEqual(loss.lost_kwh, Decimal('100.00'))
+
+    def test_history_basis_uses_the_median_of_other_days(self):
+        curtailment.compute_group_losses(self.group)
+        loss = models.CurtailmentLoss.objects.get(event=self.whole_day)
+        self.assertEqual(loss.basis, 'history')
+        self.assertEqual(loss.expected_kwh, Decimal('200.00'))
+        self.assertEqual(loss.window_share, Decimal('1.0000'))
+        self.assertEqual(loss.lost_kwh, Decimal('150.00'))
+
+    def test_recompute_updates_in_place(self):
+        curtailment.compute_group_losses(self.group)
+        models.UtilityDailyProduction.objects.filter(
+            plant_id=self.unlinked, production_date=date(2025, 6, 10),
+        ).update(power_production_kwh=180)
+        self.assertEqual(curtailment.compute_group_losses(self.group, rd='2025-06'), 2)
+        self.assertEqual(models.CurtailmentLoss.objects.count(), 2)
+        loss = models.CurtailmentLoss.objects.get(event=self.whole_day)
+        self.assertEqual(loss.lost_kwh, Decimal('20.00'))
+
+    def test_summary_endpoint(self):
+        curtailment.compute_group_losses(self.group)
+        response = self.client.get(
+            f'{API}/curtailment-loss/summary/', {'by': 'plant', 'group_name': 'G1'})
+        self.assertEqual(response.status_code, 200)
+        lost = {row['plant']: Decimal(str(row['lost_kwh']))
+                for row in response.json()}
+        self.assertEqual(lost, {'P1': Decimal('100.00'), 'U2': Decimal('150.00')})
+
+        response = self.client.get(f'{API}/curtailment-loss/summary/?by=week')
+        self.assertEqual(response.status_code, 400)
+
+
+"""
+Performance ratio engine
+"""
+
+
+class PerformanceRatioTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.plant_row = self.plant('P1', capacity_dc=100)
+        for day in (1, 2, 3):
+            models.GisWeather.objects.create(
+                power_plant=self.plant_row, date=date(2025, 6, day),
+                ghi=6, gti=5, pvout=4)
+        logger = self.logger('L1', alter_plant_id='P1')
+        models.LoggerPowerGen.objects.create(
+            logger_name=logger, date=date(2025, 6, 1), power_gen=450)
+        utility = self.utility_plant('P1')
+        for day, kwh in ((1, 999), (2, 380)):
+            models.UtilityDailyProduction.objects.create(
+                plant_id=utility, production_date=date(2025, 6, day),
+                power_production_kwh=kwh, rd='2025-06')
+
+    def ratios(self):
+        performance.compute_group_ratios(self.group, date(2025, 6, 1), date(2025, 6, 3))
+        return {row.date.day: row for row in models.PerformanceRatio.objects.all()}
+
+    def test_loggers_take_precedence_over_the_utility_meter(self):
+        row = self.ratios()[1]
+        self.assertEqual(row.source, 'logger')
+        self.assertEqual(row.reference_kwh, Decimal('500.00'))
+        self.assertEqual(row.expected_kwh, Decimal('400.00'))
+        self.assertEqual(row.actual_kwh, Decimal('450.00'))
+        self.assertEqual(row.pr, Decimal('0.9000'))
+        self.assertEqual(row.performance_index, Decimal('1.1250'))
+
+    def test_utility_meter_fills_days_without_loggers(self):
+        row = self.ratios()[2]
+        self.assertEqual(row.source, 'utility')
+        self.assertEqual(row.pr, Decimal('0.7600'))
+
+    def test_days_without_yield_have_no_ratio(self):
+        row = self.ratios()[3]
+        self.assertIsNone(row.source)
+        self.assertIsNone(row.actual_kwh)
+        self.assertIsNone(row.pr)
+        self.assertEqual(row.weather, 'gis')
+
+    def test_endpoint_filters_by_group_and_dates(self):
+        self.ratios()
+        response = self.client.get(f'{API}/performance-ratio/', {
+            'group_name': 'G1', 'start_date': '2025-06-02', 'end_date': '2025-06-03'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['date'] for row in response.json()],
+                         ['2025-06-02', '2025-06-03'])
+
+
+"""
+Incremental anomaly detection
+"""
+
+
+class AnomalyDetectionTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.loggers = [self.logger('L1'), self.logger('L2'), self.logger('L3')]
+
+    def write(self, logger, day, power_gen):
+        with self.captureOnCommitCallbacks(execute=True):
+            models.LoggerPowerGen.objects.create(
+                logger_name=logger, date=date(2025, 6, day), power_gen=power_gen)
+
+    def state(self):
+        stats = {row.logger_name_id: (row.last_date, row.window)
+                 for row in models.LoggerGenStats.objects.all()}
+        days = {row.date: (row.count, round(row.ratio_sum, 9))
+                for row in models.GroupDayGenStats.objects.all()}
+        flagged = sorted(models.GenerationAnomaly.objects.values_list(
+            'logger_name_id', 'date', 'peer_ratio'))
+        return stats, days, flagged
+
+    def daily(self, logger_index, day):
+        """Readings with some noise; L1 fails on the 18th."""
+        if logger_index == 0 and day == 18:
+            return 30
+        return 100 + (day * 7 + logger_index * 13) % 11
+
+    def test_drop_against_peers_is_flagged(self):
+        for day in range(1, 19):
+            for index, logger in enumerate(self.loggers):
+                self.write(logger, day, self.daily(index, day))
+        anomaly = models.GenerationAnomaly.objects.get()
+        self.assertEqual((anomaly.logger_name, anomaly.date),
+                         (self.loggers[0], date(2025, 6, 18)))
+        self.assertLess(anomaly.peer_ratio, anomalies.PEER_DROP)
+
+        response = self.client.get(f'{API}/generation-anomalies/',
+                                   {'group_name': 'G1', 'start_date': '2025-06-18'})
+        self.assertEqual([row['date'] for row in response.json()], ['2025-06-18'])
+
+    def test_drop_of_the_whole_group_is_not_flagged(self):
+        for day in range(1, 19):
+            for index, logger in enumerate(self.loggers):
+                self.write(logger, day, 30 if day == 18 else self.daily(index, day))
+        self.assertFalse(models.GenerationAnomaly.objects.exists())
+
+    def test_backfilled_readings_reach_the_state_of_an_in_order_replay(self):
+        late = {3, 9, 10, 16}
+        for day in range(1, 19):
+            if day not in late:
+                for index, logger in enumerate(self.loggers):
+                    self.write(logger, day, self.daily(index, day))
+        for day in sorted(late):
+            for index, logger in enumerate(self.loggers):
+                self.write(logger, day, self.daily(index, day))
+        incremental = self.state()
+
+        call_command('rebuild_generation_stats', stdout=StringIO())
+        self.assertEqual(incremental, self.state())
+        self.assertEqual(len(incremental[2]), 1)
+
+    def test_corrections_update_the_window(self):
+        for day in range(1, 19):
+            for index, logger in enumerate(self.loggers):
+                self.write(logger, day, self.daily(index, day))
+        reading = models.LoggerPowerGen.objects.get(logger_name=self.loggers[0],
+                                                    date=date(2025, 6, 18))
+        reading.power_gen = 105
+        with self.captureOnCommitCallbacks(execute=True):
+            reading.save()
+        stats = models.LoggerGenStats.objects.get(logger_name=self.loggers[0])
+        self.assertEqual(stats.window[-1], 105)
+        self.assertEqual((stats.median, stats.mad),
+                         anomalies.window_stats(stats.window))
+        self.assertFalse(models.GenerationAnomaly.objects.exists())
+
+        incremental = self.state()[0]
+        call_command('rebuild_generation_stats', stdout=StringIO())
+        self.assertEqual(incremental, self.state()[0])
+
+
+"""
+Revenue versus production reconciliation
+"""
+
+
+class ReconciliationTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.two_contracts = self.utility_plant('U1')
+        self.short = self.utility_plant('U2')
+        self.unbilled = self.utility_plant('U3')
+        daily = ((self.two_contracts, 100), (self.short, 100), (self.unbilled, 50))
+        for plant, kwh in daily:
+            models.UtilityDailyProduction.objects.bulk_create([
+                models.UtilityDailyProduction(
+                    plant_id=plant, production_date=date(2025, 4, day),
+                    power_production_kwh=kwh, rd='2025-04')
+                for day in range(1, 31)
+            ])
+        for contract in ('C1', 'C2'):
+            models.UtilityMonthlyRevenue.objects.create(
+                plant_id=self.two_contracts, contract_id=contract, rd='2025-04',
+                sales_days=30, sales_electricity_kwh=1500)
+        models.UtilityMonthlyRevenue.objects.create(
+            plant_id=self.short, contract_id='C1', rd='2025-04',
+            sales_days=30, sales_electricity_kwh=2500)
+
+    def report(self, months=('2025-04',)):
+        plants = models.UtilityPlantId.objects.all()
+        rows = reconciliation.reconcile(plants, list(months))
+        return {(row['plant_id'], row['rd']): row for row in rows}
+
+    def test_contracts_add_up_kwh_but_not_days(self):
+        row = self.report()[('U1', '2025-04')]
+        self.assertEqual(row['status'], reconciliation.OK)
+        self.assertEqual(row['sales_electricity_kwh'], Decimal('3000.00'))
+        self.assertEqual((row['sales_days'], row['production_days']), (30, 30))
+
+    def test_kwh_beyond_the_tolerance_is_a_mismatch(self):
+        row = self.report()[('U2', '2025-04')]
+        self.assertEqual(row['status'], reconciliation.MISMATCH)
+        self.assertEqual(row['kwh_difference'], Decimal('-500.00'))
+
+    def test_missing_sides(self):
+        report = self.report(['2025-04', '2025-05'])
+        self.assertEqual(report[('U3', '2025-04')]['status'],
+                         reconciliation.MISSING_REVENUE)
+        self.assertEqual(report[('U1', '2025-05')]['status'],
+                         reconciliation.MISSING_BOTH)
+        models.UtilityMonthlyRevenue.objects.create(
+            plant_id=self.unbilled, contract_id='C1', rd='2025-05', sales_days=31)
+        report = self.report(['2025-05'])
+        self.assertEqual(report[('U3', '2025-05')]['status'],
+                         reconciliation.MISSING_PRODUCTION)
+
+    def test_endpoint(self):
+        response = self.client.get(f'{API}/revenue-reconciliation/',
+                                   {'rd': '2025-04', 'issues_only': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['summary'],
+                         {'ok': 1, 'mismatch': 1, 'missing_revenue': 1})
+        self.assertEqual([row['plant_id'] for row in response.json()['results']],
+                         ['U2', 'U3'])
+        response = self.client.get(f'{API}/revenue-reconciliation/', {'year': '2025'})
+        self.assertEqual(len(response.json()['results']), 36)
+
+    def test_malformed_month_is_rejected(self):
+        for rd in ('2025-13', '2025-4', 'april', '2025-04-01'):
+            response = self.client.get(f'{API}/revenue-reconciliation/', {'rd': rd})
+            self.assertEqual(response.status_code, 400, rd)
+
+    def test_nan_and_negative_tolerances_are_rejected(self):
+        for params in ({'tolerance': 'nan'}, {'tolerance': 'NaN'},
+                       {'tolerance': 'snan'}, {'tolerance': 'inf'},
+                       {'tolerance': '-0.01'}, {'days_tolerance': '-1'}):
+            response = self.client.get(f'{API}/revenue-reconciliation/',
+                                       {'rd': '2025-04', **params})
+            self.assertEqual(response.status_code, 400, params)
+            self.assertEqual(set(response.json()), set(params), params)
+        response = self.client.get(f'{API}/revenue-reconciliation/',
+                                   {'rd': '2025-04', 'tolerance': '0',
+                                    'days_tolerance': '0'})
+        self.assertEqual(response.status_code, 200)
+
+
+"""
+Nearby plant search
+"""
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * spatial.EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class NearbyPlantTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        rng = random.Random(7)
+        other = models.LoggerPlantGroup.objects.create(group_name='G2')
+        self.plants = {}
+        for i in range(300):
+            lat, lon = round(rng.uniform(20, 50), 6), round(rng.uniform(120, 150), 6)
+            plant = self.plant(f'P{i}', group=other if i % 3 else None,
+                               latitude=lat, longitude=lon)
+            self.plants[plant.pk] = (plant.group_id, lat, lon)
+
+    def brute_force(self, lat, lon, k=None, radius_km=None, group=None, exclude=None):
+        found = sorted(
+            (haversine_km(lat, lon, plat, plon), pk)
+            for pk, (group_id, plat, plon) in self.plants.items()
+            if pk != exclude and group in (None, group_id))
+        if radius_km is not None:
+            found = [row for row in found if row[0] <= radius_km]
+        return found[:k] if k is not None else found
+
+    def assertSameNeighbours(self, found, expected):
+        self.assertEqual([pk for _, pk in found], [pk for _, pk in expected])
+        for (distance, _), (reference, _) in zip(found, expected):
+            self.assertAlmostEqual(distance, reference, places=6)
+
+    def test_matches_brute_force(self):
+        index = spatial.plant_index()
+        rng = random.Random(11)
+        pks = list(self.plants)
+        for _ in range(25):
+            lat, lon = rng.uniform(15, 55), rng.uniform(115, 155)
+            for query in ({'k': 1}, {'k': 12}, {'radius_km': 400},
+                          {'k': 5, 'radius_km': 250}, {'k': 400},
+                          {'k': 8, 'group': self.group.pk},
+                          {'k': 8, 'exclude': rng.choice(pks)}):
+                with self.subTest(lat=lat, lon=lon, **query):
+                    self.assertSameNeighbours(index.nearby(lat, lon, **query),
+                                              self.brute_force(lat, lon, **query))
+
+    def test_no_neighbours_for_k_below_one(self):
+        self.assertEqual(spatial.plant_index().nearby(35, 139, k=0), [])
+
+    def test_endpoint(self):
+        response = self.client.get(f'{API}/power-plant-detail/nearby/',
+                                   {'latitude': 35, 'longitude': 139, 'k': 3})
+        self.assertEqual(response.status_code, 200)
+        expected = self.brute_force(35, 139, k=3)
+        self.assertEqual([item['id'] for item in response.json()],
+                         [pk for _, pk in expected])
+        self.assertEqual([item['distance_km'] for item in response.json()],
+                         [round(distance, 3) for distance, _ in expected])
+
+    def test_endpoint_rejects_out_of_range_parameters(self):
+        for params in ({'k': 0}, {'k': -2}, {'radius_km': -1}, {'radius_km': 'nan'},
+                       {'radius_km': 'inf'}, {'latitude': 'nan'}, {'k': 'x'}):
+            query = {'latitude': 35, 'longitude': 139, **params}
+            response = self.client.get(f'{API}/power-plant-detail/nearby/', query)
+            self.assertEqual(response.status_code, 400, params)
+
+
+"""
+Date ranges and data gaps
+"""
+
+
+class RequestedDateRangeTests(TestCase):
+    def test_explicit_and_default_bounds(self):
+        today = date.today()
+        cases = [
+            ({'start_date': '2025-01-01', 'end_date': '2025-01-31'},
+             (date(2025, 1, 1), date(2025, 1, 31))),
+            ({'end_date': '2025-01-31'}, (date(2025, 1, 1), date(2025, 1, 31))),
+            ({'start_date': '2025-01-01'}, (date(2025, 1, 1), today)),
+            ({'year_month_date': '2025-02-03'}, (date(2025, 2, 3), date(2025, 2, 3))),
+            ({'year_month': '2024-02'}, (date(2024, 2, 1), date(2024, 2, 29))),
+            ({}, (today - timedelta(days=30), today)),
+        ]
+        for params, expected in cases:
+            self.assertEqual(utils.requested_date_range(params), expected, params)
+
+    def test_bad_dates_raise_value_error(self):
+        for params in ({'start_date': 'garbage'}, {'end_date': 'garbage'},
+                       {'start_date': '2025-01-01', 'end_date': '2025-01-xx'},
+                       {'start_date': 'garbage', 'end_date': '2025-01-31'},
+                       {'end_date': '2025-02-30'}, {'year_month_date': '2025-01-xx'},
+                       {'year_month': '2025-13'}, {'rd': 'garbage'}):
+            with self.assertRaises(ValueError, msg=params):
+                utils.requested_date_range(params)
+
+
+class DataGapsTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reporting = self.logger('L1')
+        self.silent = self.logger('L2')
+        for day in (1, 2, 5):
+            models.LoggerPowerGen.objects.create(
+                logger_name=self.reporting, date=date(2025, 3, day), power_gen=10)
+
+    def test_leading_middle_trailing_and_missing_ranges(self):
+        response = self.client.get(f'{API}/logger-power-gen/gaps/', {
+            'start_date': '2025-03-01', 'end_date': '2025-03-06'})
+        self.assertEqual(response.status_code, 200)
+        gaps = {row['name']: row['gaps'] for row in response.json()['results']}
+        self.assertEqual(gaps, {
+            'L1': [{'start': '2025-03-03', 'end': '2025-03-04', 'days': 2},
+                   {'start': '2025-03-06', 'end': '2025-03-06', 'days': 1}],
+            'L2': [{'start': '2025-03-01', 'end': '2025-03-06', 'days': 6}],
+        })
+
+    def test_a_viewset_without_gap_entities_is_rejected(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, 'get_gap_entities'):
+            class NoEntities(views.DataGapsMixin, views.BaseViewSet):
+                gap_entity_field = 'logger_name'
+        with self.assertRaisesMessage(ImproperlyConfigured, 'gap_entity_field'):
+            class NoField(views.DataGapsMixin, views.BaseViewSet):
+                def get_gap_entities(self):
+                    return models.LoggerCategory.objects.all(), 'logger_name'
+
+    def test_logger_filter(self):
+        response = self.client.get(f'{API}/logger-power-gen/gaps/', {
+            'start_date': '2025-03-01', 'end_date': '2025-03-05', 'logger_name': 'L1'})
+        self.assertEqual([row['name'] for row in response.json()['results']], ['L1'])
+
+    def test_bad_dates_are_rejected(self):
+        for params in ({'end_date': 'garbage'}, {'start_date': 'garbage'},
+                       {'start_date': '2025-03-06', 'end_date': '2025-03-01'}):
+            response = self.client.get(f'{API}/logger-power-gen/gaps/', params)
+            self.assertEqual(response.status_code, 400, params)
+        response = self.client.get(f'{API}/clear-sky/', {'end_date': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+
+"""
+Benchmark regression gate
+"""
+
+
+class BenchmarkCompareTests(TestCase):
+    baseline = {
+        'list': {'p50_ms': 10.0, 'p95_ms': 20.0, 'queries': 3, 'peak_kb': 100.0},
+    }
+
+    def compare(self, latency_tolerance=None, **changes):
+        current = {'list': {**self.baseline['list'], **changes}, 'new scenario': {}}
+        return benchmark.compare(current, self.baseline, latency_tolerance)
+
+    def test_more_queries_is_a_regression(self):
+        self.assertEqual(self.compare(queries=4), ['list: queries 3 -> 4'])
+        self.assertEqual(self.compare(queries=2), [])
+
+    def test_memory_within_the_tolerance(self):
+        self.assertEqual(self.compare(peak_kb=125.0), [])
+        self.assertEqual(self.compare(peak_kb=126.0), ['list: peak_kb 100.0 -> 126.0'])
+
+    def test_latency_only_with_a_tolerance(self):
+        self.assertEqual(self.compare(p50_ms=30.0), [])
+        self.assertEqual(self.compare(0.5, p50_ms=30.0), ['list: p50_ms 10.0 -> 30.0'])
+
+    def test_first_call_allocations_are_not_the_peak(self):
+        retained = []
+
+        class Client:
+            calls = 0
+
+            def get(self, path):
+                Client.calls += 1
+                if not retained:
+                    # A one-off cache filled by the first request only
+                    retained.append(bytearray(8 * 1024 * 1024))
+                return mock.Mock(status_code=200, content=b'[]')
+
+        result = benchmark.measure(Client(), 'get', '/x', None, repeat=3)
+        self.assertEqual(Client.calls, 5)
+        self.assertLess(result['peak_kb'], 1024)
+
+    def test_the_committed_baseline_covers_every_scenario(self):
+        with open(settings.BASE_DIR / 'benchmarks' / 'baseline.json') as f:
+            recorded = json.load(f)['results']
+        scenarios = benchmark.scenarios(2, 20, 90)
+        self.assertEqual(set(recorded), {name for name, *_ in scenarios})
+
+
+class CreateTests(CoreTestCase):
+    def test_a_list_body_is_rejected(self):
+        self.logger('L1')
+        reading = {'logger_name': 'L1', 'power_gen': '1.0000', 'date': '2025-01-01'}
+        url = f'{API}/logger-power-gen/'
+        response = self.client.post(url, [reading], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(models.LoggerPowerGen.objects.exists())
+        response = self.client.post(url, reading, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(models.LoggerPowerGen.objects.get().user, self.user)
+
+
+"""
+Synthetic fleet
+"""
+
+
+class FleetGeneratorTests(CoreTestCase):
+    def generate(self, prefix, seed=3):
+        generator = fleet.FleetGenerator(2, 3, date(2024, 1, 1), 90, seed=seed,
+                                         prefix=prefix, chunk_plants=2)
+        return generator.run()
+
+    def series(self, prefix):
+        return list(models.LoggerPowerGen.objects
+                    .filter(logger_name__logger_name__startswith=prefix)
+                    .order_by('logger_name__logger_name', 'date')
+                    .values_list('date', 'power_gen'))
+
+    def test_same_seed_same_fleet(self):
+        self.generate('a')
+        self.generate('b')
+        self.generate('c', seed=4)
+        self.assertEqual(self.series('a'), self.series('b'))
+        self.assertNotEqual(self.series('a'), self.series('c'))
+
+    def test_command_from_a_leap_day(self):
+        out = StringIO()
+        call_command('generate_fleet', '--start', '2024-02-29', '--years', '1',
+                     '--groups', '1', '--plants', '1', '--prefix', 'leap', stdout=out)
+        self.assertIn('2024-02-29..2025-02-28', out.getvalue())
+
+    def test_rows_and_summaries(self):
+        rows = self.generate('a')
+        self.assertEqual(models.PowerPlantDetail.objects.count(), 6)
+        self.assertEqual(rows['gen'], models.LoggerPowerGen.objects.count())
+        self.assertEqual(rows['weather'], models.GisWeather.objects.count())
+        self.assertEqual(rows['revenue'], models.UtilityMonthlyRevenue.objects.count())
+        # outages leave gaps, but never most of a quarter
+        self.assertTrue(6 * 45 < rows['gen'] < 6 * 90)
+        self.assertEqual(models.LoggerSummary.objects.count(), 6)
+        self.assertEqual(names.group_id('a-group-1'),
+                         models.LoggerPlantGroup.objects.get(group_name='a-group-1').pk)
+
+    def test_billed_days_are_metered_days(self):
+        self.generate('a')
+        revenue = models.UtilityMonthlyRevenue.objects.first()
+        metered = models.UtilityDailyProduction.objects.filter(
+            plant_id=revenue.plant_id, rd=revenue.rd)
+        self.assertEqual(revenue.sales_days, metered.count())
+
+    def test_extraterrestrial_irradiation(self):
+        # Equator at the March equinox, and no sun above the arctic circle in December
+        equator, arctic = fleet.extraterrestrial_daily(np.array([0.0, 75.0]),
+                                                       np.array([80, 355]))
+        self.assertAlmostEqual(equator[0], 10.5, delta=0.2)
+        self.assertEqual(arctic[1], 0)
+
+
+"""
+HTTP load driver
+"""
+
+
+class LoadTestTests(SimpleTestCase):
+    def test_histogram_summary(self):
+        histogram = loadtest.Histogram()
+        for latency in range(1, 101):
+            histogram.add(float(latency), 200, size=10)
+        histogram.add(20000.0, error='ReadTimeout')
+        histogram.add(3.0, 500)
+        summary = histogram.summary(elapsed=2.0)
+        self.assertEqual((summary['requests'], summary['errors']), (102, 2))
+        self.assertEqual(summary['throughput_rps'], 51.0)
+        self.assertEqual((summary['p50_ms'], summary['p99_ms']), (50.0, 100.0))
+        self.assertEqual(summary['max_ms'], 20000.0)
+        self.assertEqual(summary['bytes'], 1000)
+        self.assertEqual(summary['statuses'], {'200': 100, '500': 1})
+        self.assertEqual(sum(summary['histogram_ms'].values()), 102)
+        self.assertEqual(summary['histogram_ms']['<=5'], 4)
+        self.assertEqual(summary['histogram_ms']['>10000'], 1)
+
+    def test_expand_fills_placeholders_per_group(self):
+        mix = [{'name': 'gen', 'path': '/g?group_name={group}&m={month}', 'weight': 3},
+               {'name': 'mail', 'path': '/m?start_date={day}', 'weight': 2}]
+        self.assertEqual(loadtest.expand(mix, ['A', 'B'], month='2024-06'), [
+            ('gen', '/g?group_name=A&m=2024-06', 3),
+            ('gen', '/g?group_name=B&m=2024-06', 3),
+            ('mail', '/m?start_date=2024-06-01', 2),
+        ])
+
+    def test_default_mix_only_uses_filters_the_endpoints_have(self):
+        for name, path, _ in loadtest.expand(loadtest.DEFAULT_MIX, ['G1'],
+                                             month='2024-06'):
+            basename = path.split('/')[3]
+            viewset = next(viewset for prefix, viewset, _ in urls.router.registry
+                           if prefix == basename)
+            # The viewsets apply group_name in get_queryset
+            params = set(parse_qs(urlsplit(path).query)) - {'group_name'}
+            self.assertLessEqual(params, set(viewset.filterset_class.base_filters),
+                                 name)
+
+    def test_run_against_a_mock_transport(self):
+        seen = []
+
+        def respond(request):
+            if request.url.path == loadtest.TOKEN_PATH:
+                return httpx.Response(200, json={'token': 'abc'})
+            seen.append(request.headers['Authorization'])
+            status = 503 if request.url.path == '/down' else 200
+            return httpx.Response(status, content=b'[]')
+
+        requests = [('up', '/up', 3), ('down', '/down', 1)]
+        transport = httpx.MockTransport(respond)
+        report = loadtest.run('http://backend', requests, rate=200, duration=0.2,
+                              email='e', password='p', transport=transport)
+        self.assertEqual(report['total']['requests'], 40)
+        self.assertEqual(set(seen), {'Token abc'})
+        endpoints = report['endpoints']
+        self.assertEqual(sum(row['requests'] for row in endpoints.values()), 40)
+        self.assertEqual(endpoints['down']['error_rate'], 1)
+        self.assertEqual(endpoints['up']['errors'], 0)
+        self.assertIn('TOTAL', loadtest.text_report(report))
+
+
+"""
+Request metrics
+"""
+
+
+class RequestMetricsTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        for patcher in (mock.patch.object(metrics, 'METRICS_DIR', self.directory),
+                        mock.patch.object(metrics, '_series', {})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_workers_are_summed(self):
+        metrics.record('GET', 'a', 200, 0.02, 3, 0.01, 10, 100)
+        metrics.record('GET', 'a', 200, 7.0, 1, 0.5, 0, 50)
+        other = [1, 0.5, 2, 0.1, 4, 8] + [1] + [0] * len(metrics.BUCKETS)
+        with open(f'{self.directory}/worker-0.json', 'w') as f:
+            json.dump({'GET a 200': other, 'POST a 201': other}, f)
+        total = metrics.collect()
+        counts = total['GET a 200']
+        self.assertEqual(counts[:metrics.FIELDS], [3, 7.52, 6, 0.61, 14, 158])
+        buckets = counts[metrics.FIELDS:]
+        self.assertEqual((buckets[0], buckets[2], buckets[10]), (1, 1, 1))
+        self.assertEqual(total['POST a 201'], other)
+
+    def test_prometheus_rendering(self):
+        metrics.record('GET', 'a"b', 200, 0.02, 3, 0.01, 10, 100)
+        text = metrics.render(metrics.collect())
+        labels = 'method="GET",route="a\\"b",status="200"'
+        bucket = f'solar_request_duration_seconds_bucket{{{labels},le='
+        self.assertIn(f'{bucket}"0.01"}} 0', text)
+        self.assertIn(f'{bucket}"0.025"}} 1', text)
+        self.assertIn(f'{bucket}"+Inf"}} 1', text)
+        self.assertIn(f'solar_request_sql_queries_total{{{labels}}} 3', text)
+        self.assertIn(f'solar_response_bytes_total{{{labels}}} 100', text)
+
+    def test_middleware_records_api_requests(self):
+        for day in (1, 2):
+            models.LoggerPowerGen.objects.create(logger_name=self.logger(f'L{day}'),
+                                                 date=date(2025, 1, day), power_gen=1)
+        response = self.client.get(f'{API}/logger-power-gen/')
+        self.client.get('/admin/login/')
+        (key, counts), = metrics.collect().items()
+        self.assertEqual(key, 'GET logger-power-gen-list 200')
+        self.assertEqual(counts[metrics.COUNT], 1)
+        self.assertEqual(counts[metrics.ROWS], 2)
+        self.assertEqual(counts[metrics.BYTES], len(response.content))
+        self.assertGreater(counts[metrics.QUERIES], 0)
+
+    def test_endpoint_is_for_staff_or_the_scraper(self):
+        self.client.force_authenticate(get_user_model().objects.create_user(
+            'user@example.com', 'secret', id=2, name='User'))
+        self.assertEqual(self.client.get('/solar-api/metrics/').status_code, 403)
+        with self.settings(METRICS_TOKEN='scrape'):
+            response = self.client.get('/solar-api/metrics/',
+                                       HTTP_AUTHORIZATION='Bearer scrape')
+            self.assertEqual(response.status_code, 200)
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/solar-api/metrics/')
+        self.assertEqual(response['Content-Type'],
+                         'text/plain; version=0.0.4; charset=utf-8')
+
+
+"""
+Request profiling
+"""
+
+
+class ProfilingTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.plant('P1')
+        # The middleware authenticates before DRF does, so use real tokens.
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+
+    def test_flag(self):
+        factory = RequestFactory()
+        for query, expected in (('', None), ('?_profile=1', profiling.STORE),
+                                ('?_profile=download', profiling.DOWNLOAD),
+                                ('?_profile=no', None)):
+            request = factory.get(f'/solar-api/core/loggers-plants-group/{query}')
+            self.assertEqual(profiling.requested(request), expected, query)
+        request = factory.get('/', HTTP_X_PROFILE='True')
+        self.assertEqual(profiling.requested(request), profiling.STORE)
+
+    def test_staff_request_is_stored_with_plans(self):
+        plain = self.client.get(f'{API}/power-plant-detail/')
+        response = self.client.get(f'{API}/power-plant-detail/', HTTP_X_PROFILE='1')
+        self.assertEqual(response.content, plain.content)
+        record = models.RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual((record.method, record.status_code, record.user),
+                         ('GET', 200, self.user))
+        self.assertEqual(record.query_count, len(record.queries))
+        statements = ' '.join(query['sql'] for query in record.queries)
+        self.assertIn('core_powerplantdetail', statements)
+        self.assertTrue(record.explains)
+        self.assertIn('actual time', record.explains[0]['plan'])
+        self.assertIn('function calls', record.profile)
+
+    def test_download_replaces_the_response(self):
+        response = self.client.get(f'{API}/power-plant-detail/?_profile=download')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment;'))
+        report = response.content.decode()
+        self.assertTrue(report.startswith('GET /solar-api/core/power-plant-detail/'))
+        self.assertIn('== SQL statements ==', report)
+
+    def test_other_users_are_not_profiled(self):
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'secret', id=2, name='User')
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+        response = self.client.get(f'{API}/power-plant-detail/', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(models.RequestProfile.objects.exists())
+
+
+"""
+Admin change lists
+"""
+
+
+class AdminChangeListTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        logger = self.logger('L1')
+        for day in (date(2023, 12, 31), date(2024, 2, 1), date(2024, 2, 3)):
+            models.LoggerPowerGen.objects.create(logger_name=logger, date=day,
+                                                 power_gen=1)
+        self.client.force_login(get_user_model().objects.create_user(
+            'admin@example.com', 'secret', id=2, name='Admin', is_staff=True,
+            is_superuser=True))
+
+    def test_periods(self):
+        months = core_admin._periods(date(2023, 12, 31), date(2024, 2, 3), 'month')
+        self.assertEqual(months, [
+            (date(2023, 12, 1), date(2024, 1, 1)),
+            (date(2024, 1, 1), date(2024, 2, 1)),
+            (date(2024, 2, 1), date(2024, 3, 1)),
+        ])
+        days = core_admin._periods(date(2024, 2, 1), date(2024, 3, 1), 'day')
+        self.assertEqual(len(days), 30)
+
+    def test_date_hierarchy_matches_distinct_dates(self):
+        queryset = core_admin.DateHierarchyQuerySet(models.LoggerPowerGen)
+        for kind in ('year', 'month', 'day'):
+            for order in ('ASC', 'DESC'):
+                expected = models.LoggerPowerGen.objects.dates('date', kind, order)
+                self.assertEqual(queryset.dates('date', kind, order), list(expected))
+        self.assertEqual(queryset.none().dates('date', 'year'), [])
+
+    def test_estimated_count_above_the_limit(self):
+        queryset = models.LoggerPowerGen.objects.filter(power_gen__gt=0).order_by('pk')
+        self.assertEqual(core_admin.EstimatedCountPaginator(queryset, 100).count, 3)
+        with mock.patch.object(core_admin, 'EXACT_COUNT_LIMIT', 0):
+            paginator = core_admin.EstimatedCountPaginator(queryset, 100)
+            self.assertIsInstance(paginator.count, int)
+            self.assertGreater(paginator.count, 0)
+
+    def test_every_change_list_renders(self):
+        for model, model_admin in admin.site._registry.items():
+            if model._meta.app_label != 'core':
+                continue
+            url = f'/solar-api/admin/core/{model._meta.model_name}/'
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.client.get(url, {'q': 'L'}).status_code, 200)
+                if model_admin.date_hierarchy:
+                    year = f'{model_admin.date_hierarchy}__year'
+                    response = self.client.get(url, {year: 2024})
+                    self.assertEqual(response.status_code, 200)
+
+
+"""
+Retention and cold archive
+"""
+
+
+class ArchiveTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.recent = date.today() - timedelta(days=10)
+        self.logger_1 = self.logger('L1')
+        self.logger_2 = self.logger('L2')
+        # The recent row gets the lowest id, so id order interleaves hot and archived.
+        self.mail(self.recent)
+        for day in (2, 1, 3):
+            self.mail(date(2019, 5, day))
+            for logger in (self.logger_2, self.logger_1):
+                models.LoggerPowerGen.objects.create(
+                    logger_name=logger, date=date(2019, 5, day),
+                    power_gen=Decimal('1.5') * day)
+
+    def mail(self, day):
+        return models.MailNotificatione.objects.create(
+            from_field='monitor@example.com', date=day, subject=f'Alert {day}',
+            impact_category='Minor')
+
+    def list(self, name, **params):
+        response = self.client.get(f'{API}/{name}/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_round_trip(self):
+        before = list(models.LoggerPowerGen.objects.order_by('pk'))
+        listed = sorted(self.list('logger-power-gen', year_month='2019-05'),
+                        key=lambda row: row['id'])
+        self.assertEqual(archive.archive_model(models.LoggerPowerGen),
+                         {date(2019, 5, 1): 6})
+        self.assertFalse(models.LoggerPowerGen.objects.exists())
+        self.assertEqual(models.ArchivedChunk.objects.count(), 2)
+
+        after = archive.read(models.LoggerPowerGen, date(2019, 5, 1), date(2019, 5, 31))
+        fields = [field.attname for field in after[0]._meta.concrete_fields]
+
+        def values(rows):
+            return [[getattr(row, name) for name in fields] for row in rows]
+        self.assertEqual(values(after), values(before))
+        self.assertEqual(after[0].logger_name, self.logger_2)
+        self.assertEqual(self.list('logger-power-gen', year_month='2019-05'), listed)
+        self.assertEqual(self.list('logger-power-gen', year_month='2019-05',
+                                   logger_name='L1'),
+                         [row for row in listed if row['logger_name'] == 'L1'])
+
+    def test_late_rows_join_their_chunk(self):
+        archive.archive_model(models.LoggerPowerGen)
+        models.LoggerPowerGen.objects.create(
+            logger_name=self.logger_1, date=date(2019, 5, 9), power_gen=1)
+        archive.archive_model(models.LoggerPowerGen)
+        chunk = models.ArchivedChunk.objects.get(entity_id=self.logger_1.pk)
+        self.assertEqual(chunk.row_count, 4)
+
+    def test_archiving_sends_no_delete_signals(self):
+        receiver = mock.Mock()
+        post_delete.connect(receiver, sender=models.LoggerPowerGen)
+        self.addCleanup(post_delete.disconnect, receiver, sender=models.LoggerPowerGen)
+        with self.captureOnCommitCallbacks() as callbacks:
+            archive.archive_model(models.LoggerPowerGen)
+            archive.archive_model(models.MailNotificatione)
+        receiver.assert_not_called()
+        self.assertEqual(callbacks, [])
+
+    def test_archived_and_hot_rows_merge_in_id_order(self):
+        archive.archive_model(models.MailNotificatione)
+        self.assertEqual(models.MailNotificatione.objects.count(), 1)
+        rows = self.list('mail-notifications', start_date='2019-01-01')
+        self.assertEqual(len(rows), 4)
+        ids = [row['id'] for row in rows]
+        self.assertEqual(ids, sorted(ids))
+
+    def test_sort_follows_the_ordering(self):
+        rows = list(models.LoggerPowerGen.objects.all())
+        archive.sort(rows, ['logger_name__logger_name', '-date'])
+        self.assertEqual(
+            [(row.logger_name.logger_name, row.date.day) for row in rows],
+            [('L1', 3), ('L1', 2), ('L1', 1), ('L2', 3), ('L2', 2), ('L2', 1)])
+
+    def test_bad_dates_are_rejected(self):
+        for params in ({'end_date': 'garbage'},
+                       {'start_date': '2019-01-01', 'end_date': 'garbage'}):
+            response = self.client.get(f'{API}/mail-notifications/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+"""
+Read replicas
+"""
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'], CACHES=LOCMEM_CACHE)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(replicas._status.clear)
+
+    def statuses(self, **by_alias):
+        return mock.patch.object(replicas, 'status', side_effect=by_alias.get)
+
+    def test_parse_lsn(self):
+        self.assertEqual(replicas.parse_lsn('16/B374D848'), (0x16 << 32) + 0xB374D848)
+
+    def test_choose_skips_lagging_behind_and_unreachable_replicas(self):
+        with self.statuses(replica1=(100, replicas.MAX_LAG + 1), replica2=(100, 0.0)):
+            self.assertEqual(replicas.choose(), 'replica2')
+            self.assertEqual(replicas.choose(min_lsn=100), 'replica2')
+            self.assertEqual(replicas.choose(min_lsn=101), 'default')
+        with self.statuses(replica1=None, replica2=None):
+            self.assertEqual(replicas.choose(), 'default')
+
+    def test_reads_use_the_replica_only_while_reading(self):
+        router = replicas.ReplicaRouter()
+        with self.statuses(replica1=(5, 0.0)), mock.patch('random.shuffle'):
+            self.assertEqual(router.db_for_read(models.LoggerPowerGen), 'default')
+            token = replicas.start_reading()
+            try:
+                self.assertEqual(router.db_for_read(models.LoggerPowerGen), 'replica1')
+                self.assertEqual(router.db_for_write(models.LoggerPowerGen), 'default')
+            finally:
+                replicas.stop_reading(token)
+            self.assertEqual(router.db_for_read(models.LoggerPowerGen), 'default')
+        self.assertFalse(router.allow_migrate('replica1', 'core'))
+
+    def test_unreachable_replica_is_retried_later(self):
+        broken = mock.MagicMock()
+        broken.cursor.side_effect = DatabaseError('down')
+        with mock.patch.object(replicas, 'connections', {'replica1': broken}):
+            self.assertIsNone(replicas.status('replica1'))
+            self.assertIsNone(replicas.status('replica1'))
+        self.assertEqual(broken.cursor.call_count, 1)
+        broken.close.assert_called_once()
+
+    def test_pinned_user_needs_a_replica_that_replayed_the_write(self):
+        user = mock.Mock(pk=7, is_authenticated=True)
+        cache.set(replicas._pin_key(user), 50)
+        with self.statuses(replica1=(49, 0.0), replica2=(49, 0.0)):
+            token = replicas.start_reading(user)
+            try:
+                self.assertEqual(replicas.current_alias(), 'default')
+            finally:
+                replicas.stop_reading(token)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaViewTests(CoreTestCase):
+    def test_safe_actions_read_from_a_replica(self):
+        self.logger('L1')
+        with mock.patch.object(replicas, 'start_reading', return_value=None) as reading:
+            self.client.get(f'{API}/loggercategories/')
+            self.client.post(f'{API}/loggers-plants-group/', {'group_name': 'G2'})
+        reading.assert_called_once_with(self.user)
+
+    def test_writes_pin_the_user(self):
+        self.client.post(f'{API}/loggers-plants-group/', {'group_name': 'G2'})
+        self.assertGreater(cache.get(replicas._pin_key(self.user)), 0)
+        cache.clear()
+        self.client.post(f'{API}/loggers-plants-group/', {})
+        self.assertIsNone(cache.get(replicas._pin_key(self.user)))
+
+
+"""
+Logger and utility plant summaries
+"""
+
+
+class FrozenDate(date):
+    @classmethod
+    def today(cls):
+        return cls(2025, 6, 15)
+
+
+@mock.patch('core.models.date', FrozenDate)
+class SummaryTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.current = self.logger('L1')
+        self.silent = self.logger('L2')
+        with self.captureOnCommitCallbacks(execute=True):
+            for logger, day, value in ((self.current, date(2025, 5, 30), 1),
+                                       (self.current, date(2025, 6, 1), 2),
+                                       (self.current, date(2025, 6, 10), 4),
+                                       (self.silent, date(2024, 12, 31), 8),
+                                       (self.silent, date(2025, 5, 20), 16)):
+                models.LoggerPowerGen.objects.create(logger_name=logger, date=day,
+                                                     power_gen=value)
+
+    def summaries(self):
+        response = self.client.get(f'{API}/loggercategories/')
+        return {row['logger_name']: row['summary'] for row in response.json()}
+
+    def test_totals_as_of_today(self):
+        self.assertEqual(self.summaries(), {
+            'L1': {'last_date': '2025-06-10', 'last_value': '4.0000',
+                   'month_to_date': '6.0000', 'year_to_date': '7.0000'},
+            'L2': {'last_date': '2025-05-20', 'last_value': '16.0000',
+                   'month_to_date': '0.0000', 'year_to_date': '16.0000'},
+        })
+        totals = {row['logger_name']: (row['month_to_date'], row['year_to_date'])
+                  for row in dashboard.loggers(self.group.pk, None, None, None)}
+        self.assertEqual(totals, {'L1': (6, 7), 'L2': (0, 16)})
+
+    def test_a_new_year_starts_at_zero(self):
+        new_year = FrozenDate(2026, 1, 2)
+        with mock.patch.object(FrozenDate, 'today', return_value=new_year):
+            summary = self.summaries()['L1']
+        self.assertEqual((summary['month_to_date'], summary['year_to_date']),
+                         ('0.0000', '0.0000'))
+        stored = models.LoggerSummary.objects.get(logger_name=self.current)
+        self.assertEqual((stored.month_total, stored.year_total), (6, 7))
+
+    def test_deletes_recompute_and_the_last_reading_drops_the_summary(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            models.LoggerPowerGen.objects.filter(date=date(2025, 6, 10)).delete()
+            models.LoggerPowerGen.objects.filter(logger_name=self.silent).delete()
+        self.assertEqual(self.summaries()['L1']['last_date'], '2025-06-01')
+        self.assertIsNone(self.summaries()['L2'])
+
+    def test_bulk_loads_need_a_rebuild(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            models.LoggerPowerGen.objects.bulk_create([models.LoggerPowerGen(
+                logger_name=self.current, date=date(2025, 6, 12), power_gen=32)])
+        self.assertEqual(self.summaries()['L1']['last_date'], '2025-06-10')
+        call_command('rebuild_summaries', stdout=StringIO())
+        self.assertEqual(self.summaries()['L1']['month_to_date'], '38.0000')
+
+    def test_refresh_of_selected_entities(self):
+        models.LoggerSummary.objects.all().delete()
+        self.assertEqual(summaries.refresh(models.LoggerPowerGen, [self.silent.pk]), 1)
+        self.assertEqual(list(models.LoggerSummary.objects.values_list(
+            'logger_name__logger_name', 'month_total', 'year_total')), [('L2', 16, 16)])
+
+    def test_moving_a_reading_refreshes_both_loggers(self):
+        reading = models.LoggerPowerGen.objects.get(date=date(2025, 6, 10))
+        with self.captureOnCommitCallbacks(execute=True):
+            reading.logger_name = self.silent
+            reading.save()
+        rows = {logger: (summary['last_date'], summary['year_to_date'])
+                for logger, summary in self.summaries().items()}
+        self.assertEqual(rows, {'L1': ('2025-06-01', '3.0000'),
+                                'L2': ('2025-06-10', '20.0000')})
+
+
+"""
+Month close snapshots
+"""
+
+
+class ClosedMonthTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        patcher = mock.patch.object(snapshots, 'ROOT', Path(root.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        plant = self.utility_plant('U1')
+        self.revenue = models.UtilityMonthlyRevenue.objects.create(
+            plant_id=plant, rd='2025-05', sales_days=31, sales_amount_jpy=1000)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.closed = snapshots.close(self.group, '2025-05', self.user)
+        self.url = f'{API}/utility-monthly-revenue/'
+
+    def is_closed(self):
+        return snapshots.is_closed(self.group.pk, '2025-05')
+
+    def test_lists_are_served_from_gzipped_snapshots(self):
+        folder = snapshots.directory(self.group.pk, '2025-05', self.closed.pk)
+        names = sorted(path.name for path in folder.iterdir()
+                       if path.name.startswith('utility-monthly-revenue'))
+        self.assertEqual(names, ['utility-monthly-revenue.json',
+                                 'utility-monthly-revenue.json.gz'])
+        params = {'group_name': 'G1', 'rd': '2025-05'}
+        response = self.client.get(self.url, params,
+                                   HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['X-Snapshot'], 'G1 2025-05')
+        plain = self.client.get(self.url, params)
+        self.assertNotIn('Content-Encoding', plain)
+        snapshot = folder / 'utility-monthly-revenue.json'
+        self.assertEqual(plain.content, snapshot.read_bytes())
+        cached = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_api_writes_are_rejected(self):
+        response = self.client.patch(f'{self.url}{self.revenue.pk}/',
+                                     {'sales_days': 30}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.revenue.refresh_from_db()
+        self.assertEqual(self.revenue.sales_days, 31)
+
+    def test_other_writes_leave_the_month_closed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            revenues = models.UtilityMonthlyRevenue.objects.filter(pk=self.revenue.pk)
+            revenues.update(sales_days=30)
+            self.revenue.save()
+            self.revenue.delete()
+        self.assertTrue(self.is_closed())
+
+    def login_admin(self):
+        self.client.force_login(get_user_model().objects.create_user(
+            'admin@example.com', 'secret', id=2, name='Admin', is_staff=True,
+            is_superuser=True))
+
+    def test_admin_edit_reopens_the_month_it_leaves(self):
+        model_admin = admin.site._registry[models.UtilityMonthlyRevenue]
+        request = RequestFactory().post('/')
+        request.user = self.user
+        self.revenue.rd = '2025-06'
+        with self.captureOnCommitCallbacks(execute=True):
+            model_admin.save_model(request, self.revenue, None, True)
+        self.assertFalse(self.is_closed())
+
+    def test_admin_delete_reopens(self):
+        self.login_admin()
+        url = f'/solar-api/admin/core/utilitymonthlyrevenue/{self.revenue.pk}/'
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'{url}delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(self.is_closed())
+
+    def test_admin_bulk_delete_reopens(self):
+        self.login_admin()
+        url = '/solar-api/admin/core/utilitymonthlyrevenue/'
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {
+                'action': 'delete_selected', '_selected_action': [self.revenue.pk],
+                'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(models.UtilityMonthlyRevenue.objects.exists())
+        self.assertFalse(self.is_closed())
+
+
+"""
+Admission control
+"""
+
+
+class AdmissionTests(CoreTestCase):
+    url = f'{API}/logger-power-gen/'
+
+    def setUp(self):
+        super().setUp()
+        self.now = 1_000_000.0
+        clock = mock.patch.object(admission.time, 'time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_take_debits_all_buckets_or_none(self):
+        buckets = [('small', 10, 1.0), ('large', 100, 2.0)]
+        self.assertIsNone(admission.take(buckets, 8))
+        self.assertEqual(admission.take(buckets, 5), 3.0)
+        self.now += 3
+        self.assertIsNone(admission.take(buckets, 5))
+        # 100 - 8 + 6 - 5: not debited by the refused request
+        self.assertEqual(admission.take(buckets[1:], 100), 3.5)
+
+    def test_take_charges_at_most_a_full_bucket(self):
+        buckets = [('small', 10, 2.0)]
+        self.assertIsNone(admission.take(buckets, 50))
+        self.assertEqual(admission.take(buckets, 50), 5.0)
+        self.now += 5
+        self.assertIsNone(admission.take(buckets, 50))
+
+    @mock.patch.multiple(admission, ROWS_PER_TOKEN=1, FREE_TOKENS=0,
+                         USER_BUDGET=(4, 0.5))
+    def test_refused_requests_get_retry_after_without_waiting(self):
+        with mock.patch.object(admission, '_explain', return_value=3), \
+                mock.patch('time.sleep', side_effect=AssertionError('slept')):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '4')
+            self.now += 4
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @mock.patch.multiple(admission, ROWS_PER_TOKEN=1, FREE_TOKENS=0,
+                         USER_BUDGET=(2, 0.5), ENDPOINT_BUDGET=(1, 0.25))
+    def test_oversized_requests_run_on_a_full_bucket(self):
+        with mock.patch.object(admission, '_explain', return_value=5000):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '4')
+        self.assertIn('about 5000 rows', response.json()['detail'])
+
+    def test_estimates_are_cached_per_query(self):
+        self.logger('L1')
+        explain = mock.patch.object(admission, '_explain', wraps=admission._explain)
+        with explain as explain:
+            for params in ({'group_name': 'G1'}, {'group_name': 'G1'}, {}):
+                self.assertEqual(self.client.get(self.url, params).status_code, 200)
+        self.assertEqual(explain.call_count, 2)
+
+
+"""
+Name resolution cache
+"""
+
+
+class NamesTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = models.LoggerPlantGroup.objects.create(group_name='G2')
+        self.l1 = self.logger('L1')
+        self.l2 = self.logger('L2', group=self.other)
+
+    def test_lookups_after_the_first_run_no_query(self):
+        self.assertEqual(names.ids('logger', ['L2', 'missing', 'L1']),
+                         [self.l2.pk, self.l1.pk])
+        self.assertEqual(names.group_id('G1'), self.group.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(names.ids('logger', ['L1']), [self.l1.pk])
+            self.assertEqual(names.members('logger', 'G2'), [self.l2.pk])
+            self.assertEqual(names.group_of('logger', self.l1.pk), self.group.pk)
+        # Unknown names are looked up each time, as another worker may have added them
+        with self.assertNumQueries(1):
+            self.assertEqual(names.members('logger', 'nope'), [])
+
+    def test_saves_and_deletes_reload_after_the_commit(self):
+        self.assertEqual(names.members('logger', 'G2'), [self.l2.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.l1.group = self.other
+            self.l1.save()
+            self.l2.delete()
+        self.assertEqual(names.members('logger', 'G2'), [self.l1.pk])
+        self.assertEqual(names.ids('logger', ['L2']), [])
+
+    def test_other_workers_reload_on_a_new_version(self):
+        self.assertEqual(names.members('logger', 'G1'), [self.l1.pk])
+        models.LoggerCategory.objects.filter(pk=self.l1.pk).update(group=self.other)
+        self.assertEqual(names.members('logger', 'G1'), [self.l1.pk])
+        names.invalidate('logger')
+        self.assertEqual(names.members('logger', 'G1'), [])
+
+    def test_rows_loaded_without_signals_are_found(self):
+        names.ids('logger', ['L1'])
+        bulk, = models.LoggerCategory.objects.bulk_create([
+            models.LoggerCategory(logger_name='L3', group=self.group)])
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.assertEqual(names.ids('logger', ['L3']), [bulk.pk])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(names.members('logger', 'G1'), [self.l1.pk, bulk.pk])
+
+    def test_get_or_create(self):
+        names.ids('logger', [])
+        with self.assertNumQueries(0):
+            self.assertEqual(names.get_or_create('logger', 'L1').pk, self.l1.pk)
+        # New rows get the model defaults, group 1 among them
+        models.LoggerPlantGroup.objects.get_or_create(id=1,
+                                                      defaults={'group_name': 'G0'})
+        created = names.get_or_create('plant', 'P9')
+        self.assertEqual(created.group_id, 1)
+        # A second insert of the same name, as by a concurrent request
+        names._tables.clear()
+        model, field = names.KINDS['plant']
+        again, = model.objects.bulk_create(
+            [model(plant_id='P9')], update_conflicts=True, unique_fields=[field],
+            update_fields=[field])
+        self.assertEqual(again.pk, created.pk)
+        self.assertEqual(names.get_or_create('plant', 'P9').pk, created.pk)
+
+
+"""
+values() projection of list serializers
+"""
+
+
+@mock.patch('core.models.date', FrozenDate)
+class ProjectionTests(CoreTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        fleet.FleetGenerator(2, 2, date(2024, 1, 1), 40, seed=1, prefix='p').run()
+        group = models.LoggerPlantGroup.objects.get(group_name='p-group-1')
+        logger = models.LoggerCategory.objects.filter(group=group).first()
+        utility = models.UtilityPlantId.objects.filter(group=group).first()
+        intraday.store(logger, date(2024, 2, 1), [1.5, None, 2.25], start=40)
+        models.LoggerSummary.objects.create(
+            logger_name=models.LoggerCategory.objects.create(logger_name='stale',
+                                                             group=cls.group),
+            last_date=date(2023, 12, 31),
+            last_value=1, month_total=5, year_total=9)
+        models.LoggerCategory.objects.create(logger_name='no-summary', group=cls.group)
+        models.CurtailmentEvent.objects.create(
+            plant_id=utility, date=date(2024, 1, 20), rd='2024-01',
+            start_time=time(10), end_time=time(12))
+        curtailment.compute_group_losses(group)
+        performance.compute_group_ratios(group, date(2024, 1, 1), date(2024, 2, 9))
+        models.GenerationAnomaly.objects.create(
+            logger_name=logger, group=group, date=date(2024, 1, 9), power_gen=1,
+            baseline=10, mad=1, score=9, ratio=0.1)
+        models.MailNotificatione.objects.create(from_field='a@example.com', subject='s')
+
+    @staticmethod
+    def serializer_classes():
+        return [cls for cls in vars(serializers).values()
+                if isinstance(cls, type) and cls is not serializers.BaseModelSerializer
+                and issubclass(cls, serializers.BaseModelSerializer)]
+
+    def test_every_list_serializer_projects_identical_bytes(self):
+        today = FrozenDate(2024, 2, 5)
+        for cls in self.serializer_classes():
+            with self.subTest(serializer=cls.__name__), \
+                    mock.patch.object(FrozenDate, 'today', return_value=today):
+                queryset = cls.Meta.model.objects.order_by('pk')
+                self.assertTrue(queryset.exists())
+                self.assertIsNotNone(projection.for_serializer(cls()))
+                projected = JSONRenderer().render(cls(queryset, many=True).data)
+                regular = drf_serializers.ListSerializer(queryset, child=cls()).data
+                self.assertEqual(projected, JSONRenderer().render(regular))
+
+    def test_summaries_are_joined_into_one_query(self):
+        response = self.client.get(f'{API}/loggercategories/')
+        with self.assertNumQueries(1):
+            self.client.get(f'{API}/loggercategories/')
+        rows = {row['logger_name']: row['summary'] for row in response.json()}
+        self.assertIsNone(rows['no-summary'])
+        self.assertEqual(rows['stale']['year_to_date'], '0.0000')
+
+
+"""
+Portfolio reports
+"""
+
+
+class ReportTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        patcher = mock.patch.object(reports, 'REPORT_ROOT', Path(root.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_directories_are_keyed_on_the_group_id(self):
+        self.assertEqual(reports.directory(7, 'Plant A', '2024-06').name, '7-plant-a')
+        self.assertEqual(reports.directory(8, 'plant-a', '2024-06').name, '8-plant-a')
+        self.assertEqual(reports.directory(9, '発電所', '2024-06').name, '9')
+
+    def test_groups_slugifying_alike_get_their_own_reports(self):
+        groups = [models.LoggerPlantGroup.objects.create(group_name=name)
+                  for name in ('Plant A', 'plant-a', '発電所', '太陽')]
+        for number, group in enumerate(groups):
+            models.LoggerPowerGen.objects.create(
+                logger_name=self.logger(f'L{number}', group=group),
+                date=date(2024, 6, 1), power_gen=number + 1)
+        call_command('portfolio_report', month='2024-06', workers=1,
+                     group=[group.group_name for group in groups], stdout=StringIO())
+        month = reports.REPORT_ROOT / '2024-06'
+        folders = sorted(path.name for path in month.iterdir() if path.is_dir())
+        self.assertEqual(folders, sorted(reports.directory(group.pk, group.group_name,
+                                                           '2024-06').name
+                                         for group in groups))
+        for number, group in enumerate(groups):
+            folder = reports.directory(group.pk, group.group_name, '2024-06')
+            with open(folder / 'generation.csv') as handle:
+                self.assertEqual(list(csv.reader(handle))[1][:3],
+                                 [f'L{number}', '1', f'{number + 1}.0000'])
+        index = (month / 'index.html').read_text()
+        for group in groups:
+            folder = reports.directory(group.pk, group.group_name, '2024-06').name
+            self.assertIn(f'{folder}/report.html', index)
+
+
+"""
+Intraday series
+"""
+
+
+def reference_lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets as originally published, point by point."""
+    every = (len(x) - 2) / (threshold - 2)
+    keep, a = [0], 0
+    for i in range(threshold - 2):
+        start = int(math.floor((i + 1) * every)) + 1
+        end = min(int(math.floor((i + 2) * every)) + 1, len(x))
+        cx = sum(x[start:end]) / (end - start)
+        cy = sum(y[start:end]) / (end - start)
+        low, high = int(math.floor(i * every)) + 1, int(math.floor((i + 1) * every)) + 1
+        areas = [abs((x[a] - cx) * (y[j] - y[a]) - (x[a] - x[j]) * (cy - y[a]))
+                 for j in range(low, high)]
+        a = low + areas.index(max(areas))
+        keep.append(a)
+    return keep + [len(x) - 1]
+
+
+def quarter_hours(count):
+    return np.datetime64('2024-06-01T00:00') + np.arange(count) * intraday._STEP
+
+
+class IntradaySeriesTests(CoreTestCase):
+    url = f'{API}/logger-intraday/series/'
+
+    def test_lttb_matches_the_reference(self):
+        rng = np.random.default_rng(5)
+        times = quarter_hours(500)
+        values = rng.random(500) * 10
+        x = list(times.astype(np.int64).astype(float))
+        for threshold in (3, 10, 99, 250):
+            keep = intraday.lttb(times, values, threshold)
+            self.assertEqual(list(keep), reference_lttb(x, list(values), threshold))
+        self.assertEqual(list(intraday.lttb(times[:5], values[:5], 10)),
+                         [0, 1, 2, 3, 4])
+
+    def test_aggregate(self):
+        times = quarter_hours(8)
+        values = np.array([1.0, 2.0, np.nan, 3.0, np.nan, np.nan, np.nan, np.nan])
+        hours, sums = intraday.aggregate(times, values, 60)
+        self.assertEqual(list(np.datetime_as_string(hours)),
+                         ['2024-06-01T00:00', '2024-06-01T01:00'])
+        self.assertEqual(sums[0], 6.0)
+        self.assertTrue(np.isnan(sums[1]))
+        self.assertEqual(intraday.aggregate(times, values, 60, 'mean')[1][0], 2.0)
+        self.assertEqual(intraday.aggregate(times, values, 30, 'max')[1][:2].tolist(),
+                         [2.0, 3.0])
+        with self.assertRaises(ValueError):
+            intraday.aggregate(times, values, 20)
+
+    def test_series_are_in_time_order(self):
+        logger = self.logger('L1')
+        # Stored out of order
+        intraday.store(logger, date(2024, 6, 2), [4.0] * 4, start=48)
+        intraday.store(logger, date(2024, 6, 1), [1.0, 2.0], start=40)
+        params = {'logger_name': 'L1', 'start_date': '2024-06-01',
+                  'end_date': '2024-06-02'}
+        raw = self.client.get(self.url, params).json()['results'][0]['points']
+        stamps = [stamp for stamp, _ in raw]
+        self.assertEqual(len(stamps), 2 * intraday.SAMPLES_PER_DAY)
+        self.assertEqual(stamps, sorted(stamps))
+        daily = self.client.get(self.url, {**params, 'downsample': 'aggregate',
+                                           'interval': 1440}).json()
+        self.assertEqual(daily['results'][0]['points'],
+                         [['2024-06-01T00:00', 3.0], ['2024-06-02T00:00', 16.0]])
+        thinned = self.client.get(self.url, {**params, 'downsample': 'lttb',
+                                             'points': 4}).json()
+        points = thinned['results'][0]['points']
+        self.assertEqual([stamp for stamp, _ in points][::3],
+                         ['2024-06-01T10:00', '2024-06-02T12:45'])
+        self.assertEqual(len(points), 4)
+
+    def test_invalid_parameters(self):
+        for params in ({'downsample': 'lttb', 'points': 2},
+                       {'downsample': 'aggregate', 'interval': 20},
+                       {'downsample': 'aggregate', 'how': 'median'},
+                       {'downsample': 'spline'}):
+            with self.subTest(**params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+
+"""
+Live events
+"""
+
+
+class LiveEventsTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.logger_row = self.logger('L1')
+        self.reading = models.LoggerPowerGen.objects.create(
+            logger_name=self.logger_row, date=date(2024, 6, 1), power_gen=1)
+        self.reading = models.LoggerPowerGen.objects.get(pk=self.reading.pk)
+
+    def notifications(self, queries):
+        return [json.loads(query['sql'].split("'")[3]) for query in queries
+                if 'pg_notify' in query['sql']]
+
+    def test_publish_reads_the_group_from_the_names_cache(self):
+        names.ids('logger', ['L1'])
+        with CaptureQueriesContext(connection) as queries:
+            live.publish(self.reading, 'saved')
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(self.notifications(queries), [{
+            'stream': 'logger-power-gen', 'op': 'saved', 'id': self.reading.pk,
+            'group': self.group.pk}])
+
+    def test_deletes_publish_without_loading_the_logger(self):
+        names.ids('logger', ['L1'])
+        with CaptureQueriesContext(connection) as queries:
+            self.reading.delete()
+        self.assertNotIn('core_loggercategory', ' '.join(q['sql'] for q in queries))
+        self.assertEqual(self.notifications(queries)[0]['group'], self.group.pk)
+
+    def test_loggers_new_to_the_cache_are_looked_up(self):
+        names.ids('logger', ['L1'])
+        other = models.LoggerPlantGroup.objects.create(group_name='G2')
+        reading = models.LoggerPowerGen(
+            pk=999, logger_name_id=self.logger('L2', group=other).pk,
+            date=date(2024, 6, 1), power_gen=1)
+        with CaptureQueriesContext(connection) as queries:
+            live.publish(reading, 'deleted')
+        self.assertEqual(self.notifications(queries)[0]['group'], other.pk)
+
+    def test_tickets(self):
+        response = self.client.post(f'{API}/live-ticket/')
+        self.assertEqual(response.status_code, 200)
+        ticket = response.json()['ticket']
+        self.assertEqual(live.ticket_user_id(ticket), self.user.pk)
+        # Another user's id under this signature
+        self.assertIsNone(live.ticket_user_id('2' + ticket[1:]))
+        self.assertIsNone(live.ticket_user_id('1'))
+        with mock.patch.object(live, 'TICKET_MAX_AGE', -1):
+            self.assertIsNone(live.ticket_user_id(ticket))
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.post(f'{API}/live-ticket/').status_code, 401)
+
+    async def test_the_stream_takes_tickets_not_tokens(self):
+        token = await Token.objects.acreate(user=self.user)
+        url = f'{API}/live/'
+        response = await self.async_client.get(url, {'token': token.key})
+        self.assertEqual(response.status_code, 401)
+        authenticate = views.LiveEventsView.authenticate
+        factory = RequestFactory()
+        self.assertIsNone(await authenticate(factory.get(url, {'token': token.key})))
+        ticket = live.issue_ticket(self.user)
+        user = await authenticate(factory.get(url, {'ticket': ticket}))
+        self.assertEqual(user, self.user)
+        header = factory.get(url, HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(await authenticate(header), self.user)
+
+
+"""
+Group dashboard
+"""
+
+
+class DashboardTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = f'{API}/groups/G1/dashboard/'
+        self.mail('first')
+
+    def mail(self, subject):
+        with self.captureOnCommitCallbacks(execute=True):
+            return models.MailNotificatione.objects.create(
+                from_field='a@example.com', subject=subject, date=date(2025, 6, 2),
+                impact_category='Major')
+
+    def get(self, **headers):
+        return self.client.get(self.url, {'month': '2025-06'}, headers=headers)
+
+    def test_new_mail_keeps_the_group_payloads(self):
+        response = self.get()
+        self.assertEqual(response.json()['summary']['notifications'], 1)
+        self.assertEqual(list(response.json())[-1], 'notifications')
+        version = dashboard.version(self.group.pk)
+        self.mail('second')
+        self.assertEqual(dashboard.version(self.group.pk), version)
+        with mock.patch.object(dashboard, 'build') as build:
+            cached = self.get()
+        build.assert_not_called()
+        # Until the mail section expires
+        self.assertEqual(cached['ETag'], response['ETag'])
+        self.assertEqual(cached.json(), response.json())
+
+    def test_mail_section_refreshes_after_its_ttl(self):
+        response = self.get()
+        self.mail('second')
+        cache.delete('dashboard:notifications:2025-06')
+        with mock.patch.object(dashboard, 'build') as build:
+            refreshed = self.get()
+        build.assert_not_called()
+        self.assertNotEqual(refreshed['ETag'], response['ETag'])
+        notifications = refreshed.json()['notifications']
+        self.assertEqual(notifications['total'], 2)
+        self.assertEqual(notifications['by_impact'], {'Major': 2})
+        self.assertEqual(notifications['latest'][0]['subject'], 'second')
+        self.assertEqual(refreshed.json()['summary']['notifications'], 2)
+
+    def test_mail_is_cached_for_a_short_time(self):
+        with mock.patch.object(cache, 'set', wraps=cache.set) as set_:
+            dashboard.mail('2025-06')
+        set_.assert_called_once_with('dashboard:notifications:2025-06', mock.ANY,
+                                     dashboard.NOTIFICATION_CACHE_SECONDS)
+
+    def test_etag_answers_304_until_the_group_changes(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(if_none_match=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plant('P1')
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+"""
+Clear-sky irradiance
+"""
+
+
+def reference_clear_sky(latitude, altitude, tilt, azimuth, day, steps=24):
+    """Daily clear-sky (GHI, GTI) of one plant-day, step by step in float64."""
+    day_of_year = day.timetuple().tm_yday
+    declination = math.radians(23.44) * math.sin(
+        2 * math.pi * (284 + day_of_year) / 365)
+    normal = 1.367 * (1 + 0.033 * math.cos(2 * math.pi * day_of_year / 365))
+    phi, beta = math.radians(latitude), math.radians(tilt)
+    gamma = math.radians(azimuth - 180)
+    keep = 1 - 0.14 * max(altitude / 1000, 0)
+    ghi = gti = 0.0
+    sin_d, cos_d = math.sin(declination), math.cos(declination)
+    for step in range(steps):
+        omega = math.radians(15 * ((step + 0.5) * 24 / steps - 12))
+        cos_z = math.sin(phi) * sin_d + math.cos(phi) * cos_d * math.cos(omega)
+        if cos_z <= 0:
+            continue
+        air_mass = ((1.002432 * cos_z + 0.148386) * cos_z + 0.0096467) / (
+            ((cos_z + 0.149864) * cos_z + 0.0102963) * cos_z + 0.000303978)
+        beam = normal * (keep * 0.7 ** (air_mass ** 0.678) + 1 - keep)
+        cos_i = max(0.0, (
+            sin_d * math.sin(phi) * math.cos(beta)
+            - sin_d * math.cos(phi) * math.sin(beta) * math.cos(gamma)
+            + cos_d * math.cos(phi) * math.cos(beta) * math.cos(omega)
+            + cos_d * math.sin(phi) * math.sin(beta) * math.cos(gamma) * math.cos(omega)
+            + cos_d * math.sin(beta) * math.sin(gamma) * math.sin(omega)))
+        diffuse = 0.1 * beam
+        horizontal = beam * cos_z + diffuse
+        ghi += horizontal
+        gti += (beam * cos_i + diffuse * (1 + math.cos(beta)) / 2
+                + 0.2 * horizontal * (1 - math.cos(beta)) / 2)
+    return ghi * 24 / steps, gti * 24 / steps
+
+
+class ClearSkyTests(SimpleTestCase):
+    PLANTS = [
+        # latitude, altitude, tilt, azimuth
+        (35, 10, 20, 180),
+        (-33.9, 1500, 30, 0),
+        (0, 0, 0, 180),
+        (64, 200, 45, 120),
+        (78, 0, 10, 180),
+    ]
+    DAYS = [date(2025, 1, 1), date(2025, 3, 20), date(2025, 6, 21), date(2025, 12, 21)]
+
+    def compute(self):
+        return irradiance.clear_sky(*zip(*self.PLANTS), epoch_days(*self.DAYS))
+
+    def test_matches_the_reference_model(self):
+        ghi, gti = self.compute()
+        for i, plant in enumerate(self.PLANTS):
+            for j, day in enumerate(self.DAYS):
+                expected = reference_clear_sky(*plant, day)
+                for computed, value in zip((ghi, gti), expected):
+                    self.assertAlmostEqual(computed[i, j], value, delta=1e-3,
+                                           msg=(plant, day))
+
+    def test_reference_values(self):
+        ghi, gti = self.compute()
+        # Tokyo at midsummer: a clear day brings about 8 kWh/m2
+        self.assertTrue(7 < ghi[0, 2] < 9, ghi[0, 2])
+        self.assertTrue(ghi[0, 3] < ghi[0, 2] / 2)
+        # Modules facing the equator collect more than the horizontal in winter
+        self.assertGreater(gti[0, 3], ghi[0, 3])
+        self.assertGreater(gti[1, 2], ghi[1, 2])
+        # A flat plate sees the horizontal
+        np.testing.assert_allclose(gti[2], ghi[2], rtol=1e-6)
+        # Polar night
+        self.assertEqual(ghi[4, 3], 0)
+        self.assertEqual(gti[4, 3], 0)
+        self.assertGreater(ghi[4, 2], 0)
+
+    def test_chunks_do_not_change_the_result(self):
+        ghi, gti = self.compute()
+        with mock.patch.object(irradiance, 'CHUNK_ELEMENTS', 1):
+            chunked_ghi, chunked_gti = self.compute()
+        np.testing.assert_array_equal(chunked_ghi, ghi)
+        np.testing.assert_array_equal(chunked_gti, gti)
+
+    def test_no_plants(self):
+        ghi, gti = irradiance.clear_sky([], [], [], [], epoch_days(*self.DAYS))
+        self.assertEqual(ghi.shape, (0, 4))
+        self.assertEqual(gti.shape, (0, 4))
+
+
+class ClearSkyFallbackTests(CoreTestCase):
+    START, END = date(2025, 6, 1), date(2025, 6, 4)
+
+    def setUp(self):
+        super().setUp()
+        self.measured = self.plant('P1', capacity_dc=100)
+        self.unmeasured = self.plant('P2', capacity_dc=50, latitude=-20, tilt=0)
+        for day, gti, pvout in ((1, 5, 4), (2, 6, 5)):
+            models.GisWeather.objects.create(
+                power_plant=self.measured, date=date(2025, 6, day),
+                ghi=6, gti=gti, pvout=pvout)
+        for name, system_id in (('L1', 'P1'), ('L2', 'P2')):
+            logger = self.logger(name, alter_plant_id=system_id)
+            for day in (1, 3):
+                models.LoggerPowerGen.objects.create(
+                    logger_name=logger, date=date(2025, 6, day), power_gen=300)
+
+    def clear_gti(self, plant):
+        _, _, _, gti = irradiance.plant_clear_sky(
+            models.PowerPlantDetail.objects.filter(pk=plant.pk), self.START, self.END)
+        return gti[0]
+
+    def ratios(self):
+        performance.compute_group_ratios(self.group, self.START, self.END)
+        rows = models.PerformanceRatio.objects.select_related('power_plant')
+        return {(row.power_plant.system_id, row.date.day): row for row in rows}
+
+    def test_days_with_yield_but_no_weather_are_modelled(self):
+        ratios = self.ratios()
+        # Days without weather and without yield are left out
+        self.assertEqual(sorted(ratios), [
+            ('P1', 1), ('P1', 2), ('P1', 3), ('P2', 1), ('P2', 3)])
+        self.assertEqual(ratios['P1', 1].weather, 'gis')
+        self.assertEqual(ratios['P1', 3].weather, 'clear_sky')
+        self.assertEqual(ratios['P1', 3].source, 'logger')
+
+    def test_observed_clearness_and_yield_scale_the_clear_sky(self):
+        clear = self.clear_gti(self.measured)
+        clearness = (5 + 6) / (clear[0] + clear[1])
+        row = self.ratios()['P1', 3]
+        gti = clear[2] * clearness
+        self.assertAlmostEqual(float(row.gti), gti, places=3)
+        self.assertAlmostEqual(float(row.pvout), gti * 9 / 11, places=3)
+        self.assertAlmostEqual(float(row.reference_kwh), gti * 100, places=1)
+        self.assertAlmostEqual(float(row.pr), 300 / (gti * 100), places=3)
+
+    def test_plants_without_weather_take_the_defaults(self):
+        clear = self.clear_gti(self.unmeasured)
+        row = self.ratios()['P2', 3]
+        gti = clear[2] * performance.DEFAULT_CLEARNESS
+        self.assertEqual(row.weather, 'clear_sky')
+        self.assertAlmostEqual(float(row.gti), gti, places=3)
+        pvout = gti * performance.DEFAULT_YIELD
+        self.assertAlmostEqual(float(row.pvout), pvout, places=3)
+        self.assertAlmostEqual(float(row.expected_kwh), pvout * 50, places=1)
+
+    def test_fallback_can_be_turned_off(self):
+        with mock.patch.object(performance, 'CLEAR_SKY_FALLBACK', False):
+            ratios = self.ratios()
+        self.assertEqual(sorted(ratios), [('P1', 1), ('P1', 2)])
+
+    def test_endpoint(self):
+        response = self.client.get(f'{API}/clear-sky/', {
+            'system_id': 'P1', 'start_date': '2025-06-01', 'end_date': '2025-06-04'})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['dates'], ['2025-06-01', '2025-06-02', '2025-06-03',
+                                         '2025-06-04'])
+        self.assertEqual([row['system_id'] for row in body['results']], ['P1'])
+        np.testing.assert_allclose(body['results'][0]['gti'],
+                                   self.clear_gti(self.measured), atol=1e-3)
+        with mock.patch.object(irradiance, 'MAX_PLANT_DAYS', 7):
+            response = self.client.get(f'{API}/clear-sky/', {
+                'group_name': 'G1', 'start_date': '2025-06-01',
+                'end_date': '2025-06-04'})
+        self.assertEqual(response.status_code, 400)
+
+
+"""
+OpenAPI schema
+"""
+
+
+SCHEMA = b"""openapi: 3.0.3
+info:
+  title: Solar API
+  version: 1.0.0
+paths: {}
+"""
+
+
+class SchemaTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'openapi' / 'schema.yml'
+        patcher = mock.patch.multiple(openapi, SCHEMA_PATH=str(self.path),
+                                      _documents=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        openapi.write(SCHEMA)
+
+    def get(self, **headers):
+        return self.client.get('/solar-api/schema/', headers=headers)
+
+    def test_yaml_from_the_file(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, SCHEMA)
+        self.assertEqual(response['Content-Type'],
+                         'application/vnd.oai.openapi; charset=utf-8')
+        self.assertIn('Accept, Accept-Encoding', response['Vary'])
+        self.assertTrue(response['ETag'].endswith('-yaml"'))
+
+    def test_json(self):
+        for response in (self.client.get('/solar-api/schema/', {'format': 'json'}),
+                         self.get(accept='application/json')):
+            self.assertEqual(response['Content-Type'],
+                             'application/vnd.oai.openapi+json; charset=utf-8')
+            self.assertEqual(json.loads(response.content)['info']['title'], 'Solar API')
+            self.assertTrue(response['ETag'].endswith('-json"'))
+
+    def test_gzip(self):
+        response = self.get(accept_encoding='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), SCHEMA)
+        self.assertEqual(response['ETag'], self.get()['ETag'])
+
+    def test_etag_answers_304_and_follows_the_content(self):
+        etag = self.get()['ETag']
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        response = self.get(accept='application/json', if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        openapi.write(SCHEMA.replace(b'1.0.0', b'1.0.1'))
+        openapi._documents = None
+        self.assertNotEqual(self.get()['ETag'], etag)
+
+    def test_generated_without_the_file(self):
+        self.path.unlink()
+        with mock.patch.object(openapi, 'generate', return_value=SCHEMA) as generate, \
+                self.assertLogs(openapi.logger, 'WARNING'):
+            self.assertEqual(self.get().content, SCHEMA)
+            self.get()
+        generate.assert_called_once_with()
+
+    def test_build_schema(self):
+        changed = SCHEMA.replace(b'1.0.0', b'2.0.0')
+        with mock.patch.object(openapi, 'generate', return_value=changed):
+            with self.assertRaisesMessage(CommandError, 'out of date'):
+                call_command('build_schema', '--check', stdout=StringIO())
+            self.assertEqual(self.path.read_bytes(), SCHEMA)
+            call_command('build_schema', stdout=StringIO())
+            self.assertEqual(self.path.read_bytes(), changed)
+            call_command('build_schema', '--check', stdout=StringIO())
+            self.path.unlink()
+            with self.assertRaisesMessage(CommandError, 'missing'):
+                call_command('build_schema', '--check', stdout=StringIO())
+
+
+class CommittedSchemaTests(SimpleTestCase):
+    def test_committed_schema_is_up_to_date(self):
+        # The views drf-spectacular cannot introspect warn on every generation
+        with mock.patch.object(spectacular_settings, 'DISABLE_ERRORS_AND_WARNINGS',
+                               True):
+            call_command('build_schema', '--check', stdout=StringIO())
@@ -11,8 +11,16 @@ router.register(r'gis-weather-data', views.GisWeatherViewSet, basename='gis-weat
 
 
 router.register(r'logger-power-gen', views.LoggerPowerGenViewSet, basename='logger-power-gen')
+router.register(r'logger-intraday', views.LoggerIntradayViewSet,
+                basename='logger-intraday')
+router.register(r'performance-ratio', views.PerformanceRatioViewSet,
+                basename='performance-ratio')
+router.register(r'generation-anomalies', views.GenerationAnomalyViewSet,
+                basename='generation-anomalies')
 router.register(r'loggercategories', views.LoggerCategoryViewSet, basename='loggercategories')
 router.register(r'curtailment-event', views.CurtailmentEventViewSet, basename='curtailment-event')
+router.register(r'curtailment-loss', views.CurtailmentLossViewSet,
+                basename='curtailment-loss')
 
 #loggers-plants-group Viewsets
 router.register(r'loggers-plants-group', views.LoggerPlantGroupViewSet, basename='loggers-plants-group')
@@ -24,11 +32,19 @@ router.register(r'utility-daily-production', views.UtilityDailyProductionViewSet
 router.register(r'utility-plants-list', views.UtilityPlantIdViewSet, basename='utility-plants-list')
 
 router.register(r'mail-notifications', views.MailNotificationeViewSet, basename='mail-notification')
+router.register(r'closed-months', views.ClosedMonthViewSet, basename='closed-months')
 
 
 # Define the URL patterns
 urlpatterns = [
     path('', include(router.urls)),  # Register all ViewSet URLs
     path('power-plant-resource-choices/', views.PowerPlantDetailChoicesView.as_view(), name='PowerPlantDetailChoicesView'), 
+    path('revenue-reconciliation/', views.RevenueReconciliationView.as_view(),
+         name='revenue-reconciliation'),
+    path('live/', views.LiveEventsView.as_view(), name='live-events'),
+    path('live-ticket/', views.LiveTicketView.as_view(), name='live-ticket'),
+    path('groups/<str:group_name>/dashboard/', views.GroupDashboardView.as_view(),
+         name='group-dashboard'),
+    path('clear-sky/', views.ClearSkyView.as_view(), name='clear-sky'),
     #path('csrf-token-endpoint/', views.csrf_token_view, name='csrf_token'),  # CSRF token endpoint
 ]
@@ -0,0 +1,44 @@
+"""
+Small helpers shared by filters and views.
+"""
+from datetime import date, timedelta
+
+from django.utils.dateparse import parse_date
+
+
+def month_bounds(value):
+    """Return the first and last date of a `YYYY-MM` month (ValueError if invalid)."""
+    year, month = map(int, value.split('-')[:2])
+    start = date(year, month, 1)
+    end = (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return start, end
+
+
+def requested_date_range(params, default_days=30):
+    """Return the (start, end) dates asked for by the standard query params.
+
+    Understands `start_date`/`end_date`, `year_month_date` (a day or a
+    month), `year_month` and `rd`; without any of them the trailing
+    `default_days` up to today are used. Raises ValueError on bad input.
+    """
+    if params.get('start_date') or params.get('end_date'):
+        start, end = (parse_date(params[name]) if params.get(name) else False
+                      for name in ('start_date', 'end_date'))
+        if start is None or end is None:
+            raise ValueError('Dates must be YYYY-MM-DD.')
+        end = end or date.today()
+        return start or end - timedelta(days=default_days), end
+
+    if params.get('year_month_date', '').count('-') == 2:
+        day = parse_date(params['year_month_date'])
+        if day is None:
+            raise ValueError('year_month_date must be YYYY-MM-DD or YYYY-MM.')
+        return day, day
+
+    month = (params.get('year_month_date') or params.get('year_month')
+             or params.get('rd'))
+    if month:
+        return month_bounds(month)
+
+    end = date.today()
+    return end - timedelta(days=default_days), end
@@ -1,14 +1,46 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
 from django.utils.decorators import method_decorator
+from django.utils.cache import patch_vary_headers
+from django.utils.http import quote_etag
+from django.views import View
+from rest_framework.authtoken.models import Token
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
+from django.db.models import Count, F, Sum
 from rest_framework import viewsets, mixins, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.exceptions import NotFound, ValidationError
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+import math
+import numpy as np
+from . import admission
+from . import archive
+from . import dashboard
 from . import models
+from . import names
+from . import openapi
 from . import serializers
 from . import filters
+from . import intraday
+from . import irradiance
+from . import live
+from . import metrics
+from . import reconciliation
+from . import replicas
+from . import snapshots
+from . import spatial
+from . import utils
+from .gaps import find_gaps
 
 """
 This is for CSRF toke.
@@ -18,11 +50,34 @@ This is for CSRF toke.
 # from django.middleware.csrf import get_token
 
 
+class ReplicaReadMixin:
+    """Serves the read-only actions named in `replica_actions` from a read replica.
+
+    The action (or, on a plain APIView, the lower-case method) decides;
+    everything else reads and writes on the primary (see core.replicas).
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        action = getattr(self, 'action', None) or request.method.lower()
+        if request.method in ('GET', 'HEAD') and action in self.replica_actions:
+            self._replica_token = replicas.start_reading(request.user)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        replicas.stop_reading(getattr(self, '_replica_token', None))
+        self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
 """
 This is for CSRF toke.
 """
 # @method_decorator(ensure_csrf_cookie, name='dispatch')
-class BaseViewSet(mixins.ListModelMixin,
+
+
+class BaseViewSet(ReplicaReadMixin,
+                  mixins.ListModelMixin,
                   mixins.CreateModelMixin,
                   mixins.UpdateModelMixin,
                   mixins.RetrieveModelMixin,
@@ -30,6 +85,7 @@ class BaseViewSet(mixins.ListModelMixin,
     """Base viewset for utility models."""
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_classes = [admission.CostThrottle]
 
     def perform_create(self, serializer):
         """Automatically set the user to the authenticated user."""
@@ -40,27 +96,176 @@ class BaseViewSet(mixins.ListModelMixin,
         serializer.save(user=self.request.user)
 
 
+class BaseReadOnlyViewSet(ReplicaReadMixin,
+                          mixins.ListModelMixin,
+                          mixins.RetrieveModelMixin,
+                          viewsets.GenericViewSet):
+    """Base viewset for computed (analytics) models."""
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [admission.CostThrottle]
+
+
+class DataGapsMixin:
+    """Adds a `gaps` action listing the missing dates of every entity.
+
+    Subclasses name the entity FK and date field of the series and define
+    `get_gap_entities()`, returning (queryset of the entities expected to
+    report, name field); both are checked when the class is created.
+    """
+    gap_entity_field = None
+    gap_date_field = 'date'
+    replica_actions = ('list', 'retrieve', 'gaps')
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        missing = [name for name in ('gap_entity_field', 'get_gap_entities')
+                   if getattr(cls, name, None) is None]
+        if missing:
+            raise ImproperlyConfigured(
+                f'{cls.__name__} uses DataGapsMixin without {" or ".join(missing)}.')
+
+    @action(detail=False, methods=['get'])
+    def gaps(self, request):
+        """Missing date ranges per entity for the standard group/date filters."""
+        try:
+            start, end = utils.requested_date_range(request.query_params)
+        except ValueError as exc:
+            raise ValidationError({'detail': str(exc)})
+        if start > end:
+            raise ValidationError({'detail': 'start_date must not be after end_date.'})
+
+        entities, name_field = self.get_gap_entities()
+        results = find_gaps(self.filter_queryset(self.get_queryset()),
+                            self.gap_entity_field, self.gap_date_field,
+                            entities, name_field, start, end)
+        return Response({'start': start, 'end': end, 'results': results})
+
+
+class ArchiveReadThroughMixin:
+    """Serves rows moved out by `archive_old_data` when a date filter reaches them.
+
+    Only requests with a date parameter whose range starts before the
+    model's retention horizon read the archive; others list as before.
+    """
+    archive_date_params = ('start_date', 'end_date', 'year_month', 'year_month_date',
+                           'rd')
+
+    def get_archive_entities(self):
+        """Return the queryset of series to read from the archive (None: all)."""
+        return None
+
+    def filter_archived(self, rows):
+        """Apply non-date, non-series filters to archived rows."""
+        return rows
+
+    def get_archive_span(self):
+        """(model, start, end, entity ids) of the archived rows requested, or None."""
+        # Only the date parameters the filterset applies to the hot rows count.
+        supported = self.filterset_class.base_filters
+        params = {name: self.request.query_params.get(name)
+                  for name in self.archive_date_params
+                  if name in supported and self.request.query_params.get(name)}
+        if not params:
+            return None
+        try:
+            start, end = utils.requested_date_range(params)
+        except ValueError:
+            # The filterset rejects the value (400) or matches nothing, as for hot rows.
+            return None
+        model = self.get_queryset().model
+        if not archive.may_be_archived(model, start):
+            return None
+        entities = self.get_archive_entities()
+        entity_ids = None if entities is None else entities.values_list('pk', flat=True)
+        return model, start, end, entity_ids
+
+    def get_archived_rows(self):
+        span = self.get_archive_span()
+        return [] if span is None else self.filter_archived(archive.read(*span))
+
+    def get_archived_row_estimate(self):
+        """Upper bound of the archived rows a list reads (for admission control)."""
+        span = self.get_archive_span()
+        return 0 if span is None else archive.row_count(*span)
+
+    def list(self, request, *args, **kwargs):
+        archived = self.get_archived_rows()
+        if not archived:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering
+                        or ['pk'])
+        rows = archive.sort(archived + list(queryset.order_by(*ordering)), ordering)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        return Response(self.get_serializer(rows, many=True).data)
+
+
+class ClosedMonthMixin:
+    """Serves closed months from their snapshots and rejects API writes into them."""
+
+    def list(self, request, *args, **kwargs):
+        response = snapshots.serve(request, self.basename)
+        if response is not None:
+            return response
+        return super().list(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+            self.check_open(serializer.instance)
+
+    def perform_update(self, serializer):
+        self.check_open(serializer.instance)
+        with transaction.atomic():
+            super().perform_update(serializer)
+            self.check_open(serializer.instance)
+
+    def check_open(self, instance):
+        closed = snapshots.period(instance)
+        if closed and snapshots.is_closed(*closed):
+            raise ValidationError(
+                {'detail': f'{closed[1]} is closed for this group; reopen it first.'})
+
+
 class LoggerPlantGroupViewSet(BaseViewSet):
     """View for managing LoggerPlantGroup API"""
     serializer_class = serializers.LoggerPlantGroupSerializer
     queryset = models.LoggerPlantGroup.objects.all()
     filter_backends = (DjangoFilterBackend,)
 
-class GisWeatherViewSet(BaseViewSet):
+
+class GisWeatherViewSet(ArchiveReadThroughMixin, DataGapsMixin, BaseViewSet):
     """View for managing LoggerPlantGroup API"""
     serializer_class = serializers.GisWeatherSerializer
     queryset = models.GisWeather.objects.all()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = filters.GisWeatherFilter
+    gap_entity_field = 'power_plant'
 
     def get_queryset(self):
         queryset = super().get_queryset()
         group_name = self.request.query_params.get('group_name', None)
         if group_name:
             # Apply custom filtering based on the group name
-            categories = models.PowerPlantDetail.objects.filter(group__group_name=group_name)
-            queryset = queryset.filter(power_plant__in=categories)  # Use the correct field here
+            queryset = queryset.filter(
+                power_plant_id__in=names.members('system', group_name))
         return queryset
+
+    def get_gap_entities(self):
+        plants = models.PowerPlantDetail.objects.all()
+        params = self.request.query_params
+        if params.get('group_name'):
+            plants = plants.filter(group_id=names.group_id(params['group_name']))
+        if params.get('power_plant'):
+            plants = plants.filter(pk=params['power_plant'])
+        return plants, 'system_id'
+
+    def get_archive_entities(self):
+        return self.get_gap_entities()[0]
     
 
 
@@ -70,32 +275,192 @@ class PowerPlantDetailViewSet(BaseViewSet):
     queryset = models.PowerPlantDetail.objects.all()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = filters.PowerPlantDetailFilter
+    replica_actions = ('list', 'retrieve', 'nearby')
+
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """Plants near a point, nearest first, with their `distance_km`.
+
+        Query params: `latitude` and `longitude`, or `power_plant` (id) to
+        search around a plant; `radius_km` and/or `k` (default 10 when no
+        radius is given); optional `group_name`.
+        """
+        params = request.query_params
+        exclude = None
+        try:
+            if params.get('power_plant'):
+                exclude = int(params['power_plant'])
+                origin = models.PowerPlantDetail.objects.filter(pk=exclude) \
+                    .values_list('latitude', 'longitude').first()
+                if origin is None:
+                    raise ValidationError({'power_plant': 'Unknown power plant.'})
+                latitude, longitude = origin
+            else:
+                latitude = float(params['latitude'])
+                longitude = float(params['longitude'])
+            radius_km = float(params['radius_km']) if params.get('radius_km') else None
+            if params.get('k'):
+                k = int(params['k'])
+            else:
+                k = None if radius_km is not None else 10
+        except (KeyError, ValueError):
+            raise ValidationError({'detail': 'Provide numeric latitude/longitude or '
+                                             'power_plant, and numeric radius_km/k.'})
+        if not (math.isfinite(latitude) and math.isfinite(longitude)):
+            raise ValidationError({'detail': 'latitude and longitude must be finite.'})
+        if radius_km is not None and not (math.isfinite(radius_km) and radius_km >= 0):
+            raise ValidationError(
+                {'radius_km': 'Must be a finite, non-negative number.'})
+        if k is not None and k < 1:
+            raise ValidationError({'k': 'Must be at least 1.'})
+
+        group = None
+        if params.get('group_name'):
+            group = models.LoggerPlantGroup.objects \
+                .filter(group_name=params['group_name']) \
+                .values_list('id', flat=True).first()
+            if group is None:
+                return Response([])
+
+        found = spatial.plant_index().nearby(
+            latitude, longitude, k=k, radius_km=radius_km, group=group, exclude=exclude)
+        plants = models.PowerPlantDetail.objects.select_related('group', 'user') \
+            .in_bulk([pk for _, pk in found])
+        data = []
+        for distance, pk in found:
+            if pk in plants:
+                item = self.get_serializer(plants[pk]).data
+                item['distance_km'] = round(distance, 3)
+                data.append(item)
+        return Response(data)
 
 
 class LoggerCategoryViewSet(BaseViewSet):
     """View for managing LoggerCategory API"""
     serializer_class = serializers.LoggerCategorySerializer
-    queryset = models.LoggerCategory.objects.all()
+    queryset = models.LoggerCategory.objects.select_related('summary', 'user')
     filter_backends = [DjangoFilterBackend]
     filterset_class = filters.LoggerCategoryFilter
 
 
-class LoggerPowerGenViewSet(BaseViewSet):
+class LoggerPowerGenViewSet(ClosedMonthMixin, ArchiveReadThroughMixin, DataGapsMixin,
+                            BaseViewSet):
     """View for managing LoggerPowerGen API"""
     queryset = models.LoggerPowerGen.objects.all()
     serializer_class = serializers.LoggerPowerGenSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = filters.LoggerPowerGenFilter
+    gap_entity_field = 'logger_name'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        group_name = self.request.query_params.get('group_name', None)
+        if group_name:
+            # Apply custom filtering based on the group name
+            queryset = queryset.filter(
+                logger_name_id__in=names.members('logger', group_name))
+        return queryset
+
+    def get_gap_entities(self):
+        loggers = models.LoggerCategory.objects.all()
+        params = self.request.query_params
+        if params.get('group_name'):
+            loggers = loggers.filter(group_id=names.group_id(params['group_name']))
+        if params.get('logger_name'):
+            loggers = loggers.filter(
+                pk__in=names.ids('logger', params['logger_name'].split(',')))
+        return loggers, 'logger_name'
+
+    def get_archive_entities(self):
+        return self.get_gap_entities()[0]
+
+
+class LoggerIntradayViewSet(BaseViewSet):
+    """View for 15-minute generation per logger and day.
+
+    POST {logger_name, date, samples, start?} merges intervals into the day
+    and derives its LoggerPowerGen; `series` reads them back for charts.
+    """
+    queryset = models.LoggerIntraday.objects.order_by('logger_name', 'date')
+    serializer_class = serializers.LoggerIntradaySerializer
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = filters.LoggerIntradayFilter
+    http_method_names = ['get', 'post', 'head', 'options']
+    replica_actions = ('list', 'retrieve', 'series')
 
     def get_queryset(self):
         queryset = super().get_queryset()
         group_name = self.request.query_params.get('group_name', None)
         if group_name:
             # Apply custom filtering based on the group name
-            categories = models.LoggerCategory.objects.filter(group__group_name=group_name)
-            queryset = queryset.filter(logger_name__in=categories)
+            queryset = queryset.filter(
+                logger_name_id__in=names.members('logger', group_name))
         return queryset
 
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+            row = serializer.instance
+            closed = snapshots.period(
+                models.LoggerPowerGen(logger_name=row.logger_name, date=row.date))
+            if closed and snapshots.is_closed(*closed):
+                raise ValidationError({'detail': f'{closed[1]} is closed for this '
+                                                 'group; reopen it first.'})
+
+    @action(detail=False, methods=['get'])
+    def series(self, request):
+        """Time series per logger for the standard logger/group/date filters.
+
+        Query params: `downsample` = `raw` (default), `lttb` (with `points`,
+        default 500 per logger) or `aggregate` (with `interval` minutes,
+        default 60, and `how` = sum, mean or max).
+        """
+        params = request.query_params
+        try:
+            start, end = utils.requested_date_range(params)
+            points = int(params.get('points', 500))
+            minutes = int(params.get('interval', 60))
+        except ValueError as exc:
+            raise ValidationError({'detail': str(exc)})
+        mode = params.get('downsample', 'raw')
+        how = params.get('how', 'sum')
+        if mode not in ('raw', 'lttb', 'aggregate'):
+            raise ValidationError(
+                {'downsample': 'Must be one of raw, lttb, aggregate.'})
+        if mode == 'lttb' and points < 3:
+            raise ValidationError({'points': 'Must be at least 3.'})
+        if how not in intraday.AGGREGATES:
+            raise ValidationError(
+                {'how': f'Must be one of {", ".join(intraday.AGGREGATES)}.'})
+        if mode == 'aggregate' and (minutes <= 0
+                                    or minutes % intraday.INTERVAL_MINUTES):
+            raise ValidationError({'interval': 'Must be a multiple of '
+                                               f'{intraday.INTERVAL_MINUTES} minutes.'})
+
+        rows = (self.filter_queryset(self.get_queryset())
+                .filter(date__range=(start, end))
+                .order_by('logger_name__logger_name', 'date')
+                .values_list('logger_name__logger_name', 'date', 'samples'))
+        results = []
+        for logger_name, (times, values) in intraday.series(rows).items():
+            if mode == 'lttb':
+                present = ~np.isnan(values)
+                times, values = times[present], values[present]
+                keep = intraday.lttb(times, values, points)
+                times, values = times[keep], values[keep]
+            elif mode == 'aggregate':
+                times, values = intraday.aggregate(times, values, minutes, how)
+            results.append({'logger_name': logger_name,
+                            'points': intraday.points(times, values)})
+        return Response({
+            'start': start,
+            'end': end,
+            'downsample': mode,
+            'interval_minutes': (minutes if mode == 'aggregate'
+                                 else intraday.INTERVAL_MINUTES),
+            'results': results,
+        })
+
 
 class CurtailmentEventViewSet(BaseViewSet):
     """View for managing CurtailmentEvent API"""
@@ -109,20 +474,21 @@ class CurtailmentEventViewSet(BaseViewSet):
         group_name = self.request.query_params.get('group_name', None)
         if group_name:
             # Apply custom filtering based on the group name
-            queryset = queryset.filter(plant_id__group__group_name=group_name)
+            queryset = queryset.filter(
+                plant_id_id__in=names.members('plant', group_name))
         return queryset
 
 
 
 class UtilityPlantIdViewSet(BaseViewSet):
     """View for managing UtilityPlantId API"""
-    queryset = models.UtilityPlantId.objects.all()
+    queryset = models.UtilityPlantId.objects.select_related('summary', 'user')
     serializer_class = serializers.UtilityPlantIdSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = filters.UtilityPlantIdFilter
 
 
-class UtilityMonthlyRevenueViewSet(BaseViewSet):
+class UtilityMonthlyRevenueViewSet(ClosedMonthMixin, BaseViewSet):
     """View for managing UtilityMonthlyRevenue API"""
     queryset = models.UtilityMonthlyRevenue.objects.all()
     serializer_class = serializers.UtilityMonthlyRevenueSerializer
@@ -134,11 +500,12 @@ class UtilityMonthlyRevenueViewSet(BaseViewSet):
         group_name = self.request.query_params.get('group_name', None)
         if group_name:
             # Apply custom filtering based on the group name
-            queryset = queryset.filter(plant_id__group__group_name=group_name)
+            queryset = queryset.filter(
+                plant_id_id__in=names.members('plant', group_name))
         return queryset
 
 
-class UtilityMonthlyExpenseViewSet(BaseViewSet):
+class UtilityMonthlyExpenseViewSet(ClosedMonthMixin, BaseViewSet):
     """View for managing UtilitieMonthlyExpense API"""
     queryset = models.UtilityMonthlyExpense.objects.all()
     serializer_class = serializers.UtilityMonthlyExpenseSerializer
@@ -150,25 +517,43 @@ class UtilityMonthlyExpenseViewSet(BaseViewSet):
         group_name = self.request.query_params.get('group_name', None)
         if group_name:
             # Apply custom filtering based on the group name
-            queryset = queryset.filter(plant_id__group__group_name=group_name)
+            queryset = queryset.filter(
+                plant_id_id__in=names.members('plant', group_name))
         return queryset
 
 
-class UtilityDailyProductionViewSet(BaseViewSet):
+class UtilityDailyProductionViewSet(ClosedMonthMixin, ArchiveReadThroughMixin,
+                                    DataGapsMixin, BaseViewSet):
     """View for managing UtilitieDailyProduction API"""
     queryset = models.UtilityDailyProduction.objects.all()
     serializer_class = serializers.UtilityDailyProductionSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = filters.UtilityDailyProductionFilter
+    gap_entity_field = 'plant_id'
+    gap_date_field = 'production_date'
 
     def get_queryset(self):
         queryset = super().get_queryset()
         group_name = self.request.query_params.get('group_name', None)
         if group_name:
             # Apply custom filtering based on the group name
-            queryset = queryset.filter(plant_id__group__group_name=group_name)
+            queryset = queryset.filter(
+                plant_id_id__in=names.members('plant', group_name))
         return queryset
 
+    def get_gap_entities(self):
+        plants = models.UtilityPlantId.objects.all()
+        params = self.request.query_params
+        if params.get('group_name'):
+            plants = plants.filter(group_id=names.group_id(params['group_name']))
+        if params.get('plant_id'):
+            plant_ids = [p.strip() for p in params['plant_id'].split(',')]
+            plants = plants.filter(pk__in=names.ids('plant', plant_ids))
+        return plants, 'plant_id'
+
+    def get_archive_entities(self):
+        return self.get_gap_entities()[0]
+
 
 class PowerPlantDetailChoicesView(APIView):
     def get(self, request, *args, **kwargs):
@@ -188,8 +573,387 @@ class PowerPlantDetailChoicesView(APIView):
 """
 View for mail notification
 """
-class MailNotificationeViewSet(BaseViewSet):
+
+
+class MailNotificationeViewSet(ArchiveReadThroughMixin, BaseViewSet):
     queryset = models.MailNotificatione.objects.all()
     serializer_class = serializers.MailNotificationeSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = filters.MailNotificationeFilter
+
+    def filter_archived(self, rows):
+        impact = self.request.query_params.get('impact_category')
+        if impact:
+            rows = [row for row in rows
+                    if impact.lower() in (row.impact_category or '').lower()]
+        return rows
+
+
+"""
+View for curtailment energy-loss estimates
+"""
+
+
+class CurtailmentLossViewSet(BaseReadOnlyViewSet):
+    """View for CurtailmentLoss estimates, per event or aggregated."""
+    queryset = models.CurtailmentLoss.objects.select_related('plant_id', 'user')
+    serializer_class = serializers.CurtailmentLossSerializer
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = filters.CurtailmentLossFilter
+    replica_actions = ('list', 'retrieve', 'summary')
+
+    SUMMARY_KEYS = {
+        'plant': ('plant',),
+        'month': ('rd',),
+        'plant_month': ('plant', 'rd'),
+    }
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """Total lost kWh per plant, per month or per plant and month (`by`)."""
+        by = request.query_params.get('by', 'plant_month')
+        if by not in self.SUMMARY_KEYS:
+            choices = ', '.join(self.SUMMARY_KEYS)
+            raise ValidationError({'by': f'Must be one of {choices}.'})
+
+        keys = self.SUMMARY_KEYS[by]
+        rows = (
+            self.filter_queryset(self.get_queryset())
+            .annotate(plant=F('plant_id__plant_id'))
+            .values(*keys)
+            .annotate(events=Count('id'), expected_kwh=Sum('expected_kwh'),
+                      lost_kwh=Sum('lost_kwh'))
+            .order_by(*keys)
+        )
+        return Response(list(rows))
+
+
+"""
+View for expected-versus-actual performance ratios
+"""
+
+
+class PerformanceRatioViewSet(BaseReadOnlyViewSet):
+    """View for PerformanceRatio rows per plant and day."""
+    queryset = (models.PerformanceRatio.objects
+                .select_related('power_plant__group', 'user')
+                .order_by('power_plant', 'date'))
+    serializer_class = serializers.PerformanceRatioSerializer
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = filters.PerformanceRatioFilter
+
+
+"""
+View for generation anomalies flagged on LoggerPowerGen writes
+"""
+
+
+class GenerationAnomalyViewSet(BaseReadOnlyViewSet):
+    """View for GenerationAnomaly rows, queryable by group and date."""
+    queryset = (models.GenerationAnomaly.objects.select_related('logger_name', 'group')
+                .order_by('-date', 'score'))
+    serializer_class = serializers.GenerationAnomalySerializer
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = filters.GenerationAnomalyFilter
+
+
+"""
+View closing and reopening months of a group
+"""
+
+
+class ClosedMonthViewSet(ReplicaReadMixin,
+                         mixins.ListModelMixin,
+                         mixins.CreateModelMixin,
+                         mixins.DestroyModelMixin,
+                         viewsets.GenericViewSet):
+    """Closed months; staff close one with POST {group_name, rd}, reopen with DELETE."""
+    authentication_classes = [TokenAuthentication]
+    queryset = (models.ClosedMonth.objects.select_related('group', 'user')
+                .order_by('-rd', 'group__group_name'))
+    serializer_class = serializers.ClosedMonthSerializer
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = filters.ClosedMonthFilter
+
+    def get_permissions(self):
+        if self.action in ('create', 'destroy'):
+            return [IsAdminUser()]
+        return [IsAuthenticated()]
+
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        serializer.instance = snapshots.close(data['group'], data['rd'],
+                                              self.request.user)
+
+    def perform_destroy(self, instance):
+        snapshots.reopen(instance.group_id, instance.rd)
+
+
+"""
+View reconciling UtilityMonthlyRevenue against UtilityDailyProduction
+"""
+
+
+class RevenueReconciliationView(ReplicaReadMixin, APIView):
+    """Compare sold and produced kWh/days per plant and month.
+
+    Query params: `rd` (YYYY-MM) or `year` (YYYY), optional `group_name`,
+    `plant_id` (comma separated), `tolerance` (relative kWh, default 0.01),
+    `days_tolerance` (default 0) and `issues_only`.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    replica_actions = ('get',)
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        if params.get('rd'):
+            try:
+                months = [reconciliation.check_month(params['rd'])]
+            except ValueError:
+                raise ValidationError({'rd': 'Must be YYYY-MM.'})
+        elif params.get('year', '').isdigit():
+            months = reconciliation.year_months(int(params['year']))
+        else:
+            raise ValidationError({'rd': 'Provide `rd` (YYYY-MM) or `year` (YYYY).'})
+
+        try:
+            tolerance = Decimal(params.get('tolerance', '0.01'))
+            days_tolerance = int(params.get('days_tolerance', 0))
+        except (InvalidOperation, ValueError):
+            raise ValidationError({'tolerance': 'Must be numeric.'})
+        # Decimal() also parses nan/snan, which fail in the comparison
+        if not tolerance.is_finite() or tolerance < 0:
+            raise ValidationError({'tolerance': 'Must be a finite number, at least 0.'})
+        if days_tolerance < 0:
+            raise ValidationError({'days_tolerance': 'Must be at least 0.'})
+
+        plants = models.UtilityPlantId.objects.all()
+        if params.get('group_name'):
+            plants = plants.filter(group_id=names.group_id(params['group_name']))
+        if params.get('plant_id'):
+            plant_ids = [p.strip() for p in params['plant_id'].split(',')]
+            plants = plants.filter(pk__in=names.ids('plant', plant_ids))
+
+        results = reconciliation.reconcile(plants, months, tolerance, days_tolerance)
+        summary = Counter(row['status'] for row in results)
+        if params.get('issues_only', '').lower() in ('true', '1'):
+            results = [row for row in results if row['status'] != reconciliation.OK]
+
+        return Response({
+            'months': months,
+            'tolerance': tolerance,
+            'days_tolerance': days_tolerance,
+            'summary': summary,
+            'results': results,
+        }, status=status.HTTP_200_OK)
+
+
+"""
+Composite dashboard of a group's month in one request
+"""
+
+
+class GroupDashboardView(ReplicaReadMixin, APIView):
+    """Plants, loggers, generation, weather, utility, curtailment, anomalies and mail.
+
+    Query params: `month` (YYYY-MM, default the current month). The payload
+    is cached per group version; `If-None-Match` with the ETag answers 304.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    replica_actions = ('get',)
+
+    def get(self, request, group_name, *args, **kwargs):
+        group_id = names.group_id(group_name)
+        if group_id is None:
+            raise NotFound(f'Unknown group {group_name}.')
+        rd = request.query_params.get('month') or timezone.localdate().strftime('%Y-%m')
+        try:
+            utils.month_bounds(rd)
+        except ValueError:
+            raise ValidationError({'month': 'Must be YYYY-MM.'})
+
+        version = dashboard.version(group_id)
+        mail_digest, mail_section = dashboard.mail(rd)
+        etag = quote_etag(f'{group_id}-{rd}-{version}-{mail_digest}')
+        if etag in request.headers.get('If-None-Match', ''):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response({'group_name': group_name, 'month': rd,
+                                 **dashboard.get(group_id, rd, version, mail_section)})
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+"""
+Clear-sky irradiation of power plants computed from their geometry
+"""
+
+
+class ClearSkyView(ReplicaReadMixin, APIView):
+    """Daily clear-sky GHI and GTI (kWh/m2) per power plant and day.
+
+    Query params: `group_name` and/or `system_id` (comma separated), and
+    the date range (`start_date`/`end_date`, `year_month`, default the
+    trailing 30 days). At most IRRADIANCE_MAX_PLANT_DAYS plant-days.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    replica_actions = ('get',)
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        try:
+            start, end = utils.requested_date_range(params)
+        except ValueError as exc:
+            raise ValidationError({'date': str(exc)})
+        if end < start:
+            raise ValidationError({'end_date': 'Must not be before start_date.'})
+
+        plants = models.PowerPlantDetail.objects.all()
+        if params.get('group_name'):
+            plants = plants.filter(group_id=names.group_id(params['group_name']))
+        if params.get('system_id'):
+            system_ids = [s.strip() for s in params['system_id'].split(',')]
+            plants = plants.filter(pk__in=names.ids('system', system_ids))
+        plant_days = plants.count() * ((end - start).days + 1)
+        if plant_days > irradiance.MAX_PLANT_DAYS:
+            raise ValidationError(
+                {'date': f'{plant_days} plant-days requested; at most '
+                         f'{irradiance.MAX_PLANT_DAYS} per request.'})
+
+        ids, days, ghi, gti = irradiance.plant_clear_sky(plants, start, end)
+        system_ids = dict(plants.values_list('pk', 'system_id'))
+        ghi, gti = np.round(ghi, 3).tolist(), np.round(gti, 3).tolist()
+        return Response({
+            'start': start,
+            'end': end,
+            'dates': days.astype('datetime64[D]').astype(str).tolist(),
+            'results': [{'power_plant': pk, 'system_id': system_ids[pk],
+                         'ghi': ghi[i], 'gti': gti[i]}
+                        for i, pk in enumerate(ids.tolist())],
+        }, status=status.HTTP_200_OK)
+
+
+"""
+OpenAPI schema served from the pre-generated file
+"""
+
+
+class SchemaView(View):
+    """The OpenAPI schema, YAML by default or JSON (`?format=json` or a JSON `Accept`).
+
+    Built by `manage.py build_schema`; gzipped when the client accepts it
+    and answered with 304 when `If-None-Match` has the current ETag.
+    """
+    http_method_names = ['get', 'head']
+
+    def get(self, request, *args, **kwargs):
+        document = openapi.documents()[openapi.requested_format(request)]
+        if document.etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+            response = HttpResponse(document.gzipped, content_type=document.media_type)
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(document.body, content_type=document.media_type)
+        response['ETag'] = document.etag
+        response['Cache-Control'] = 'public, no-cache'
+        response['Content-Disposition'] = f'inline; filename="{document.filename}"'
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        return response
+
+
+"""
+Prometheus metrics of the core and user API, summed over all workers
+"""
+
+
+class MetricsView(APIView):
+    """Request metrics in the Prometheus text format.
+
+    Open to staff tokens, or to `Authorization: Bearer <METRICS_TOKEN>`
+    when that setting is configured (for the Prometheus scraper).
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = []
+
+    def get(self, request, *args, **kwargs):
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        bearer = token and request.headers.get('Authorization') == f'Bearer {token}'
+        if not bearer and not request.user.is_staff:
+            return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+        return HttpResponse(metrics.render(metrics.collect()),
+                            content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+"""
+Server-Sent Events push of new and changed rows (served by the ASGI app)
+"""
+
+
+class LiveEventsView(View):
+    """Stream saves and deletes of `live.STREAMS` as they commit.
+
+    Query params: `streams` (comma separated, default all) and `group_name`
+    (comma separated, default all groups). Browsers' EventSource cannot
+    send headers, so instead of the token it may give a `ticket` from
+    LiveTicketView.
+    """
+    http_method_names = ['get']
+
+    async def get(self, request, *args, **kwargs):
+        user = await self.authenticate(request)
+        if user is None:
+            return JsonResponse(
+                {'detail': 'Authentication credentials were not provided.'},
+                status=status.HTTP_401_UNAUTHORIZED)
+
+        params = request.GET
+        requested = params.get('streams', ','.join(live.STREAMS))
+        streams = {name.strip() for name in requested.split(',') if name.strip()}
+        unknown = streams - set(live.STREAMS)
+        if unknown or not streams:
+            return JsonResponse(
+                {'streams': f'Must be among {", ".join(live.STREAMS)}.'},
+                status=status.HTTP_400_BAD_REQUEST)
+        groups = None
+        if params.get('group_name'):
+            group_names = [name.strip() for name in params['group_name'].split(',')]
+            groups = set(await sync_to_async(names.ids)('group', group_names))
+            if len(groups) < len(set(group_names)):
+                return JsonResponse({'group_name': 'Unknown group.'},
+                                    status=status.HTTP_400_BAD_REQUEST)
+
+        subscriber = live.hub.subscribe(streams, groups)
+        response = StreamingHttpResponse(subscriber.events(live.hub),
+                                         content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Let nginx pass every event through at once
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @staticmethod
+    async def authenticate(request):
+        header = request.headers.get('Authorization', '')
+        if header.startswith('Token '):
+            key = header[len('Token '):]
+            token = await Token.objects.select_related('user').filter(key=key).afirst()
+            user = token and token.user
+        else:
+            user_id = live.ticket_user_id(request.GET.get('ticket', ''))
+            user = user_id and await (get_user_model().objects
+                                      .filter(pk=user_id).afirst())
+        return user if user and user.is_active else None
+
+
+class LiveTicketView(APIView):
+    """Short-lived ticket for `live/?ticket=`, keeping the token out of stream URLs."""
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        return Response({'ticket': live.issue_ticket(request.user),
+                         'expires_in': live.TICKET_MAX_AGE})
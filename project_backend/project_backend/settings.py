@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 # Middleware settings
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.RequestMetricsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -50,6 +51,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.middleware.ReadYourWritesMiddleware",
+    "core.middleware.ProfilingMiddleware",
 ]
 
 # Django Rest Framework settings
@@ -100,6 +103,29 @@ DATABASES = {
     }
 }
 
+# Read replicas: comma separated `host` or `host:port` of streaming replicas of `default`
+DATABASE_REPLICAS = []
+for number, replica in enumerate(filter(None, os.getenv("POSTGRES_REPLICA_HOSTS", "").split(",")), 1):
+    host, _, port = replica.strip().partition(":")
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "OPTIONS": {"connect_timeout": 2},
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica{number}")
+DATABASE_ROUTERS = ["core.replicas.ReplicaRouter"]
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+
+# Cache shared by the workers on a host (read-your-writes pins)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("CACHE_DIR", "/tmp/solar-cache"),
+    }
+}
+
 # DATABASES = {
 #     "default": {
 #         "ENGINE": "django.db.backends.sqlite3",
@@ -135,6 +161,23 @@ LOGIN_REDIRECT_URL = "/solar-api/admin/"
 LOGOUT_REDIRECT_URL = "/solar-api/admin/login/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Request metrics (per-worker files summed at /solar-api/metrics/)
+METRICS_DIR = os.getenv("METRICS_DIR", "/tmp/solar-metrics")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Closed-month snapshots (kept out of MEDIA_ROOT, which nginx serves publicly)
+SNAPSHOT_ROOT = os.getenv("SNAPSHOT_ROOT", os.path.join(BASE_DIR, "snapshots"))
+SNAPSHOT_ACCEL_REDIRECT = os.getenv("SNAPSHOT_ACCEL_REDIRECT", "False").lower() in ("true", "1")
+
+# Monthly portfolio reports (`portfolio_report`); nginx serves MEDIA_ROOT under /media/
+REPORT_ROOT = os.getenv("REPORT_ROOT", os.path.join(MEDIA_ROOT, "reports"))
+
+# Admission control of expensive list requests (see core/admission.py)
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "True").lower() in ("true", "1")
+
+# Live push of new readings over Server-Sent Events (see core/live.py)
+LIVE_ENABLED = os.getenv("LIVE_ENABLED", "True").lower() in ("true", "1")
+
 # Security headers (for production)
 if not DEBUG:
     CSRF_COOKIE_SECURE = False
@@ -14,16 +14,18 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from drf_spectacular.views import SpectacularSwaggerView
 from django.contrib import admin
 from django.urls import path, include
 from django.views.generic.base import RedirectView
+from core.views import MetricsView, SchemaView
 
 urlpatterns = [
     path('solar-api/admin/', admin.site.urls),
     
-    # FIX: Ensure correct schema URL
-    path('solar-api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
+    # FIX: Ensure correct schema URL (served from the file written by
+    # `manage.py build_schema`)
+    path('solar-api/schema/', SchemaView.as_view(), name='api-schema'),
     
     # FIX: Ensure the Swagger UI references the correct schema
     path('solar-api/docs/', SpectacularSwaggerView.as_view(url_name='api-schema'), name='api-docs'),
@@ -34,5 +36,8 @@ urlpatterns = [
     # Other API routes
     path('solar-api/user/', include('user.urls')),
     path('solar-api/core/', include('core.urls')),
+
+    # Prometheus scrape target
+    path('solar-api/metrics/', MetricsView.as_view(), name='metrics'),
 ]
 
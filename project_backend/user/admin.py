@@ -13,6 +13,7 @@ from .models import User
 class UserAdmin(BaseUserAdmin):
     """Define the admin page for the custom User model."""
     ordering = ['id']
+    search_fields = ['email', 'name']
     list_display = ['email', 'name', 'is_staff', 'is_active', 'change_password_button']
     fieldsets = (
         (None, {'fields': ('email', 'password', 'name')}),